@@ -0,0 +1,46 @@
+"""
+Compare two benchmark result files (median times).
+
+    python -m benchmarks.compare benchmarks/results/a1b2c3d.json benchmarks/results/e4f5a6b.json
+"""
+import argparse
+import json
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=1.2, help="Flag slowdowns above this ratio")
+    args = parser.parse_args(argv)
+
+    with open(args.baseline) as f:
+        old = json.load(f)
+    with open(args.candidate) as f:
+        new = json.load(f)
+
+    print(f"{old['revision']} -> {new['revision']} (median ms)")
+    regressions = 0
+    for scale, new_scale in new["scales"].items():
+        old_scale = old["scales"].get(scale)
+        if not old_scale:
+            continue
+        print(f"\n[{scale}]")
+        for name, res in new_scale["results"].items():
+            before = old_scale["results"].get(name)
+            if not before:
+                print(f"  {name:<34} {'-':>12} {res['median_ms']:>12.3f}")
+                continue
+            ratio = res["median_ms"] / before["median_ms"] if before["median_ms"] else float("inf")
+            flag = "  <-- slower" if ratio > args.threshold else ""
+            regressions += bool(flag)
+            print(f"  {name:<34} {before['median_ms']:>12.3f} {res['median_ms']:>12.3f} {ratio:>7.2f}x{flag}")
+        for name, value in new_scale.get("memory", {}).items():
+            before = old_scale.get("memory", {}).get(name)
+            ratio = f"{value / before:>7.2f}x" if before else ""
+            print(f"  {'memory.' + name:<34} {before if before is not None else '-':>12} {value:>12} {ratio}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
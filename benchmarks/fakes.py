@@ -0,0 +1,95 @@
+"""Minimal stand-ins for the discord objects the Knecht cog touches."""
+import discord
+
+
+class FakeBot:
+    def add_view(self, view):
+        pass
+
+    def get_channel(self, channel_id):
+        return None # No dashboard edits in benchmarks
+
+    def get_cog(self, name):
+        return None
+
+
+class FakeUser:
+    def __init__(self, user_id):
+        self.id = user_id
+        self.display_name = f"user{user_id}"
+        self.mention = f"<@{user_id}>"
+
+
+class FakeResponse:
+    def __init__(self):
+        self.sent = 0
+        self.done = False
+
+    def is_done(self):
+        return self.done
+
+    async def send_message(self, *args, **kwargs):
+        self.sent += 1
+        self.done = True
+
+    async def defer(self, *args, **kwargs):
+        self.done = True
+
+
+class FakeFollowup:
+    def __init__(self):
+        self.sent = 0
+
+    async def send(self, *args, **kwargs):
+        self.sent += 1
+
+
+class FakeInteraction:
+    _next_id = 1
+
+    def __init__(self, user):
+        self.id = FakeInteraction._next_id
+        FakeInteraction._next_id += 1
+        self.user = user
+        self.guild_id = None # DMs and unpartitioned setups use the default partition
+        self.channel_id = None
+        self.response = FakeResponse()
+        self.followup = FakeFollowup()
+
+
+class FakeRole:
+    def __init__(self, role_id, name):
+        self.id = role_id
+        self.name = name
+        self.members = []
+
+
+class FakeMember(FakeUser):
+    def __init__(self, user_id, guild, roles, status, activities):
+        super().__init__(user_id)
+        self.guild = guild
+        self._roles = {r.id: r for r in roles}
+        self.status = status
+        self.activities = activities
+
+    def get_role(self, role_id):
+        return self._roles.get(role_id)
+
+
+class FakeGuild:
+    def __init__(self, guild_id, role_name, n_members, playing_ratio=0.3):
+        """`n_members` members with the target role; every Nth of them is online and playing."""
+        self.id = guild_id
+        role = FakeRole(1, role_name)
+        self.roles = [role]
+        self.members = []
+        step = max(1, round(1 / playing_ratio)) if playing_ratio else 0
+        for i in range(n_members):
+            playing = step and i % step == 0
+            member = FakeMember(
+                10_000 + i, self, [role],
+                discord.Status.online if playing or i % 2 else discord.Status.offline,
+                [discord.Game("GTA V")] if playing else []
+            )
+            self.members.append(member)
+            role.members.append(member)
@@ -0,0 +1,227 @@
+"""
+Memory and CPU of the gateway caches, full vs lean (settings.json
+"lean_gateway"), at different guild sizes.
+
+    python -m benchmarks.gateway                                  # 1k, 10k, 100k members
+    python -m benchmarks.gateway --members 5000 50000 --role-share 0.02
+
+Each (mode, size) runs in its own process, so RSS is comparable. A fake
+websocket answers the member requests from synthetic payloads and the
+events go through discord.py's own parsers: startup (full: the whole member
+list is cached; lean: cache_role_members), the online members' presences,
+MESSAGE_CREATE (full mode only, lean mode doesn't receive them) and a
+stream of PRESENCE_UPDATE from random members with the bot's listener.
+Reported: RSS after startup and after the events, peak RSS, cached members
+and messages, and CPU time per presence event. Linux only (reads /proc).
+"""
+import argparse
+import asyncio
+import json
+import random
+import resource
+import subprocess
+import sys
+import time
+
+from benchmarks.run import REPO_ROOT
+
+GUILD_ID = 1 << 22
+ROLE_ID = GUILD_ID + 1
+CHANNEL_ID = GUILD_ID + 2
+CHUNK_SIZE = 1000 # Members per GUILD_MEMBERS_CHUNK, as Discord sends them
+ONLINE_SHARE = 0.3
+
+
+def _rss_mb(field="VmRSS"):
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return round(int(line.split()[1]) / 1024, 1)
+    return None
+
+
+def _peak_mb():
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+class Payloads:
+    """Deterministic member, presence and message payloads for a guild of `n_members`."""
+
+    def __init__(self, n_members, role_share, seed=1):
+        self.ids = list(range(1_000_000, 1_000_000 + n_members))
+        step = max(1, round(1 / role_share))
+        self.role_ids = set(self.ids[::step])
+        rng = random.Random(seed)
+        self.online = {uid for uid in self.ids if rng.random() < ONLINE_SHARE}
+
+    def guild(self, role_name):
+        role = {"color": 0, "hoist": False, "managed": False, "mentionable": False, "permissions": "0", "flags": 0}
+        return {
+            "id": str(GUILD_ID), "name": "Benchmark", "owner_id": str(self.ids[0]),
+            "member_count": len(self.ids), "large": True, "features": [], "emojis": [], "stickers": [],
+            "roles": [
+                dict(role, id=str(GUILD_ID), name="@everyone", position=0),
+                dict(role, id=str(ROLE_ID), name=role_name, position=1)
+            ],
+            "channels": [{"id": str(CHANNEL_ID), "type": 0, "name": "knecht", "position": 0, "permission_overwrites": []}],
+            "members": [], "presences": [], "voice_states": [], "threads": []
+        }
+
+    @staticmethod
+    def user(uid):
+        return {"id": str(uid), "username": f"user{uid}", "discriminator": "0", "global_name": f"User {uid}", "avatar": None}
+
+    def member(self, uid):
+        return {
+            "user": self.user(uid), "roles": [str(ROLE_ID)] if uid in self.role_ids else [],
+            "joined_at": "2024-01-01T00:00:00+00:00", "deaf": False, "mute": False, "flags": 0
+        }
+
+    @staticmethod
+    def presence(uid, game="GTA", status="online"):
+        return {
+            "user": {"id": str(uid)}, "guild_id": str(GUILD_ID), "status": status,
+            "activities": [{"name": game, "type": 0, "created_at": 0}] if game else [],
+            "client_status": {"desktop": status}
+        }
+
+    def message(self, n, uid):
+        return {
+            "id": str(GUILD_ID + 1000 + n), "channel_id": str(CHANNEL_ID), "guild_id": str(GUILD_ID),
+            "author": self.user(uid), "member": {k: v for k, v in self.member(uid).items() if k != "user"},
+            "content": f"message {n} " + "x" * 80, "timestamp": "2026-01-01T00:00:00+00:00", "edited_timestamp": None,
+            "tts": False, "mention_everyone": False, "mentions": [], "mention_roles": [], "attachments": [],
+            "embeds": [], "pinned": False, "type": 0
+        }
+
+
+class FakeWebSocket:
+    """Answers member requests (chunk, query_members) with GUILD_MEMBERS_CHUNK payloads."""
+
+    def __init__(self, state, payloads):
+        self.state = state
+        self.payloads = payloads
+
+    async def request_chunks(self, guild_id, query=None, *, limit, user_ids=None, presences=False, nonce=None):
+        # Delivered after discord.py started waiting for them, like over the network
+        asyncio.get_running_loop().call_later(0.001, self._send, user_ids or self.payloads.ids, presences, nonce)
+
+    def _send(self, ids, presences, nonce):
+        p = self.payloads
+        chunks = [ids[i:i + CHUNK_SIZE] for i in range(0, len(ids), CHUNK_SIZE)]
+        for index, chunk in enumerate(chunks):
+            self.state.parse_guild_members_chunk({
+                "guild_id": str(GUILD_ID), "members": [p.member(uid) for uid in chunk],
+                "presences": [p.presence(uid) for uid in chunk if uid in p.online] if presences else [],
+                "chunk_index": index, "chunk_count": len(chunks), "nonce": nonce
+            })
+
+
+async def measure(mode, n_members, role_share, n_events, n_messages):
+    import discord
+    from src.bot import gateway_options
+    from src.config import TARGET_ROLE_NAME
+    from src.utils.traffic import cache_role_members, presence_index
+
+    lean = mode == "lean"
+    payloads = Payloads(n_members, role_share)
+    client = discord.Client(**gateway_options(lean))
+    await client._async_setup_hook()
+    state = client._connection
+    ws = FakeWebSocket(state, payloads)
+    state._get_websocket = lambda *args, **kwargs: ws
+
+    @client.event
+    async def on_presence_update(before, after):
+        presence_index.update(after)
+
+    result = {"mode": mode, "members": n_members, "role_members": len(payloads.role_ids), "rss_base_mb": _rss_mb()}
+
+    # Startup: GUILD_CREATE, the member cache and the online members' presences
+    cpu = time.process_time()
+    guild = state._add_guild_from_data(payloads.guild(TARGET_ROLE_NAME))
+    if lean:
+        await cache_role_members(guild)
+    else:
+        await guild.chunk()
+        presence_index.seed(guild)
+    for uid in payloads.ids:
+        if uid in payloads.online:
+            state.parse_presence_update(payloads.presence(uid))
+    await asyncio.sleep(0)
+    result["startup_cpu_s"] = round(time.process_time() - cpu, 3)
+    result["rss_startup_mb"] = _rss_mb()
+
+    # Chat in the guild's channels: only received with the message intents
+    if not lean:
+        for n in range(n_messages):
+            state.parse_message_create(payloads.message(n, payloads.ids[n % n_members]))
+
+    # Presence changes of random members; each one runs the bot's listener
+    rng = random.Random(2)
+    events = [
+        payloads.presence(rng.choice(payloads.ids), game=rng.choice(["GTA", "Minecraft", None]))
+        for _ in range(n_events)
+    ]
+    cpu = time.process_time()
+    for n, event in enumerate(events):
+        state.parse_presence_update(event)
+        if n % 100 == 99:
+            await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    cpu = time.process_time() - cpu
+
+    result.update({
+        "presence_event_us": round(cpu / n_events * 1e6, 2),
+        "cached_members": len(guild.members),
+        "cached_messages": len(state._messages or []),
+        "valid_players": len(presence_index.valid_players(guild)),
+        "rss_after_events_mb": _rss_mb(),
+        "rss_peak_mb": _peak_mb()
+    })
+    return result
+
+
+def run_child(args):
+    result = asyncio.run(measure(args.child, args.size, args.role_share, args.events, args.messages))
+    print(json.dumps(result))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="RSS and presence CPU of the full and lean gateway modes")
+    parser.add_argument("--members", type=int, nargs="+", default=[1000, 10_000, 100_000], help="Guild sizes")
+    parser.add_argument("--role-share", type=float, default=0.05, help="Share of the members with the role")
+    parser.add_argument("--events", type=int, default=20_000, help="PRESENCE_UPDATE events per run")
+    parser.add_argument("--messages", type=int, default=5000, help="MESSAGE_CREATE events (full mode)")
+    parser.add_argument("--output", help="JSON file to write")
+    parser.add_argument("--child", choices=["full", "lean"], help=argparse.SUPPRESS)
+    parser.add_argument("--size", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, REPO_ROOT)
+    if args.child:
+        return run_child(args)
+
+    results = []
+    for size in args.members:
+        for mode in ["full", "lean"]:
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.gateway", "--child", mode, "--size", str(size),
+                 "--role-share", str(args.role_share), "--events", str(args.events), "--messages", str(args.messages)],
+                cwd=REPO_ROOT, capture_output=True, text=True, check=True
+            )
+            result = json.loads(out.stdout.strip().splitlines()[-1])
+            results.append(result)
+            print(f"{size:>8} members {mode:>4}: startup {result['rss_startup_mb']} MB "
+                  f"(+{result['rss_startup_mb'] - result['rss_base_mb']:.1f}), after events {result['rss_after_events_mb']} MB, "
+                  f"peak {result['rss_peak_mb']} MB, {result['cached_members']} members cached, "
+                  f"{result['presence_event_us']} µs/presence event")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"role_share": args.role_share, "events": args.events, "results": results}, f, indent=4)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+"""
+Offline micro-benchmarks for the Knecht hot paths.
+
+    python -m benchmarks.run                      # small + medium
+    python -m benchmarks.run --scales large --backend sqlite
+    python -m benchmarks.compare old.json new.json
+
+Each scale runs against a fresh temp working directory (copy of config/ plus
+synthetic data/), so nothing in the repo's data/ is touched. Results are
+written as JSON to benchmarks/results/<revision>.json unless --output is given.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from types import MappingProxyType
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCALES = {
+    "small": {"n_panels": 10, "n_events": 100, "history_days": 30, "n_members": 100},
+    "medium": {"n_panels": 1000, "n_events": 100_000, "history_days": 365, "n_members": 1000},
+    "large": {"n_panels": 10_000, "n_events": 1_000_000, "history_days": 3 * 365, "n_members": 10_000},
+}
+
+
+def summarize(samples):
+    ms = [s * 1000 for s in samples]
+    return {
+        "runs": len(ms),
+        "min_ms": round(min(ms), 4),
+        "median_ms": round(statistics.median(ms), 4),
+        "mean_ms": round(statistics.fmean(ms), 4),
+        "max_ms": round(max(ms), 4)
+    }
+
+
+def deep_sizeof(*objs):
+    """Approximate retained size of object graphs in bytes; shared objects are counted once."""
+    seen = set()
+    stack = list(objs)
+    total = 0
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        if isinstance(obj, (dict, MappingProxyType)):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        elif hasattr(obj, "__slots__"):
+            stack.extend(getattr(obj, name) for name in obj.__slots__ if hasattr(obj, name))
+        elif hasattr(obj, "__dict__"):
+            stack.append(obj.__dict__)
+    return total
+
+
+def bench(fn, repeat, setup=None):
+    samples = []
+    for i in range(repeat):
+        if setup:
+            setup(i)
+        start = time.perf_counter()
+        fn(i)
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def bench_async(coro_fn, repeat):
+    async def runner():
+        samples = []
+        for i in range(repeat):
+            start = time.perf_counter()
+            await coro_fn(i)
+            samples.append(time.perf_counter() - start)
+        return samples
+    return summarize(asyncio.run(runner()))
+
+
+def run_scale(name, params, backend, repeat):
+    from benchmarks.fakes import FakeBot, FakeUser, FakeInteraction, FakeGuild
+    from benchmarks.synthetic import build_state
+
+    workdir = tempfile.mkdtemp(prefix=f"knecht-bench-{name}-")
+    cwd = os.getcwd()
+    try:
+        shutil.copytree(os.path.join(REPO_ROOT, "config"), os.path.join(workdir, "config"))
+        os.makedirs(os.path.join(workdir, "data"))
+        settings_path = os.path.join(workdir, "config", "settings.json")
+        with open(settings_path) as f:
+            settings = json.load(f)
+        settings["storage_backend"] = backend
+        with open(settings_path, "w") as f:
+            json.dump(settings, f)
+
+        os.chdir(workdir)
+        print(f"[{name}] Generating data...")
+        generated = build_state(
+            workdir, params["n_panels"], params["n_events"], params["history_days"],
+            liveduration=settings.get("panel_liveduration", 60)
+        )
+
+        from src.cogs.knecht import Knecht
+        from src.utils.partition import DEFAULT_PARTITION
+        from src.utils.hof import HallOfFame
+        from src.utils.traffic import presence_index, get_valid_players
+        from src.utils.helpers import get_target_timezone
+        from src.config import TARGET_ROLE_NAME
+
+        results = {}
+        start = time.perf_counter()
+        cog = Knecht(FakeBot())
+        partition = cog.get_partition(DEFAULT_PARTITION)
+        results["first_load"] = summarize([time.perf_counter() - start])
+        # Fold the migrated/imported state into a snapshot before timing reloads
+        partition.save_stats(compact=True)
+        partition.persistence.flush_sync()
+
+        state_bytes = deep_sizeof(
+            partition.daily_work, partition.active_panels, partition.ids._keys, partition.ids._refs,
+            partition.daily_counts, partition.daily_profit, partition.daily_batteries,
+            partition.lifetime_profit, partition.lifetime_work
+        )
+        memory = {
+            "state_bytes": state_bytes,
+            "bytes_per_item": round(state_bytes / max(1, generated["events"] + generated["panels"]), 1)
+        }
+
+        print(f"[{name}] Timing...")
+        results["load_stats"] = bench(lambda i: partition.load_stats(), max(1, repeat // 5))
+
+        panels = list(partition.active_panels)
+        now = datetime.now(get_target_timezone())
+        results["calculate_panel_state_all_cold"] = bench(
+            lambda i: [partition.calculate_panel_state(p, now) for p in panels], repeat,
+            setup=lambda i: partition.panel_engine.clear()
+        )
+        results["calculate_panel_state_all_warm"] = bench(
+            lambda i: [partition.calculate_panel_state(p, now) for p in panels], repeat
+        )
+
+        results["count_reminder_eligible"] = bench(lambda i: partition.count_reminder_eligible(now), repeat)
+        results["next_collect_alert"] = bench(lambda i: partition.next_collect_alert(now), repeat)
+
+        results["get_daily_counts"] = bench(lambda i: partition.get_daily_counts(), repeat)
+        results["count_events"] = bench(lambda i: partition._count_events(), max(1, repeat // 5))
+
+        hof = HallOfFame("config/mechanics.json")
+        counts = partition.get_daily_counts()
+        results["hof_get_leaderboard"] = bench(
+            lambda i: hof.get_leaderboard(counts, partition.daily_profit, partition.daily_batteries), repeat
+        )
+
+        results["save_stats"] = bench(lambda i: partition.save_stats(), repeat)
+        results["save_stats_compact"] = bench(lambda i: partition.save_stats(compact=True), max(1, repeat // 5))
+
+        results["process_place"] = bench(lambda i: partition.process_place(FakeUser(900_000 + i)), repeat)
+        results["process_fix"] = bench(lambda i: partition.process_fix(FakeUser(800_000 + i)), repeat)
+
+        results["handle_container_interaction"] = bench_async(
+            lambda i: cog.handle_container_interaction(FakeInteraction(FakeUser(700_000 + i))), repeat
+        )
+        results["handle_fix_interaction"] = bench_async(
+            lambda i: cog.handle_fix_interaction(FakeInteraction(FakeUser(600_000 + i))), repeat
+        )
+
+        async def backup(i):
+            header, paths = await partition.create_backup(full=True, export=True)
+            partition.backups.discard(paths)
+        results["create_backup_full"] = bench_async(backup, max(1, repeat // 5))
+
+        guild = FakeGuild(1, TARGET_ROLE_NAME, params["n_members"])
+        results["get_valid_players_seed"] = bench(
+            lambda i: get_valid_players(guild), repeat,
+            setup=lambda i: presence_index.forget(guild)
+        )
+        results["get_valid_players"] = bench(lambda i: get_valid_players(guild), repeat)
+
+        # /knecht_status: one page (what a command or button click renders) vs. the whole report
+        def status_page(i):
+            report = cog.status_report(partition, guild)
+            return report.render_page(report.page_count // 2)
+        results["status_report_page"] = bench(status_page, repeat)
+        results["status_report_all"] = bench(
+            lambda i: cog.status_report(partition, guild).render_all(), max(1, repeat // 5)
+        )
+        presence_index.forget(guild)
+
+        # /knecht_stats: rollup rows vs. reading every archived day of the range
+        def drop_rollups(i):
+            partition.rollups._data = None
+            if os.path.exists(partition.rollups.path):
+                os.remove(partition.rollups.path)
+        results["stats_rollups_build"] = bench(
+            lambda i: partition.range_totals(*partition.archived_range()), 1, setup=drop_rollups
+        )
+        last_day = partition.archived_range()[1]
+        for label, first in [("90_days", last_day - timedelta(days=89)), ("all", partition.archived_range()[0])]:
+            results[f"stats_{label}"] = bench(lambda i: cog.stats_report(partition, first, last_day).render_all(), repeat)
+            results[f"stats_{label}_scan"] = bench(
+                lambda i: [partition._add_day(day, {}, {}, {}) for day in partition.history.iter_days(
+                    start=first.isoformat(), end=last_day.isoformat()
+                )], max(1, repeat // 5)
+            )
+
+        next_day = (datetime.fromisoformat(partition.last_reset_date) + timedelta(days=1)).date().isoformat()
+        results["reset_daily_stats"] = bench(lambda i: partition.reset_daily_stats(next_day), 1)
+        partition.persistence.flush_sync()
+        if partition.store:
+            partition.store.close()
+        partition.journal.close()
+
+        return {"params": {**params, **generated, "backend": backend, "minute": now.minute}, "memory": memory, "results": results}
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return "unknown"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Knecht hot path benchmarks")
+    parser.add_argument("--scales", nargs="+", default=["small", "medium"], choices=sorted(SCALES))
+    parser.add_argument("--backend", default="json", choices=["json", "sqlite"])
+    parser.add_argument("--repeat", type=int, default=20, help="Runs per benchmark (cheaper ones)")
+    parser.add_argument("--output", help="JSON file to write (default: benchmarks/results/<revision>.json)")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, REPO_ROOT)
+    revision = git_revision()
+    report = {
+        "revision": revision,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scales": {}
+    }
+    for name in args.scales:
+        report["scales"][name] = run_scale(name, SCALES[name], args.backend, args.repeat)
+
+    output = args.output or os.path.join(REPO_ROOT, "benchmarks", "results", f"{revision}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=4)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
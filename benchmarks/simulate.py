@@ -0,0 +1,311 @@
+"""
+Time-travel simulator: replays a stream of button presses through the real
+cog and scheduler logic on a simulated clock.
+
+    python -m benchmarks.simulate --hours 720                # generated stream, 30 days
+    python -m benchmarks.simulate --events presses.jsonl     # recorded stream
+    python -m benchmarks.simulate --history data/history     # replay archived days
+
+The real DeadlineScheduler.run() drives BackgroundTasks.on_deadline: between
+presses the simulated clock wakes it at every deadline (04:00 reset, XX:30,
+reminder minutes, collect alerts) with the clock standing on it. The report has reminder and
+alert counts, payouts and the cost of each operation, so logic and
+performance changes can be checked against the same stream.
+
+Event streams are JSONL, one press per line:
+    {"ts": "2026-01-05T12:31:00+01:00", "op": "place", "user": 17}
+with op one of place, fix, container, hafenevent. Generated streams are
+deterministic for a given --seed.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.run import REPO_ROOT, summarize
+
+OPS = ("place", "fix", "container", "hafenevent")
+# Archived work categories -> the press that created them
+HISTORY_OPS = {"placed": "place", "fixes": "fix", "containers": "container", "hafenevents": "hafenevent"}
+CHANNEL_ID = 1
+
+
+def generate(rng, start, hours, n_users, places_per_hour=1.5, fix_rate=0.8, extras_per_hour=0.3):
+    """
+    A press stream: placements spread over the hour, most hours a fix in the
+    XX:30-XX:59 window, and presses right on the edges (XX:29:59, XX:30:00,
+    XX:59:59, 03:59:59, 04:00:00) where the window and reset logic switch.
+    """
+    from src.utils.helpers import get_target_timezone
+    tz = get_target_timezone()
+    events = []
+    for h in range(hours):
+        hour = start + timedelta(hours=h)
+        user = lambda: rng.randrange(1, n_users + 1)
+        for _ in range(_poisson(rng, places_per_hour)):
+            events.append((hour + timedelta(seconds=rng.randrange(3600)), "place", user()))
+        if rng.random() < fix_rate:
+            events.append((hour + timedelta(minutes=30, seconds=rng.randrange(1800)), "fix", user()))
+        for _ in range(_poisson(rng, extras_per_hour)):
+            events.append((hour + timedelta(seconds=rng.randrange(3600)), rng.choice(["container", "hafenevent"]), user()))
+        for edge in (timedelta(minutes=29, seconds=59), timedelta(minutes=30), timedelta(minutes=59, seconds=59)):
+            if rng.random() < 0.1:
+                events.append((hour + edge, "fix", user()))
+        local = hour.astimezone(tz)
+        if local.hour == 3 and rng.random() < 0.5:
+            events.append((hour + timedelta(minutes=59, seconds=59), rng.choice(OPS), user()))
+        if local.hour == 4 and rng.random() < 0.5:
+            events.append((hour, rng.choice(OPS), user()))
+    events.sort(key=lambda e: e[0])
+    return events
+
+
+def _poisson(rng, mean):
+    # Knuth; means here are small
+    n, p, limit = 0, 1.0, pow(2.718281828459045, -mean)
+    while True:
+        p *= rng.random()
+        if p < limit:
+            return n
+        n += 1
+
+
+def _timestamp(value):
+    """ISO text (naive means target timezone) -> aware datetime."""
+    from src.utils.records import to_datetime, to_epoch
+    return to_datetime(to_epoch(value))
+
+
+def load_events(path):
+    events = []
+    with open(path, "r") as f:
+        for line in f:
+            if line.strip():
+                e = json.loads(line)
+                events.append((_timestamp(e["ts"]), e["op"], int(e["user"])))
+    events.sort(key=lambda e: e[0])
+    return events
+
+
+def history_events(history_dir):
+    """Presses reconstructed from archived days (every recorded event is one press)."""
+    from src.utils.history import HistoryArchive
+    events = []
+    for day in HistoryArchive(history_dir).iter_days():
+        for cat, entries in day.get("work", {}).items():
+            op = HISTORY_OPS.get(cat)
+            if op:
+                events.extend((_timestamp(e["timestamp"]), op, int(e["user_id"])) for e in entries)
+    events.sort(key=lambda e: e[0])
+    return events
+
+
+class SimChannel:
+    """The partition's channel: counts what the tasks post instead of sending it."""
+
+    def __init__(self, guild):
+        self.id = CHANNEL_ID
+        self.guild = guild
+        self.messages = []
+
+    async def send(self, content=None, **kwargs):
+        self.messages.append((content or "", kwargs))
+
+    def get_partial_message(self, message_id):
+        return None
+
+
+class SimBot:
+    def __init__(self, channel):
+        self.channel = channel
+        self.cogs = {}
+
+    def add_view(self, view):
+        pass
+
+    def add_dynamic_items(self, *items):
+        pass
+
+    def get_channel(self, channel_id):
+        return self.channel if channel_id == CHANNEL_ID else None
+
+    def get_cog(self, name):
+        return self.cogs.get(name)
+
+
+async def simulate(events, start, end, n_members):
+    from benchmarks.fakes import FakeGuild, FakeInteraction, FakeUser
+    from src.cogs.knecht import Knecht
+    from src.cogs.tasks import BackgroundTasks
+    from src.config import TARGET_ROLE_NAME
+    from src.utils.partition import DEFAULT_PARTITION
+    from src.utils.records import SimulatedClock, set_clock, to_epoch
+    from src.utils.scheduler import REMINDER
+
+    clock = SimulatedClock(to_epoch(start))
+    previous_clock = set_clock(clock)
+    try:
+        channel = SimChannel(FakeGuild(1, TARGET_ROLE_NAME, n_members))
+        bot = SimBot(channel)
+        knecht = Knecht(bot)
+        tasks = BackgroundTasks(bot)
+        bot.cogs = {"Knecht": knecht, "BackgroundTasks": tasks}
+        partition = knecht.get_partition(DEFAULT_PARTITION)
+        scheduler = tasks.scheduler
+        handlers = {
+            "place": knecht.handle_place_interaction,
+            "fix": knecht.handle_fix_interaction,
+            "container": knecht.handle_container_interaction,
+            "hafenevent": knecht.handle_hafenevent_interaction,
+        }
+
+        costs = {}
+        counts = {"reminder_deadlines": 0, "reminders_sent": 0, "reminder_messages": 0,
+                  "reminder_mentions": 0, "collect_alerts": 0, "panels_announced": 0, "resets": 0}
+        users = {}
+
+        def timed(name, t0):
+            costs.setdefault(name, []).append(time.perf_counter() - t0)
+
+        async def on_deadline(now, kinds):
+            sent_before = len(channel.messages)
+            t0 = time.perf_counter()
+            await tasks.on_deadline(now, kinds)
+            timed("deadline." + "+".join(kinds), t0)
+            if REMINDER in kinds:
+                counts["reminder_deadlines"] += 1
+            _count_messages(channel.messages[sent_before:], counts)
+
+        # The real scheduler loop; clock.run_until() wakes it at every deadline
+        runner = asyncio.create_task(scheduler.run(on_deadline))
+        await asyncio.sleep(0) # Let it reach its first wait on the clock
+        wall = time.perf_counter()
+        try:
+            for ts, op, uid in events:
+                if ts < start or ts > end:
+                    continue
+                await clock.run_until(to_epoch(ts))
+                user = users.get(uid) or users.setdefault(uid, FakeUser(uid))
+                interaction = FakeInteraction(user)
+                t0 = time.perf_counter()
+                await handlers[op](interaction)
+                timed(op, t0)
+            await clock.run_until(to_epoch(end))
+        finally:
+            runner.cancel()
+            await asyncio.gather(runner, return_exceptions=True)
+            await scheduler.flush()
+        wall = time.perf_counter() - wall
+
+        hours = (end - start).total_seconds() / 3600
+        lifetime = dict(partition.lifetime_profit)
+        for uid, val in partition.daily_profit.items():
+            lifetime[uid] = lifetime.get(uid, 0) + val
+        top = sorted(lifetime.items(), key=lambda x: x[1], reverse=True)[:5]
+        result = {
+            "simulated_hours": round(hours, 2),
+            "wall_seconds": round(wall, 3),
+            "hours_per_second": round(hours / wall, 1) if wall else None,
+            "presses": {op: len(costs.get(op, [])) for op in OPS},
+            "counts": counts,
+            "payouts": {
+                "total_profit": sum(lifetime.values()),
+                "batteries": sum(partition.daily_batteries.values()) + _archived_batteries(partition),
+                "top_users": [[uid, val] for uid, val in top],
+                "active_panels_at_end": len(partition.active_panels)
+            },
+            "cost": {name: summarize(samples) for name, samples in sorted(costs.items())}
+        }
+        await partition.close()
+        return result
+    finally:
+        set_clock(previous_clock)
+
+
+def _count_messages(messages, counts):
+    for content, kwargs in messages:
+        if content.startswith("⚠️"):
+            counts["reminders_sent"] += 1
+        if "Daily Report" in content:
+            counts["resets"] += 1
+        elif content.startswith("🔋"):
+            counts["collect_alerts"] += 1
+            counts["panels_announced"] += content.count("\n`")
+        allowed = kwargs.get("allowed_mentions")
+        if allowed is not None and isinstance(allowed.users, list) and allowed.users:
+            counts["reminder_messages"] += 1
+            counts["reminder_mentions"] += len(allowed.users)
+
+
+def _archived_batteries(partition):
+    return sum(sum(day.get("batteries", {}).values()) for day in partition.history.iter_days())
+
+
+def run(events, start, end, n_members, backend):
+    workdir = tempfile.mkdtemp(prefix="knecht-sim-")
+    cwd = os.getcwd()
+    try:
+        shutil.copytree(os.path.join(REPO_ROOT, "config"), os.path.join(workdir, "config"))
+        os.makedirs(os.path.join(workdir, "data"))
+        settings_path = os.path.join(workdir, "config", "settings.json")
+        with open(settings_path) as f:
+            settings = json.load(f)
+        settings["storage_backend"] = backend
+        settings["partition_by"] = "none"
+        settings["partitions"] = {"default": {"channel_id": CHANNEL_ID}}
+        with open(settings_path, "w") as f:
+            json.dump(settings, f)
+        os.chdir(workdir)
+        return asyncio.run(simulate(events, start, end, n_members))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay button presses on a simulated clock")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--events", help="JSONL press stream to replay")
+    source.add_argument("--history", help="History directory (data/history) to replay")
+    parser.add_argument("--hours", type=int, default=24 * 7, help="Length of a generated stream")
+    parser.add_argument("--start", default="2026-01-05T03:00", help="Start of a generated stream (local time)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--users", type=int, default=40)
+    parser.add_argument("--members", type=int, default=200, help="Members with the role (for reminder mentions)")
+    parser.add_argument("--backend", default="json", choices=["json", "sqlite"])
+    parser.add_argument("--output", help="JSON file to write (default: print)")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, REPO_ROOT)
+    from src.utils.helpers import get_target_timezone
+    tz = get_target_timezone()
+
+    if args.events or args.history:
+        events = load_events(args.events) if args.events else history_events(args.history)
+        if not events:
+            parser.error("the stream has no events")
+        start = events[0][0].astimezone(tz).replace(minute=0, second=0, microsecond=0) - timedelta(hours=1)
+        end = events[-1][0].astimezone(tz) + timedelta(hours=1)
+    else:
+        start = tz.localize(datetime.fromisoformat(args.start))
+        end = start + timedelta(hours=args.hours)
+        events = generate(random.Random(args.seed), start, args.hours, args.users)
+
+    result = run(events, start, end, args.members, args.backend)
+    text = json.dumps(result, indent=4)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+        print(f"Results written to {args.output}")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Synthetic Knecht state at a given scale, written in the on-disk layout the cog loads."""
+import json
+import random
+import uuid
+from datetime import datetime, timedelta
+
+from src.utils.helpers import get_target_timezone
+from src.utils.history import HistoryArchive
+
+CATEGORIES = ["placed", "fixes", "containers", "hafenevents"]
+
+
+def current_reset_date(now):
+    """The reset date check_daily_reset() expects for `now`, so loading doesn't trigger a reset."""
+    if now.hour >= 4:
+        return now.date().isoformat()
+    return (now.date() - timedelta(days=1)).isoformat()
+
+
+def make_panel(rng, now, user_ids, liveduration):
+    # Placed within the live duration, so nothing is collected on load
+    placed_at = now - timedelta(minutes=rng.randrange(0, max(1, liveduration - 1)))
+    interactions = [{"user_id": str(rng.choice(user_ids)), "action": "place", "timestamp": placed_at.isoformat()}]
+    t = placed_at
+    while True:
+        t = t.replace(minute=30 + rng.randrange(0, 30), second=rng.randrange(0, 60)) + timedelta(hours=1)
+        if t >= now:
+            break
+        interactions.append({"user_id": str(rng.choice(user_ids)), "action": "fix", "timestamp": t.isoformat()})
+    return {
+        "id": uuid.UUID(int=rng.getrandbits(128)).hex,
+        "placed_by": int(interactions[0]["user_id"]),
+        "placed_by_name": f"user{interactions[0]['user_id']}",
+        "placed_at_iso": placed_at.isoformat(),
+        "remaining_minutes": liveduration,
+        "interactions": interactions
+    }
+
+
+def make_events(rng, n_events, user_ids, day_start):
+    work = {cat: [] for cat in CATEGORIES}
+    profit = {}
+    for i in range(n_events):
+        cat = CATEGORIES[i % len(CATEGORIES)]
+        uid = str(rng.choice(user_ids))
+        work[cat].append({
+            "id": f"{rng.getrandbits(24):06x}",
+            "user_id": uid,
+            "timestamp": (day_start + timedelta(seconds=rng.randrange(0, 86400))).isoformat(),
+            "type": cat,
+            "details": {}
+        })
+        if cat in ("containers", "hafenevents"):
+            profit[uid] = profit.get(uid, 0) + (90000 if cat == "containers" else 24000)
+    return work, profit
+
+
+def build_state(workdir, n_panels, n_events, history_days, events_per_day=400, n_users=200, liveduration=284, seed=1):
+    """
+    Write data/knecht.json and data/history/ under `workdir` (the cog's working
+    directory) and return a small description of what was generated.
+    """
+    rng = random.Random(seed)
+    tz = get_target_timezone()
+    now = datetime.now(tz)
+    user_ids = list(range(1, n_users + 1))
+
+    panels = [make_panel(rng, now, user_ids, liveduration) for _ in range(n_panels)]
+    work, profit = make_events(rng, n_events, user_ids, now - timedelta(hours=12))
+
+    lifetime_work = {cat: {str(u): rng.randrange(0, 5000) for u in user_ids} for cat in CATEGORIES}
+    lifetime_profit = {str(u): rng.randrange(0, 10**9) for u in user_ids}
+    state = {
+        "active_panels": panels,
+        "daily_work": work,
+        "daily_profit": profit,
+        "daily_batteries": {str(u): rng.randrange(0, 20) for u in user_ids[:50]},
+        "lifetime_work": lifetime_work,
+        "lifetime_profit": lifetime_profit,
+        "last_reset_date": current_reset_date(now),
+        "tracking_message_id": None
+    }
+    with open(f"{workdir}/data/knecht.json", "w") as f:
+        json.dump(state, f)
+
+    history = HistoryArchive(f"{workdir}/data/history")
+    day = now.date() - timedelta(days=history_days)
+    batch = []
+    for _ in range(history_days):
+        day_start = datetime.combine(day, datetime.min.time())
+        day_work, day_profit = make_events(rng, events_per_day, user_ids, day_start)
+        batch.append({"date": day.isoformat(), "work": day_work, "profit": day_profit, "batteries": {}})
+        if len(batch) >= 100:
+            history.extend(batch)
+            batch = []
+        day += timedelta(days=1)
+    if batch:
+        history.extend(batch)
+
+    return {
+        "panels": n_panels,
+        "events": n_events,
+        "history_days": history_days,
+        "history_events": history_days * events_per_day,
+        "users": n_users
+    }
@@ -1,9 +1,12 @@
+import time
+STARTED = time.perf_counter() # Before the imports, for the startup timing
+
 from src.config import TOKEN
 from src.bot import AhlwardtBot
 
 if __name__ == "__main__":
     if TOKEN:
-        bot = AhlwardtBot()
+        bot = AhlwardtBot(started=STARTED)
         bot.run(TOKEN)
     else:
         print("Error: DISCORD_TOKEN not found in .env")
@@ -0,0 +1,35 @@
+"""
+Rebuild a data directory from Knecht backups (weekly uploads or /knecht_export).
+
+    python restore.py backups/*.jsonl.gz* --data-dir data
+    python restore.py knecht_200-*.gz* --data-dir data/partitions/200 --force
+
+Pass the newest full backup and the deltas that follow it (all parts, any
+order). The result is a knecht.json snapshot plus history segments; with the
+SQLite backend, delete the old database and the bot imports them on start.
+"""
+import argparse
+import sys
+
+from src.utils.backup import restore
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Restore Knecht state from backup files.")
+    parser.add_argument("files", nargs="+", help="Backup files (.jsonl.gz or .jsonl.gz.001, .002, ...)")
+    parser.add_argument("--data-dir", default="data", help="Directory to restore into (default: data)")
+    parser.add_argument("--force", action="store_true", help="Overwrite an existing snapshot, journal and history")
+    args = parser.parse_args(argv)
+
+    try:
+        summary = restore(args.files, args.data_dir, force=args.force)
+    except ValueError as e:
+        print(f"Restore failed: {e}")
+        return 1
+    print(f"Restored {summary['days']} archived days into {args.data_dir} from {', '.join(summary['backups'])}")
+    print(f"Snapshot day: {summary['last_reset_date']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
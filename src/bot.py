@@ -1,27 +1,148 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
 import discord
 from discord.ext import commands
-from src.config import TARGET_GUILD_ID
+from src.config import TARGET_GUILD_ID, EXTRA_GUILD_IDS
+from src.utils.config_manager import config_manager, SETTINGS_FILE, PERMS_FILE, MECHANICS_FILE
+from src.utils.metrics import metrics
+from src.utils.persistence import atomic_write_json
 
-class AhlwardtBot(commands.Bot):
-    def __init__(self):
-        intents = discord.Intents.default()
-        intents.message_content = True
+# Fingerprint of the command tree last synced to each guild
+COMMAND_SYNC_FILE = "data/command_sync.json"
+
+
+def gateway_options(lean=False):
+    """
+    Intents and caches for the gateway connection. The bot only reads
+    interactions and the presences of members with the role, so lean mode
+    (settings.json "lean_gateway") drops message events and the message
+    cache and caches no members by itself: Knecht caches the role members
+    (see cache_role_members). Presence events of everyone else are dropped
+    by discord.py without building a member.
+    """
+    if lean:
+        intents = discord.Intents.none()
+        intents.guilds = True
         intents.members = True
         intents.presences = True
-        super().__init__(command_prefix='/', intents=intents)
+        return {
+            "intents": intents,
+            "max_messages": None,
+            "member_cache_flags": discord.MemberCacheFlags.none(),
+            "chunk_guilds_at_startup": False
+        }
+    intents = discord.Intents.default()
+    intents.message_content = True
+    intents.members = True
+    intents.presences = True
+    return {"intents": intents}
+
+
+# Sharded, so one process can serve many guilds; with a single shard it behaves like commands.Bot
+class AhlwardtBot(commands.AutoShardedBot):
+    def __init__(self, started=None, lean_gateway=None):
+        if lean_gateway is None:
+            # Read once: the intents can't change without reconnecting
+            lean_gateway = config_manager.settings.get("lean_gateway", False)
+        self.lean_gateway = lean_gateway
+        super().__init__(command_prefix='/', **gateway_options(lean_gateway))
+        # Startup phases in seconds, see _report_startup()
+        self.started = started if started is not None else time.perf_counter()
+        self.startup = {"imports": time.perf_counter() - self.started}
+        self._startup_report = None
+
+    def _phase(self, name, since):
+        self.startup[name] = time.perf_counter() - since
+        metrics.observe(f"startup.{name}", self.startup[name] * 1000)
 
     async def setup_hook(self):
-        # Load extensions
+        # The config files don't depend on each other: parse them side by side
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            asyncio.to_thread(config_manager.file, path) for path in [SETTINGS_FILE, PERMS_FILE, MECHANICS_FILE]
+        ))
+        self._phase("config", start)
+
+        # Load extensions. Knecht keeps loading its partitions in worker threads
+        # while the commands are synced and the gateway connects.
+        start = time.perf_counter()
         start_extensions = ['src.cogs.knecht', 'src.cogs.tasks']
-        for extension in start_extensions:
-            await self.load_extension(extension)
+        await asyncio.gather(*(self.load_extension(extension) for extension in start_extensions))
+        self._phase("cogs", start)
+        self._startup_report = asyncio.create_task(self._report_startup(start))
+
+        start = time.perf_counter()
+        await self.sync_commands()
+        self._phase("sync", start)
 
-        # Sync commands
-        if TARGET_GUILD_ID:
-            guild = discord.Object(id=TARGET_GUILD_ID)
+    async def _report_startup(self, cogs_started):
+        """Print how long each startup phase took, once the gateway is ready and the state is loaded."""
+        async def ready():
+            await self.wait_until_ready()
+            self._phase("ready", self.started) # Since the process started
+
+        async def loaded():
+            knecht = self.get_cog("Knecht")
+            if knecht:
+                await knecht.loaded.wait()
+                self._phase("partitions", cogs_started) # Overlaps the sync and the gateway connect
+
+        await asyncio.gather(ready(), loaded())
+        print("[Startup] " + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.startup.items()))
+
+    def command_fingerprint(self, guild):
+        """Hash of the commands as they would be synced to `guild`."""
+        payload = sorted(
+            (command.to_dict(self.tree) for command in self.tree.get_commands(guild=guild)),
+            key=lambda c: (c.get("type", 1), c["name"])
+        )
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+    async def sync_commands(self, force=False):
+        """
+        Sync the slash commands to every configured guild whose command tree
+        changed since the last sync (see COMMAND_SYNC_FILE). Delete that file
+        or pass force=True to sync everything again.
+        """
+        synced = {}
+        if os.path.exists(COMMAND_SYNC_FILE):
+            try:
+                with open(COMMAND_SYNC_FILE, "r") as f:
+                    synced = json.load(f)
+            except Exception as e:
+                print(f"Error loading {COMMAND_SYNC_FILE}: {e}")
+
+        pending = {}
+        for guild_id in [TARGET_GUILD_ID, *EXTRA_GUILD_IDS]:
+            if not guild_id:
+                continue
+            guild = discord.Object(id=guild_id)
             self.tree.copy_global_to(guild=guild)
-            await self.tree.sync(guild=guild)
-            print(f"Synced commands to guild {TARGET_GUILD_ID}")
+            # Another application (token) has its own commands
+            key = f"{self.application_id}:{guild_id}"
+            fingerprint = self.command_fingerprint(guild)
+            if force or synced.get(key) != fingerprint:
+                pending[key] = (guild, fingerprint)
+            else:
+                print(f"Commands for guild {guild_id} unchanged, not syncing")
+
+        async def sync(key, guild, fingerprint):
+            try:
+                await self.tree.sync(guild=guild)
+            except discord.HTTPException as e:
+                print(f"Syncing commands to guild {guild.id} failed: {e}")
+                return
+            synced[key] = fingerprint
+            print(f"Synced commands to guild {guild.id}")
+
+        if pending:
+            await asyncio.gather(*(sync(key, *value) for key, value in pending.items()))
+            os.makedirs(os.path.dirname(COMMAND_SYNC_FILE), exist_ok=True)
+            atomic_write_json(COMMAND_SYNC_FILE, synced)
+        return len(pending)
 
     async def on_ready(self):
         import uuid
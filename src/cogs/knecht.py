@@ -1,15 +1,30 @@
+import asyncio
 import discord
 from discord import app_commands
 from discord.ext import commands
 from datetime import datetime, timedelta
-import json
+import io
 import os
-import uuid
+import time
 from src.utils.helpers import get_target_timezone
-from src.utils.traffic import check_traffic_debug
+from src.utils.traffic import cache_role_members, describe_member, presence_index, GameMatcher
 from src.utils.hof import HallOfFame
 from src.utils.permissions import check_permissions
-
+from src.utils.partition import KnechtPartition, DEFAULT_PARTITION
+from src.utils.records import int_keys, local_now, to_datetime
+from src.utils.report import (
+    PagedReport, Section, MAX_BUTTON_PAGES, best_days_section, hours_section, lines_section, profit_section,
+    trend_section, value_section, work_section
+)
+from src.utils.backup import part_limit
+from src.utils.metrics import metrics, PrometheusExporter
+from src.utils.config_manager import config_manager, SETTINGS_FILE
+from src.config import TARGET_GUILD_ID, TARGET_CHANNEL_ID, BACKUP_CHANNEL_ID
+
+PARTITIONS_DIR = "data/partitions"
+
+class StillLoading(app_commands.CheckFailure):
+    """An app command arrived before the partitions were loaded."""
 
 class KnechtView(discord.ui.View):
     def __init__(self, cog):
@@ -18,506 +33,401 @@ class KnechtView(discord.ui.View):
 
     @discord.ui.button(label="Place Panel", style=discord.ButtonStyle.primary, emoji="➕", custom_id="knecht_place_panel")
     async def place_panel_callback(self, interaction: discord.Interaction, button: discord.ui.Button):
-        await self.cog.handle_place_interaction(interaction)
+        async with metrics.track(interaction, "button.place"):
+            await self.cog.until_loaded(interaction)
+            await self.cog.handle_place_interaction(interaction)
 
     @discord.ui.button(label="Fix Panels", style=discord.ButtonStyle.success, emoji="✅", custom_id="knecht_fix_panels")
     async def fix_panels_callback(self, interaction: discord.Interaction, button: discord.ui.Button):
-        await self.cog.handle_fix_interaction(interaction, is_reminder=True)
+        async with metrics.track(interaction, "button.fix"):
+            await self.cog.until_loaded(interaction)
+            await self.cog.handle_fix_interaction(interaction, is_reminder=True)
 
     @discord.ui.button(label="Container", style=discord.ButtonStyle.secondary, emoji="📦", custom_id="knecht_container")
     async def container_callback(self, interaction: discord.Interaction, button: discord.ui.Button):
-        await self.cog.handle_container_interaction(interaction)
+        async with metrics.track(interaction, "button.container"):
+            await self.cog.until_loaded(interaction)
+            await self.cog.handle_container_interaction(interaction)
 
     @discord.ui.button(label="Hafenevent", style=discord.ButtonStyle.danger, emoji="⚓", custom_id="knecht_hafenevent")
     async def hafenevent_callback(self, interaction: discord.Interaction, button: discord.ui.Button):
-        await self.cog.handle_hafenevent_interaction(interaction)
+        async with metrics.track(interaction, "button.hafenevent"):
+            await self.cog.until_loaded(interaction)
+            await self.cog.handle_hafenevent_interaction(interaction)
+
+
+class ReportPageButton(
+    discord.ui.DynamicItem[discord.ui.Button],
+    template=r"knecht:report:(?P<kind>status|daily|stats):(?P<key>[\w-]+):(?P<date>[\w-]*):(?P<page>\d+)"
+):
+    """
+    Previous/next button of a paged report. The custom id carries everything
+    needed to rebuild the page, so the buttons keep working after a restart.
+    """
+
+    def __init__(self, kind, key, date, page, label="◀", disabled=False):
+        super().__init__(discord.ui.Button(
+            label=label, style=discord.ButtonStyle.secondary, disabled=disabled,
+            custom_id=f"knecht:report:{kind}:{key}:{date}:{page}"
+        ))
+        self.kind = kind
+        self.key = key
+        self.date = date
+        self.page = page
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(match["kind"], match["key"], match["date"], int(match["page"]), item.label)
+
+    async def callback(self, interaction: discord.Interaction):
+        cog = interaction.client.get_cog("Knecht")
+        async with metrics.track(interaction, "button.report_page"):
+            await cog.until_loaded(interaction)
+            await cog.show_report_page(interaction, self.kind, self.key, self.date, self.page)
+
+
+def report_view(kind, key, date, page, page_count):
+    """◀/▶ buttons for page `page` of a report, or None for a single page."""
+    if page_count <= 1:
+        return None
+    page = max(0, min(page, page_count - 1))
+    view = discord.ui.View(timeout=None)
+    view.add_item(ReportPageButton(kind, key, date, max(page - 1, 0), "◀", disabled=page == 0))
+    view.add_item(ReportPageButton(kind, key, date, min(page + 1, page_count - 1), "▶", disabled=page == page_count - 1))
+    return view
 
 
 class Knecht(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.tracking_data = {
-            "fixed_this_hour": 0
-        }
-        
-        self.active_panels = [] # List of panel objects
-        
-        # New structure for daily work: Lists of Event Objects
-        # Event: { "id": str, "user_id": str, "timestamp": str, "type": str, "details": dict }
-        self.daily_work = {
-            "placed": [],      
-            "fixes": [],       
-            "containers": [],  
-            "hafenevents": []  
-        }
-        
-        self.daily_profit = {}    # { user_id: amount }
-        self.daily_batteries = {} # { user_id: count }
-        
-        self.lifetime_profit = {} # { user_id: amount }
-        self.lifetime_work = {
-             "placed": {},
-             "fixes": {},
-             "containers": {},
-             "hafenevents": {}
-        }
-        
-        self.history = [] # List of archived daily stats
-        self.last_reset_date = None
-        self.tracking_message_id = None
-        self.data_file = "data/knecht.json"
-        
-        # Ensure data directory exists
-        os.makedirs(os.path.dirname(self.data_file), exist_ok=True)
-        
-        self.settings_file = "config/settings.json"
-        self.settings = {"panel_liveduration": 60}
-        self.load_settings()
+
+        # Optional Prometheus export of the latency metrics (file and/or localhost port)
+        self.metrics_exporter = PrometheusExporter(
+            metrics,
+            path=self.settings.get("metrics_prometheus_file"),
+            port=self.settings.get("metrics_prometheus_port")
+        )
 
         self.hof = HallOfFame("config/mechanics.json")
-        self.load_stats()
+
+        # One KnechtPartition per guild (or per channel with "partition_by": "channel").
+        # The default partition (TARGET_GUILD_ID) keeps its files in data/, every
+        # other one in data/partitions/<key>/. Partitions with data on disk or an
+        # entry in settings.json "partitions" are loaded by cog_load(), so the
+        # scheduler covers them; new ones are created on their first interaction.
+        self.partitions = {}
+        # Set once cog_load()'s partitions are loaded; interactions wait for it
+        self.loaded = asyncio.Event()
+        self._loading = None
+        # Lean gateway mode: fetches the role members again every role_member_refresh_minutes
+        self._member_refresh = None
+
+        self._game_matchers = self.settings.get("game_matchers")
+        presence_index.set_matcher(GameMatcher.from_settings(self._game_matchers))
+
+    @property
+    def settings(self):
+        """Current settings.json (read-only, reloaded when the file changes)."""
+        return config_manager.settings
+
+    def _settings_changed(self, settings):
+        # Rebuilding the matcher drops the presence index, so only do it when needed
+        if settings.get("game_matchers") != self._game_matchers:
+            self._game_matchers = settings.get("game_matchers")
+            presence_index.set_matcher(GameMatcher.from_settings(self._game_matchers))
 
     async def cog_load(self):
-        """Register persistent views on load."""
+        """Register persistent views and start loading the partitions."""
         self.bot.add_view(KnechtView(self))
-        # Ensure reset check happens on load
-        self.check_daily_reset()
-        
-    def load_settings(self):
-        """Load settings from JSON."""
-        if os.path.exists(self.settings_file):
-            try:
-                with open(self.settings_file, "r") as f:
-                    self.settings = json.load(f)
-            except Exception as e:
-                print(f"Error loading settings: {e}")
-
-    def save_stats(self):
-        """Save daily_stats to JSON file."""
+        self.bot.add_dynamic_items(ReportPageButton)
+        config_manager.file(SETTINGS_FILE).on_change(self._settings_changed)
+        metrics.instrument_http(self.bot.http)
+        await self.metrics_exporter.start()
+        # The gateway connects meanwhile; interactions and the scheduler wait for self.loaded
+        self._loading = asyncio.create_task(self._load())
+
+    async def _load(self):
         try:
-            with open(self.data_file, 'w') as f:
-                data = {
-                    "active_panels": self.active_panels,
-                    "daily_batteries": self.daily_batteries,
-                    "daily_work": self.daily_work,
-                    "daily_profit": self.daily_profit,
-                    "lifetime_profit": self.lifetime_profit,
-                    "lifetime_work": self.lifetime_work,
-                    "history": self.history,
-                    "last_reset_date": self.last_reset_date,
-                    "tracking_message_id": self.tracking_message_id
-                }
-                json.dump(data, f, indent=4)
+            await self.load_partitions()
+            # Ensure reset check happens on load
+            for partition in self.partitions.values():
+                partition.check_daily_reset()
         except Exception as e:
-            print(f"Error saving stats: {e}")
-
-    def load_stats(self):
-        """Load daily_stats from JSON file."""
-        # Migration from panels.json if knecht.json doesn't exist?
-        # For now, let's just look for knecht.json, but maybe we should copy panels.json content if it exists and knecht doesn't.
-        if not os.path.exists(self.data_file):
-            if os.path.exists("data/panels.json"):
-                print("Migrating data/panels.json to data/knecht.json...")
-                try:
-                    with open("data/panels.json", 'r') as f:
-                        old_data = json.load(f)
-                    
-                    # Migrate known fields
-                    self.active_panels = old_data.get("active_panels", [])
-                    self.daily_batteries = {str(k): v for k, v in old_data.get("daily_batteries", {}).items()}
-                    self.daily_profit = {str(k): v for k, v in old_data.get("daily_profit", {}).items()}
-                    self.lifetime_profit = {str(k): v for k, v in old_data.get("lifetime_profit", {}).items()}
-                    self.history = old_data.get("history", [])
-                    self.last_reset_date = old_data.get("last_reset_date")
-                    self.tracking_message_id = old_data.get("tracking_message_id")
-                    
-                    dw = old_data.get("daily_work", {})
-                    self.daily_work["placed"] = {str(k): v for k, v in dw.get("placed", {}).items()}
-                    self.daily_work["fixes"] = {str(k): v for k, v in dw.get("fixes", {}).items()}
-                    
-                    lw = old_data.get("lifetime_work", {})
-                    self.lifetime_work["placed"] = {str(k): v for k, v in lw.get("placed", {}).items()}
-                    self.lifetime_work["fixes"] = {str(k): v for k, v in lw.get("fixes", {}).items()}
-                    
-                    self.save_stats() # Save as knecht.json
-                except Exception as e:
-                    print(f"Error migrating stats: {e}")
+            # Running without the state would lose every click
+            print(f"Error loading partitions, shutting down: {e}")
+            self._loading = None # cog_unload() must not wait for this task
+            await self.bot.close()
+            return
+        self.loaded.set()
+
+    async def cog_unload(self):
+        """Flush pending writes of every partition before shutting down."""
+        config_manager.file(SETTINGS_FILE).remove_listener(self._settings_changed)
+        self.bot.remove_dynamic_items(ReportPageButton)
+        if self._loading:
+            await asyncio.gather(self._loading, return_exceptions=True)
+        if self._member_refresh:
+            self._member_refresh.cancel()
+        for partition in self.partitions.values():
+            await partition.close()
+        await self.metrics_exporter.stop()
+
+    # --- Partitions ---
+
+    def partition_key(self, guild_id, channel_id=None):
+        """
+        Key of the partition that owns a guild/channel. Everything maps to the
+        default partition with "partition_by": "none", without TARGET_GUILD_ID
+        (single-server setups) and for DMs.
+        """
+        mode = self.settings.get("partition_by", "guild")
+        if mode == "none" or not TARGET_GUILD_ID or not guild_id:
+            return DEFAULT_PARTITION
+        if guild_id == TARGET_GUILD_ID and (mode != "channel" or channel_id == TARGET_CHANNEL_ID):
+            return DEFAULT_PARTITION
+        if mode == "channel":
+            return f"{guild_id}-{channel_id}"
+        return str(guild_id)
+
+    async def load_partitions(self):
+        """
+        Load every known partition. Each one reads only its own files, so they
+        are loaded side by side in worker threads.
+        """
+        keys = set(self.settings.get("partitions", {}))
+        if os.path.isdir(PARTITIONS_DIR):
+            keys.update(d for d in os.listdir(PARTITIONS_DIR) if os.path.isdir(os.path.join(PARTITIONS_DIR, d)))
+        keys = [key for key in [DEFAULT_PARTITION, *sorted(keys - {DEFAULT_PARTITION})] if key not in self.partitions]
+        for key in keys:
+            # Known before the data is, so the presence index is seeded with the right roles
+            self._set_role_name(key)
+        start = time.perf_counter()
+        loaded = await asyncio.gather(*(asyncio.to_thread(self._load_partition, key) for key in keys))
+        for partition in loaded:
+            self._add_partition(partition)
+        metrics.observe("startup.partitions", (time.perf_counter() - start) * 1000)
+        print(f"Loaded {len(loaded)} partitions in {time.perf_counter() - start:.2f}s")
+
+    def get_partition(self, key):
+        """The partition with this key, loading (or creating) it on first use."""
+        partition = self.partitions.get(key)
+        if partition is None:
+            partition = self._add_partition(self._load_partition(key))
+        return partition
+
+    def _load_partition(self, key):
+        """Load (or create) a partition. Runs in a worker thread at startup, so it leaves the cog alone."""
+        config = self.settings.get("partitions", {}).get(key, {})
+        if key == DEFAULT_PARTITION:
+            data_dir, channel_id, backup_channel_id = "data", TARGET_CHANNEL_ID, BACKUP_CHANNEL_ID
+        else:
+            data_dir, backup_channel_id = os.path.join(PARTITIONS_DIR, key), None
+            # Channel partitions post into their own channel
+            channel_id = int(key.split("-")[1]) if "-" in key else None
+        return KnechtPartition(
+            self.bot, key, data_dir, self.hof,
+            channel_id=channel_id, backup_channel_id=backup_channel_id, config=config
+        )
+
+    def _set_role_name(self, key):
+        role_name = self.settings.get("partitions", {}).get(key, {}).get("role_name")
+        guild_id, _, _ = key.partition("-")
+        if role_name and guild_id.isdigit():
+            presence_index.set_role_name(int(guild_id), role_name)
+
+    def _add_partition(self, partition):
+        self._set_role_name(partition.key)
+        partition.deadlines.listener = self._panel_deadlines_moved
+        self.partitions[partition.key] = partition
+        return partition
+
+    def _panel_deadlines_moved(self):
+        """A panel was placed/fixed/reverted: the scheduler recomputes its next collect alert."""
+        tasks_cog = self.bot.get_cog("BackgroundTasks")
+        if tasks_cog:
+            tasks_cog.scheduler.wake()
+
+    def partition_for(self, interaction: discord.Interaction):
+        return self.get_partition(self.partition_key(interaction.guild_id, interaction.channel_id))
+
+    async def interaction_check(self, interaction: discord.Interaction):
+        """Runs before every app command of this cog; starts its latency measurement."""
+        if not self.loaded.is_set():
+            # Answered by cog_app_command_error instead of waiting past the 3 s deadline
+            raise StillLoading()
+        if interaction.command:
+            metrics.start(interaction, f"command.{interaction.command.name}")
+        return True
+
+    @commands.Cog.listener()
+    async def on_app_command_completion(self, interaction: discord.Interaction, command):
+        metrics.finish(interaction)
+
+    async def _respond(self, interaction: discord.Interaction, *args, **kwargs):
+        """interaction.response.send_message, recording the time to the first response."""
+        if interaction.response.is_done():
+            # Acknowledged already (until_loaded(), /knecht_clear on an archived id)
+            await interaction.followup.send(*args, **kwargs)
             return
+        await interaction.response.send_message(*args, **kwargs)
+        metrics.acked(interaction)
+
+    async def until_loaded(self, interaction: discord.Interaction):
+        """
+        Wait for the partitions (see cog_load) before handling a button press.
+        While they are still loading, the press is acknowledged first, so it
+        doesn't fail the 3 s deadline right after a restart.
+        """
+        if not self.loaded.is_set():
+            await self._ack(interaction)
+            await self.loaded.wait()
 
+    async def _ack(self, interaction: discord.Interaction):
+        """
+        Acknowledge a button press before doing any work (deferred update, no
+        visible message), so the 3 s deadline never depends on the data size.
+        The answer is sent with _followup().
+        """
+        if interaction.response.is_done():
+            return # Already acknowledged by until_loaded()
         try:
-            with open(self.data_file, 'r') as f:
-                data = json.load(f)
-                
-                self.active_panels = data.get("active_panels", [])
-                self.daily_batteries = {str(k): v for k, v in data.get("daily_batteries", {}).items()}
-                
-                dw = data.get("daily_work", {})
-                
-                # MIGRATION LOGIC: If loaded data is dicts (old format), convert to lists (new format)
-                self.daily_work = {
-                    "placed": [], "fixes": [], "containers": [], "hafenevents": []
-                }
-                
-                # Check if "placed" is a dict (Old format)
-                if isinstance(dw.get("placed"), dict):
-                    print("Migrating daily_work from Dicts to Lists...")
-                    tz = get_target_timezone()
-                    now_iso = datetime.now(tz).isoformat()
-                    
-                    for category in ["placed", "fixes", "containers", "hafenevents"]:
-                        old_cat_data = dw.get(category, {})
-                        if isinstance(old_cat_data, dict):
-                            for uid, count in old_cat_data.items():
-                                for _ in range(count):
-                                    self._add_work_event(category, uid, now_iso, save=False)
-                        elif isinstance(old_cat_data, list):
-                             self.daily_work[category] = old_cat_data
-
-                    self.save_stats()
-                else:
-                    # Already new format
-                    self.daily_work = dw
+            await interaction.response.defer()
+            metrics.acked(interaction)
+        except discord.HTTPException as e:
+            # Too late or already answered; still record the click
+            print(f"[Interaction] Could not acknowledge {interaction.id}: {e}")
 
-                self.daily_profit = {str(k): v for k, v in data.get("daily_profit", {}).items()}
-                self.lifetime_profit = {str(k): v for k, v in data.get("lifetime_profit", {}).items()}
-                
-                lw = data.get("lifetime_work", {})
-                self.lifetime_work = {
-                    "placed": {str(k): v for k, v in lw.get("placed", {}).items()},
-                    "fixes": {str(k): v for k, v in lw.get("fixes", {}).items()},
-                    "containers": {str(k): v for k, v in lw.get("containers", {}).items()},
-                    "hafenevents": {str(k): v for k, v in lw.get("hafenevents", {}).items()}
-                }
-
-                self.history = data.get("history", [])
-                self.last_reset_date = data.get("last_reset_date")
-                self.tracking_message_id = data.get("tracking_message_id")
-                        
-        except Exception as e:
-            print(f"Error loading stats: {e}") 
-            import traceback
-            traceback.print_exc()
-
-
-    def _add_work_event(self, category, user_id, timestamp, details=None, save=True, force_id=None):
-        """Helper to add a work event to daily_work."""
-        event_id = force_id if force_id else uuid.uuid4().hex[:6]
-        event = {
-            "id": event_id,
-            "user_id": str(user_id),
-            "timestamp": timestamp,
-            "type": category,
-            "details": details or {}
-        }
-        self.daily_work[category].append(event)
-        if save:
-            self.save_stats()
-        return event
-
-    def _get_daily_counts(self):
-        """Helper to aggregate counts for HoF."""
-        counts = {
-            "placed": {}, "fixes": {}, "containers": {}, "hafenevents": {}
-        }
-        for category, events in self.daily_work.items():
-            for e in events:
-                uid = e["user_id"]
-                counts[category][uid] = counts[category].get(uid, 0) + 1
-        return counts
+    async def _followup(self, interaction: discord.Interaction, *args, **kwargs):
+        try:
+            await interaction.followup.send(*args, **kwargs)
+        except discord.HTTPException as e:
+            print(f"[Interaction] Followup failed for {interaction.id}: {e}")
+        
+    # --- Presence Index (Traffic) ---
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        """Seed the valid-player index once; gateway events keep it current afterwards."""
+        if getattr(self.bot, "lean_gateway", False):
+            # Nothing is cached by itself: fetch the role members (this seeds the index too)
+            await self._cache_role_members()
+            if self._member_refresh is None:
+                self._member_refresh = asyncio.create_task(self._refresh_role_members())
+            return
+        for guild in self.bot.guilds:
+            presence_index.seed(guild)
+
+    async def _cache_role_members(self):
+        start = time.perf_counter()
+        guilds = self.bot.guilds
+        results = await asyncio.gather(*(cache_role_members(guild) for guild in guilds), return_exceptions=True)
+        for guild, result in zip(guilds, results):
+            if isinstance(result, Exception):
+                print(f"[Traffic] Caching the role members of guild {guild.id} failed: {result}")
+        cached = sum(result for result in results if isinstance(result, int))
+        print(f"[Traffic] Cached {cached} role members of {len(guilds)} guilds in {time.perf_counter() - start:.2f}s")
+
+    async def _refresh_role_members(self):
+        """
+        In lean gateway mode the update of a member who gets the role is
+        dropped (the member isn't cached), so the role members are fetched
+        again every role_member_refresh_minutes (0 turns this off).
+        """
+        while True:
+            minutes = self.settings.get("role_member_refresh_minutes", 60)
+            if not minutes:
+                return
+            await asyncio.sleep(minutes * 60)
+            await self._cache_role_members()
+
+    @commands.Cog.listener()
+    async def on_presence_update(self, before: discord.Member, after: discord.Member):
+        presence_index.update(after)
+
+    @commands.Cog.listener()
+    async def on_member_update(self, before: discord.Member, after: discord.Member):
+        if before.roles != after.roles:
+            presence_index.update(after)
+
+    @commands.Cog.listener()
+    async def on_member_remove(self, member: discord.Member):
+        presence_index.remove(member)
+
+    @commands.Cog.listener()
+    async def on_guild_role_create(self, role: discord.Role):
+        if role.name == presence_index.role_name_for(role.guild.id):
+            presence_index.forget(role.guild)
+
+    @commands.Cog.listener()
+    async def on_guild_role_update(self, before: discord.Role, after: discord.Role):
+        if presence_index.role_name_for(after.guild.id) in (before.name, after.name):
+            presence_index.forget(after.guild)
+
+    @commands.Cog.listener()
+    async def on_guild_role_delete(self, role: discord.Role):
+        if role.name == presence_index.role_name_for(role.guild.id):
+            presence_index.forget(role.guild)
 
     # --- Mechanics Handlers ---
 
     async def handle_container_interaction(self, interaction: discord.Interaction):
-        user = interaction.user
-        self.check_daily_reset()
-        
-        value = self.hof.mechanics.get("wertvoller_container", 90000)
-        
-        # Update Work
-        uid = str(user.id)
-        tz = get_target_timezone()
-        now = datetime.now(tz).isoformat()
-        
-        self._add_work_event("containers", uid, now, save=False)
-        
-        # Update Profit
-        self.daily_profit[uid] = self.daily_profit.get(uid, 0) + value
+        partition = self.partition_for(interaction)
+        async with partition.handler_order["container"].turn() as turn:
+            await self._ack(interaction)
+            await turn.wait()
+            value = partition.process_container(interaction.user)
         
-        self.save_stats()
-        
-        await interaction.response.send_message(f"📦 **Container Logged!** (+${value:,})", ephemeral=True)
-        await self.update_tracking_message()
+        await self._followup(interaction, f"📦 **Container Logged!** (+${value:,})", ephemeral=True)
+        await partition.update_tracking_message()
 
     async def handle_hafenevent_interaction(self, interaction: discord.Interaction):
-        user = interaction.user
-        self.check_daily_reset()
-        
-        value = self.hof.mechanics.get("hafendrop", 24000)
-        
-        # Update Work
-        uid = str(user.id)
-        tz = get_target_timezone()
-        now = datetime.now(tz).isoformat()
-        
-        self._add_work_event("hafenevents", uid, now, save=False)
-        
-        # Update Profit
-        self.daily_profit[uid] = self.daily_profit.get(uid, 0) + value
-        
-        self.save_stats()
-        
-        await interaction.response.send_message(f"⚓ **Hafenevent Logged!** (+${value:,})", ephemeral=True)
-        await self.update_tracking_message()
-
-    def _revert_event_effects(self, event):
-        """Revert the effects of an event (profit, panel state, etc)."""
-        etype = event["type"]
-        uid = event["user_id"]
-        
-        # 1. Revert Profit (Containers/Hafenevents)
-        if etype == "containers":
-             val = self.hof.mechanics.get("wertvoller_container", 90000)
-             if uid in self.daily_profit:
-                 self.daily_profit[uid] = max(0, self.daily_profit[uid] - val)
-                 
-        elif etype == "hafenevents":
-             val = self.hof.mechanics.get("hafendrop", 24000)
-             if uid in self.daily_profit:
-                 self.daily_profit[uid] = max(0, self.daily_profit[uid] - val)
-
-        # 2. Revert Panel Placement
-        elif etype == "placed":
-             # Try to remove the associated active panel
-             panel_id = event.get("details", {}).get("panel_id")
-             if panel_id:
-                 self.active_panels = [p for p in self.active_panels if p["id"] != panel_id]
-
-        # 3. Revert Fix (State Change)
-        elif etype == "fixes":
-             # We need to find the panel interaction that matches this fix event
-             # Match by user_id and timestamp (approximate or exact)
-             # The event timestamp might differ slightly from interaction timestamp if we didn't link them properly.
-             # But in handle_fix/process_fix we used `now.isoformat()` for both.
-             
-             fix_ts = event["timestamp"]
-             
-             for panel in self.active_panels:
-                 original_len = len(panel["interactions"])
-                 panel["interactions"] = [
-                     i for i in panel["interactions"] 
-                     if not (i["user_id"] == uid and i["action"] == "fix" and i["timestamp"] == fix_ts)
-                 ]
-                 # If we removed an interaction, we are done with this fix event
-                 if len(panel["interactions"]) < original_len:
-                     break
-
-    # --- Panel Logic (Legacy/Specific) ---
-
-    def process_place(self, user):
-        """Logic for placing a panel."""
-        tz = get_target_timezone()
-        now = datetime.now(tz)
-        
-        # Create new panel
-        liveduration = self.settings.get("panel_liveduration", 60)
-        panel = {
-            "id": uuid.uuid4().hex,
-            "placed_by": user.id,
-            "placed_by_name": user.display_name,
-            "placed_at_iso": now.isoformat(),
-            "remaining_minutes": liveduration,
-            "interactions": [] 
-        }
-        
-        # Add Interaction
-        panel["interactions"].append({
-            "user_id": str(user.id),
-            "action": "place",
-            "timestamp": now.isoformat()
-        })
+        partition = self.partition_for(interaction)
+        async with partition.handler_order["hafenevent"].turn() as turn:
+            await self._ack(interaction)
+            await turn.wait()
+            value = partition.process_hafenevent(interaction.user)
         
-        self.active_panels.append(panel)
-        self.check_daily_reset() # Check before modifying stats
-
-        # Update Daily Work (Placed)
-        uid = str(user.id)
-        self._add_work_event("placed", uid, now.isoformat(), details={"panel_id": panel["id"]}, save=False, force_id=panel["id"])
-        
-        self.save_stats()
-        return panel
+        await self._followup(interaction, f"⚓ **Hafenevent Logged!** (+${value:,})", ephemeral=True)
+        await partition.update_tracking_message()
 
     async def handle_place_interaction(self, interaction: discord.Interaction):
         """Shared handler for place buttons."""
-        user = interaction.user
-        panel = self.process_place(user)
+        partition = self.partition_for(interaction)
+        async with partition.handler_order["place"].turn() as turn:
+            await self._ack(interaction)
+            await turn.wait()
+            panel = partition.process_place(interaction.user)
         
-        tz = get_target_timezone()
-        placed_at = datetime.fromisoformat(panel["placed_at_iso"])
-        from datetime import timedelta
-        ready_time = placed_at + timedelta(minutes=panel["remaining_minutes"])
+        ready_time = to_datetime(panel.placed_at) + timedelta(minutes=panel.remaining_minutes)
         
-        await interaction.response.send_message(
+        await self._followup(
+            interaction,
             f"✅ **Panel Placed!** If repaired every hour, it will be done at approx. **{ready_time.strftime('%H:%M')}**.",
             ephemeral=True
         )
-        await self.update_tracking_message()
-
-    def calculate_panel_state(self, panel):
-        """Calculate the real-time state of a panel."""
-        tz = get_target_timezone()
-        now = datetime.now(tz)
-        placed_at = datetime.fromisoformat(panel["placed_at_iso"])
-        
-        liveduration = self.settings.get("panel_liveduration", 60)
-        total_delay_minutes = 0
-        
-        check_time = placed_at.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
-        
-        while check_time < now:
-            window_start = check_time.replace(minute=30)
-            window_end = check_time.replace(minute=59, second=59)
-            
-            if window_start > now:
-                break
-                
-            is_fixed = False
-            for i in panel.get("interactions", []):
-                if i["action"] == "fix":
-                    i_time = datetime.fromisoformat(i["timestamp"])
-                    if window_start <= i_time <= window_end:
-                        is_fixed = True
-                        break
-            
-            if not is_fixed:
-                if now > window_end:
-                     total_delay_minutes += 60
-            
-            check_time += timedelta(hours=1)
-            
-        finish_time = placed_at + timedelta(minutes=liveduration + total_delay_minutes)
-        remaining = (finish_time - now).total_seconds() / 60
-        
-        return {
-            "remaining_minutes": int(remaining),
-            "total_delay": total_delay_minutes,
-            "expiry_iso": finish_time.isoformat()
-        }
-
-    def process_fix(self, user):
-        """Standardized logic for fixing panels (Maintain or Collect)."""
-        tz = get_target_timezone()
-        now = datetime.now(tz)
-        
-        eligible_count = 0
-        collected_count = 0
-        
-        self.check_daily_reset()
-        
-        is_maintenance_window = (now.minute >= 30)
-        
-        for panel in self.active_panels:
-            state = self.calculate_panel_state(panel)
-            remaining = state["remaining_minutes"]
-            
-            is_eligible = False
-            if remaining <= 0:
-                is_eligible = True # Collect
-            elif is_maintenance_window:
-                # Check for duplicate fix in this window
-                already_fixed = False
-                window_start = now.replace(minute=30, second=0, microsecond=0)
-                window_end = now.replace(minute=59, second=59, microsecond=999999)
-                
-                for i in panel.get("interactions", []):
-                    if i["action"] == "fix" and i["user_id"] == str(user.id):
-                        i_time = datetime.fromisoformat(i["timestamp"])
-                        if window_start <= i_time <= window_end:
-                            already_fixed = True
-                            break
-                            
-                if not already_fixed:
-                    is_eligible = True # Maintain
-            
-            if is_eligible:
-                eligible_count += 1
-                
-                panel["interactions"].append({
-                    "user_id": str(user.id),
-                    "action": "fix",
-                    "timestamp": now.isoformat()
-                })
-                
-                if remaining <= 0:
-                    collected_count += 1
-        
-        new_active_panels = []
-        for panel in self.active_panels:
-            state = self.calculate_panel_state(panel)
-            finish_dt = datetime.fromisoformat(state["expiry_iso"])
-            
-            is_collected = False
-            if state["remaining_minutes"] <= 0:
-                last = panel["interactions"][-1]
-                if last["user_id"] == str(user.id) and last["action"] == "fix":
-                     is_collected = True
-            
-            if not is_collected:
-                new_active_panels.append(panel)
-            else:
-                # PAYOUT LOGIC
-                interactions = panel.get("interactions", [])
-                total_interactions = len(interactions)
-                
-                if total_interactions > 0:
-                    battery_val = self.hof.mechanics.get("battery_value", 50000)
-                    user_counts = {}
-                    for i in interactions:
-                        uid = i["user_id"]
-                        user_counts[uid] = user_counts.get(uid, 0) + 1
-                        
-                    for uid, count in user_counts.items():
-                        share = int((count / total_interactions) * battery_val)
-                        if share > 0:
-                             self.daily_profit[uid] = self.daily_profit.get(uid, 0) + share
-
-        self.active_panels = new_active_panels
-        
-        if collected_count > 0:
-             if str(user.id) not in self.daily_batteries:
-                self.daily_batteries[str(user.id)] = 0
-             self.daily_batteries[str(user.id)] += collected_count
-
-        if eligible_count > 0:
-            self.tracking_data["fixed_this_hour"] += 1 
-            uid = str(user.id)
-            # Find which panel was fixed to add details? 
-            # For now just generic fix event, or we could link it.
-            # Using current time as ID seed effectively.
-            self._add_work_event("fixes", uid, now.isoformat(), save=True)
-            
-        return {
-            "eligible_count": eligible_count,
-            "collected_count": collected_count
-        }
+        await partition.update_tracking_message()
 
     async def handle_fix_interaction(self, interaction: discord.Interaction, is_reminder=False):
         """Shared handler for fix buttons."""
-        user = interaction.user
-        result = self.process_fix(user)
+        partition = self.partition_for(interaction)
+        async with partition.handler_order["fix"].turn() as turn:
+            await self._ack(interaction)
+            await turn.wait()
+            result = partition.process_fix(interaction.user)
         eligible_count = result["eligible_count"]
         
         if eligible_count > 0:
-             await self.update_tracking_message()
+             await partition.update_tracking_message()
              
-             active_count = len(self.active_panels)
+             active_count = len(partition.active_panels)
              if active_count > 0:
                  # Calculate remaining times for display
                  tz = get_target_timezone()
-                 now = datetime.now(tz)
+                 now = local_now()
                  times_str_list = []
-                 for p in self.active_panels:
-                     state = self.calculate_panel_state(p)
-                     finish_dt = datetime.fromisoformat(state["expiry_iso"])
+                 for p in partition.active_panels:
+                     state = partition.calculate_panel_state(p, now)
+                     finish_dt = datetime.fromtimestamp(state["expiry_ts"], tz)
                      times_str_list.append(f"{state['remaining_minutes']}m({finish_dt.strftime('%H:%M')})")
                  
                  times_str = ", ".join(times_str_list)
@@ -526,335 +436,295 @@ class Knecht(commands.Cog):
                  msg = "🔧 **Panels fixed.** All panels collected! 🔋"
                  
              if is_reminder:
-                 await interaction.response.send_message(msg)
+                 await self._followup(interaction, msg)
              else:
-                 await interaction.response.send_message(msg, ephemeral=False)
-        else:
-            await interaction.response.send_message("❌ No panels eligible for maintenance/collection right now.", ephemeral=True)
-            
-    async def update_tracking_message(self):
-        """Helper to update the main persistent message."""
-        if self.tracking_message_id:
-            try:
-                from src.config import TARGET_CHANNEL_ID
-                channel = self.bot.get_channel(TARGET_CHANNEL_ID)
-                if channel:
-                    try:
-                        msg = await channel.fetch_message(self.tracking_message_id)
-                        embed = msg.embeds[0]
-                        embed.description = (
-                            f"**Current Status**\n\n"
-                            f"☀️ **Active Panels**: {len(self.active_panels)}\n"
-                            f"🔧 **Fixed (Hour)**: {self.tracking_data['fixed_this_hour']}\n\n"
-                            f"📦 **Containers Today**: {len(self.daily_work['containers'])}\n"
-                            f"⚓ **Hafenevents Today**: {len(self.daily_work['hafenevents'])}\n\n"
-                            f"Use buttons below to update."
-                        )
-                        await msg.edit(embed=embed)
-                    except discord.NotFound:
-                        self.tracking_message_id = None
-            except Exception:
-                pass
-
-    def check_daily_reset(self):
-        """Check if we passed 04:00 and need to reset."""
-        tz = get_target_timezone()
-        now = datetime.now(tz)
-        
-        if now.hour >= 4:
-            target_reset_date = now.date().isoformat()
+                 await self._followup(interaction, msg, ephemeral=False)
         else:
-            target_reset_date = (now.date() - timedelta(days=1)).isoformat()
-            
-        if self.last_reset_date != target_reset_date:
-            print(f"[Reset] Triggering Daily Reset. Last: {self.last_reset_date}, Target: {target_reset_date}")
-            return self.reset_daily_stats(target_reset_date)
-        return None
-
-    def reset_daily_stats(self, new_date_str=None):
-        """Reset daily stats and save. Returns the archive entry."""
-        
-        archive_entry = None
-        
-        # 1. Archive
-        has_activity = any([
-            self.daily_work["placed"],
-            self.daily_work["fixes"],
-            self.daily_work["containers"],
-            self.daily_work["hafenevents"],
-            self.daily_profit
-        ])
-        
-        if has_activity:
-             archive_entry = {
-                 "date": self.last_reset_date or "Unknown",
-                 "work": self.daily_work,
-                 "profit": self.daily_profit,
-                 "batteries": self.daily_batteries
-             }
-             self.history.append(archive_entry)
-        
-        # 2. Aggregate Lifetime
-        counts = self._get_daily_counts()
-        
-        for category in ["placed", "fixes", "containers", "hafenevents"]:
-            for uid, count in counts[category].items():
-                if str(uid) not in self.lifetime_work[category]:
-                    self.lifetime_work[category][str(uid)] = 0
-                self.lifetime_work[category][str(uid)] += count
+            await self._followup(interaction, "❌ No panels eligible for maintenance/collection right now.", ephemeral=True)
             
-        for uid, val in self.daily_profit.items():
-            if str(uid) not in self.lifetime_profit: self.lifetime_profit[str(uid)] = 0
-            self.lifetime_profit[str(uid)] += val
-
-        # 3. Clear Current
-        self.daily_work = {
-            "placed": [],
-            "fixes": [],
-            "containers": [],
-            "hafenevents": []
-        }
-        self.daily_profit = {}
-        self.daily_batteries = {}
-        
-        # CRITICAL: CLEAR ACTIVES
-        self.active_panels = []
-        
-        # Update Reset Date
-        if new_date_str:
-            self.last_reset_date = new_date_str
-        else:
-             tz = get_target_timezone()
-             self.last_reset_date = datetime.now(tz).date().isoformat() # Fallback
-
-        self.save_stats()
-        return archive_entry
-
-    def export_stats_file(self):
-        """Return the stats file as a discord.File object."""
-        if os.path.exists(self.data_file):
-            return discord.File(self.data_file, filename="knecht_backup.json")
-        return None
-
     # --- Commands ---
 
     @app_commands.command(name='knecht_add', description="Show the main Knecht control dashboard.")
     @check_permissions()
     async def knecht_add(self, interaction: discord.Interaction):
-        # Update logic to include new mechanics in description
-        containers_today = len(self.daily_work['containers'])
-        hafenevents_today = len(self.daily_work['hafenevents'])
-        
-        embed = discord.Embed(
-            title="Knecht Control", 
-            description=(
-                f"**Current Status**\n\n"
-                f"☀️ **Active Panels**: {len(self.active_panels)}\n"
-                f"🔧 **Fixed (Hour)**: {self.tracking_data['fixed_this_hour']}\n\n"
-                f"📦 **Containers Today**: {containers_today}\n"
-                f"⚓ **Hafenevents Today**: {hafenevents_today}\n\n"
-                f"Use buttons below to update."
-            ),
-            color=0x00FF00
-        )
-        
-        await interaction.response.send_message(embed=embed, view=KnechtView(self))
+        partition = self.partition_for(interaction)
+        await self._respond(interaction, embed=partition.render_dashboard(), view=KnechtView(self))
         msg = await interaction.original_response()
-        self.tracking_message_id = msg.id
-        self.save_stats()
+        partition.set_tracking_message(msg)
 
 
     @app_commands.command(name='knecht_clear', description="Clear/Remove panels or events. Usage: all_p, all_c, ID, etc.")
     @check_permissions()
     async def knecht_clear(self, interaction: discord.Interaction, query: str):
-        """
-        Clears items based on query.
-        - 'all_panels' (all_p), 'all_containers' (all_c), 'all_hafenevents' (all_h)
-        - Specific ID (matches panel or event)
-        """
-        query = query.strip()
-        deleted_count = 0
-        deleted_msg = []
-        
-        # Alias Map
-        if query == "all_p": query = "all_panels"
-        if query == "all_c": query = "all_containers"
-        if query == "all_h": query = "all_hafenevents"
-
-        # 1. Bulk Clear
-        if query == "all_panels":
-            deleted_count = len(self.active_panels)
-            # For bulk clear, we might skip detailed reversion or loop through them?
-            # Creating "placed" events reversion might be too heavy?
-            # Let's just clear active panels list roughly as requested.
-            # But we should probably check if we need to revert placement events?
-            # User request: "clearing an action does not remove its value... clear of panel fix action... state-change needs to be reverted"
-            # If we clear ALL panels, we are just resetting the board.
-            self.active_panels = []
-            deleted_msg.append(f"Cleared {deleted_count} active panels.")
-            
-        elif query == "all_containers":
-            # Revert profit for all
-            for e in self.daily_work["containers"]:
-                self._revert_event_effects(e)
-                
-            deleted_count = len(self.daily_work["containers"])
-            self.daily_work["containers"] = []
-            deleted_msg.append(f"Cleared {deleted_count} containers (Profit Reverted).")
-            
-        elif query == "all_hafenevents":
-            # Revert profit for all
-            for e in self.daily_work["hafenevents"]:
-                self._revert_event_effects(e)
-                
-            deleted_count = len(self.daily_work["hafenevents"])
-            self.daily_work["hafenevents"] = []
-            deleted_msg.append(f"Cleared {deleted_count} hafenevents (Profit Reverted).")
+        """Clears panels or events by query, see KnechtPartition.clear() and clear_archived()."""
+        partition = self.partition_for(interaction)
+        deleted_msg = partition.clear(query)
+        if not deleted_msg:
+            # An archived id can mean reading the whole id index and a month segment: acknowledge first
+            await interaction.response.defer(thinking=True)
+            metrics.acked(interaction)
+            deleted_msg = await partition.clear_archived(query)
+            if not deleted_msg:
+                await interaction.delete_original_response() # The "not found" answer stays ephemeral
 
-        # 2. ID Search & Destroy
-        else:
-            # Check Active Panels (If ID matches a panel ID)
-            # Note: Panels are NOT events, they are state. 
-            # If user clears a panel vs clears a "placed" event?
-            # User said "placed panel shows ugly long id... it seems to be linked to the panel, panel is removed upon clearing the work id"
-            # So user is likely clearing the WORK EVENT ID.
-            
-            # Use a collection of all events to find the match
-            found_event = None
-            found_cat = None
-            
-            for cat in ["containers", "hafenevents", "placed", "fixes"]:
-                for i, e in enumerate(self.daily_work[cat]):
-                    if e['id'].startswith(query):
-                        found_event = e
-                        found_cat = cat
-                        break
-                if found_event: break
-            
-            if found_event:
-                self._revert_event_effects(found_event)
-                self.daily_work[found_cat].remove(found_event)
-                deleted_msg.append(f"Removed {found_cat} event `{found_event['id']}` (Effects Reverted).")
-            else:
-                 # Fallback: maybe they targeted a panel ID directly?
-                 # If so, just remove the panel.
-                 original_len = len(self.active_panels)
-                 self.active_panels = [p for p in self.active_panels if not (p['id'].startswith(query))]
-                 if len(self.active_panels) < original_len:
-                      deleted_msg.append(f"Removed Panel `{query}` (Direct).")
-
-        self.save_stats()
-        
         if deleted_msg:
-            await interaction.response.send_message(f"✅ **Action Complete**:\n" + "\n".join(deleted_msg))
+            await self._respond(interaction, f"✅ **Action Complete**:\n" + "\n".join(deleted_msg))
         else:
-            await interaction.response.send_message(f"❌ Nothing found matching `{query}`.", ephemeral=True)
+            await self._respond(interaction, f"❌ Nothing found matching `{query.strip()}`.", ephemeral=True)
 
     @app_commands.command(name='knecht_status', description="Debug traffic and logic.")
     @check_permissions()
     async def knecht_status(self, interaction: discord.Interaction):
+        partition = self.partition_for(interaction)
         await interaction.response.defer(ephemeral=True)
-        tz = get_target_timezone()
-        now = datetime.now(tz)
-        present, debug_log = check_traffic_debug(interaction.guild)
-        
-        # Aggregate counts for HoF
-        daily_counts = self._get_daily_counts()
-        leaderboard = self.hof.get_leaderboard(daily_counts, self.daily_profit, self.daily_batteries)
-        
-        # --- Value HoF ---
-        value_hof_lines = []
-        for i, (uid, val, details) in enumerate(leaderboard, 1):
-             if val > 0:
-                value_hof_lines.append(f"{i}. <@{uid}>: **${val:,}**")
-        value_hof_str = "\n".join(value_hof_lines) or "None"
-
-        # --- Work HoF (Activity Count + Details) ---
-        # Sort by total actions
-        work_sorted = sorted(leaderboard, key=lambda x: sum([x[2]['placed'], x[2]['fixes'], x[2]['containers'], x[2]['hafenevents']]), reverse=True)
-        work_hof_lines = []
-        
-        for i, (uid, _, details) in enumerate(work_sorted, 1):
-            total_acts = details['placed'] + details['fixes'] + details['containers'] + details['hafenevents']
-            if total_acts > 0:
-                header = f"{i}. <@{uid}>: **{total_acts} Acts** (P:{details['placed']} F:{details['fixes']} C:{details['containers']} H:{details['hafenevents']})"
-                work_hof_lines.append(header)
-                
-                # Get lists of specific acts for this user
-                user_acts = []
-                for cat in ["placed", "fixes", "containers", "hafenevents"]:
-                    for e in self.daily_work[cat]:
-                        if e["user_id"] == uid:
-                            ts = datetime.fromisoformat(e["timestamp"]).strftime('%H:%M')
-                            eid = e["id"][:6]
-                            # Format line: "- id123: Placed panel at 13:12"
-                            if cat == "placed": 
-                                pid = e.get("details", {}).get("panel_id", "?")
-                                action_desc = f"Placed panel ({pid[:6]})" 
-                            elif cat == "fixes": action_desc = "Fixed panel"
-                            elif cat == "containers": action_desc = "Container"
-                            elif cat == "hafenevents": action_desc = "Hafenevent"
-                            else: action_desc = cat
-                            
-                            user_acts.append(f"- `{eid}`: {action_desc} at {ts}")
-                
-                # Limit debug output if crazy long? User said "too concise... split into lines"
-                # But let's verify if user_acts is empty (shouldn't be if total > 0)
-                if user_acts:
-                    work_hof_lines.extend(user_acts)
-                    
-        work_hof_str = "\n".join(work_hof_lines) or "None"
-        
-        placed_total = len(self.daily_work["placed"])
-
-        # Active active_panels
-        panel_lines = []
-        for p in self.active_panels:
-            pid = p['id'][:6]
-            pname = p.get('placed_by_name', 'Unknown')
-            state = self.calculate_panel_state(p)
-            rem = state["remaining_minutes"]
-            delay = state["total_delay"]
-            interactions = p.get('interactions', [])
-            fixes_done = len([i for i in interactions if i['action'] == 'fix'])
-            status_text = f"{rem}m left"
-            if delay > 0: status_text += f" ({delay}m delay)"
-            else: status_text += " (On Track)"
-            panel_lines.append(f"`{pid}` {pname}: {status_text} - {fixes_done} fixes")
-        panel_str = "\n".join(panel_lines) or "No active panels."
-
-        status_msg = (
-            f"**Status Report**\n"
-            f"Time: {now.strftime('%H:%M:%S')}\n"
-            f"Active Panels: {len(self.active_panels)}\n"
-            f"Placed Panels (Daily): {placed_total}\n"
-            f"Fixed Panels (Hour): {self.tracking_data['fixed_this_hour']}\n\n"
-            f"**☀️ Active Panels Detail**:\n{panel_str}\n\n"
-            f"**🏆 Value HoF**:\n{value_hof_str}\n\n"
-            f"**🔨 Work HoF**:\n{work_hof_str}\n\n"
-            f"**Debug Log**:\n```\n{debug_log}\n```"
+        metrics.acked(interaction)
+        report = self.status_report(partition, interaction.guild)
+        await self.send_report(
+            lambda *args, **kwargs: interaction.followup.send(*args, ephemeral=True, **kwargs),
+            report, "status", partition.key
         )
-        if len(status_msg) > 2000:
-            # split strictly? Or just truncate.
-            # User wants richness, truncation is bad.
-            # If too long, maybe send as file or multiple messages?
-            # For now, simplistic truncation but try to keep relevant parts.
-            if len(status_msg) > 1950:
-                 status_msg = status_msg[:1950] + "\n...(truncated - too much data)"
-            
-        await interaction.followup.send(status_msg, ephemeral=True)
 
-    @app_commands.command(name='knecht_hof', description="Show the Daily Hall of Fame ($).")
+    @app_commands.command(name='knecht_stats', description="Statistics of the archived days: players, categories, best days, hours.")
+    @app_commands.describe(
+        period="How many days back from yesterday (default: 30)",
+        start="First day (YYYY-MM-DD), instead of a period",
+        end="Last day (YYYY-MM-DD), default: yesterday"
+    )
+    @app_commands.choices(period=[
+        app_commands.Choice(name="7 days", value="7"),
+        app_commands.Choice(name="30 days", value="30"),
+        app_commands.Choice(name="90 days", value="90"),
+        app_commands.Choice(name="365 days", value="365"),
+        app_commands.Choice(name="All time", value="all")
+    ])
     @check_permissions()
-    async def knecht_hof(self, interaction: discord.Interaction):
-        daily_counts = self._get_daily_counts()
-        leaderboard = self.hof.get_leaderboard(daily_counts, self.daily_profit, self.daily_batteries)
+    async def knecht_stats(self, interaction: discord.Interaction, period: str = "30", start: str = None, end: str = None):
+        partition = self.partition_for(interaction)
+        try:
+            first, last = self.stats_range(partition, period, start, end)
+        except ValueError as e:
+            await self._respond(interaction, f"❌ {e}", ephemeral=True)
+            return
+        await interaction.response.defer()
+        metrics.acked(interaction)
+        # The first query after a restore rebuilds the rollups; keep that off the event loop
+        report = await asyncio.to_thread(self.stats_report, partition, first, last)
+        await self.send_report(interaction.followup.send, report, "stats", partition.key, f"{first}_{last}")
+
+    def stats_range(self, partition, period, start=None, end=None):
+        """(first, last) dates of a /knecht_stats query. Raises ValueError for bad input."""
+        try:
+            last = datetime.fromisoformat(end).date() if end else local_now().date() - timedelta(days=1)
+            if start:
+                first = datetime.fromisoformat(start).date()
+            elif period == "all":
+                archived = partition.archived_range()
+                if archived is None:
+                    raise ValueError("No archived days yet.")
+                first = archived[0]
+            else:
+                first = last - timedelta(days=int(period) - 1)
+        except (TypeError, OverflowError) as e:
+            raise ValueError(f"Invalid date: {e}")
+        if first > last:
+            raise ValueError(f"{first} is after {last}.")
+        return first, last
+
+    # --- Paged reports ---
+
+    def status_report(self, partition, guild):
+        """The /knecht_status report. Building it is cheap; the lines are only rendered per page."""
+        now = local_now()
+        leaderboard = self.hof.get_leaderboard(
+            partition.get_daily_counts(), partition.daily_profit, partition.daily_batteries
+        )
+        overview = [
+            f"Time: {now.strftime('%H:%M:%S')}",
+            f"Partition: {partition.key} ({len(self.partitions)} loaded)",
+            f"Active Panels: {len(partition.active_panels)}",
+            f"Placed Panels (Daily): {len(partition.daily_work['placed'])}",
+            f"Fixed Panels (Hour): {partition.tracking_data['fixed_this_hour']}",
+            f"Persistence: {partition.persistence.describe()}",
+            f"Dashboard: {partition.dashboard.describe()}",
+            f"Players (Daily): {len(leaderboard)}"
+        ]
+
+        panels = list(partition.active_panels)
+
+        def render_panels(start, stop):
+            lines = []
+            for p in panels[start:stop]:
+                state = partition.calculate_panel_state(p, now)
+                status_text = f"{state['remaining_minutes']}m left"
+                if state["total_delay"] > 0: status_text += f" ({state['total_delay']}m delay)"
+                else: status_text += " (On Track)"
+                fixes_done = sum(1 for i in p.interactions if i.action == 'fix')
+                lines.append(f"`{p.id[:6]}` {p.placed_by_name or 'Unknown'}: {status_text} - {fixes_done} fixes")
+            return lines
+
+        return PagedReport("Status Report", overview, [
+            Section("☀️ Active Panels Detail", len(panels), render_panels),
+            value_section(leaderboard),
+            work_section(leaderboard, partition.get_user_events),
+            self._traffic_section(guild)
+        ])
+
+    def _traffic_section(self, guild):
+        """The traffic debug log, one line per member with the role (formatted per page)."""
+        if guild is None:
+            return lines_section("Debug Log", ["Not in a server."])
+        role_name = presence_index.role_name_for(guild.id)
+        role = discord.utils.get(guild.roles, name=role_name)
+        if not role:
+            return lines_section("Debug Log", [f"❌ Role '{role_name}' not found in server."])
+        members = list(role.members)
+
+        def render(start, stop):
+            lines = []
+            for n in range(start, stop):
+                if n == 0:
+                    lines.append(f"Members with role '{role_name}': {len(members)}")
+                elif n <= len(members):
+                    lines.append(describe_member(members[n - 1], role.id))
+                else:
+                    lines.append(f"Valid players (index): {len(presence_index.valid_players(guild))}")
+            return lines
+        return Section("Debug Log", len(members) + 2, render)
+
+    def daily_report(self, partition, date, totals=None):
+        """
+        The 04:00 report of an archived day. `totals` is (counts, profit,
+        batteries) from the reset; page buttons rebuild them from the history.
+        """
+        if totals is None:
+            totals = partition.day_totals(date)
+            if totals is None:
+                return None
+        counts, profit, batteries = totals
+        leaderboard = self.hof.get_leaderboard(counts, profit, batteries)
+        overview = [
+            f"☀️ Panels Placed: {sum(counts['placed'].values())}",
+            f"👥 Players: {len(leaderboard)}"
+        ]
+        return PagedReport(f"ℹ️ Daily Report & Server Restart ({date})", overview, [
+            profit_section(leaderboard),
+            work_section(leaderboard)
+        ])
+
+    def stats_report(self, partition, first, last):
+        """The /knecht_stats report of the archived days first..last, served from the rollups."""
+        totals = partition.range_totals(first, last)
+        counts = {cat: int_keys(per_user) for cat, per_user in totals["work"].items()}
+        leaderboard = self.hof.get_leaderboard(counts, int_keys(totals["profit"]), int_keys(totals["batteries"]))
+        days, hours = totals["days"], totals["hours"]
+        overview = [
+            f"📆 Archived Days: {len(days)} of {(last - first).days + 1}",
+            f"🔨 Actions: {sum(sum(per_user.values()) for per_user in counts.values())} "
+            + " ".join(f"{cat[0].upper()}:{sum(counts[cat].values())}" for cat in counts),
+            f"💰 Profit: ${sum(totals['profit'].values()):,}",
+            f"🔋 Batteries: {sum(totals['batteries'].values())}",
+            f"👥 Players: {len(leaderboard)}"
+        ]
+        if days:
+            best = max(days.items(), key=lambda x: (x[1][4], sum(x[1][:4])))
+            overview.append(f"📅 Best Day: {best[0]} (${best[1][4]:,})")
+        if any(hours):
+            peak = max(range(24), key=lambda h: hours[h])
+            overview.append(f"🕐 Busiest Hour: {peak:02d}:00 ({hours[peak]} actions)")
+        overview.append(f"*Read {totals['rows']} rollup rows and {totals['raw_days']} archived days.*")
+        return PagedReport(f"📈 Stats {first} – {last}", overview, [
+            profit_section(leaderboard),
+            work_section(leaderboard),
+            trend_section(days, by_month=(last - first).days > 120),
+            best_days_section(days),
+            hours_section(hours)
+        ])
+
+    def build_report(self, kind, key, date, guild):
+        """Rebuild a report for a page button, or None if it is gone (unknown partition or day)."""
+        partition = self.partitions.get(key)
+        if partition is None:
+            return None
+        if kind == "status":
+            return self.status_report(partition, guild)
+        if kind == "stats":
+            first, last = (datetime.fromisoformat(d).date() for d in date.split("_"))
+            return self.stats_report(partition, first, last)
+        return self.daily_report(partition, date)
+
+    async def send_report(self, send, report, kind, key, date=""):
+        """
+        Send the first page of a report with `send`. Reports of more than
+        MAX_BUTTON_PAGES pages come with the whole text as a file as well.
+        """
+        kwargs = {}
+        view = report_view(kind, key, date, 0, report.page_count)
+        if view:
+            kwargs["view"] = view
+        if report.page_count > MAX_BUTTON_PAGES:
+            name = f"knecht_{kind}_{date or local_now().strftime('%Y-%m-%d_%H%M')}.txt"
+            kwargs["file"] = discord.File(io.BytesIO(report.render_all().encode("utf-8")), filename=name)
+        await send(report.render_page(0), **kwargs)
+
+    async def show_report_page(self, interaction: discord.Interaction, kind, key, date, page):
+        """Page button callback: only the requested page is rendered."""
+        if kind == "status":
+            report = self.build_report(kind, key, date, interaction.guild)
+        else:
+            # Read from the history, and the rollups may need a rebuild: acknowledge first, like /knecht_stats
+            await self._ack(interaction)
+            report = await asyncio.to_thread(self.build_report, kind, key, date, interaction.guild)
+        if report is None:
+            await self._respond(interaction, "❌ This report is no longer available.", ephemeral=True)
+            return
+        content = report.render_page(page)
+        view = report_view(kind, key, date, page, report.page_count)
+        if interaction.response.is_done():
+            # Acknowledged above or by until_loaded()
+            await interaction.edit_original_response(content=content, view=view)
+            return
+        await interaction.response.edit_message(content=content, view=view)
+        metrics.acked(interaction)
+
+    @app_commands.command(name='knecht_hof', description="Show the Hall of Fame ($).")
+    @app_commands.describe(scope="Daily (default), this week, or all time")
+    @app_commands.choices(scope=[
+        app_commands.Choice(name="Daily", value="daily"),
+        app_commands.Choice(name="Weekly", value="weekly"),
+        app_commands.Choice(name="Lifetime", value="lifetime")
+    ])
+    @check_permissions()
+    async def knecht_hof(self, interaction: discord.Interaction, scope: str = "daily"):
+        partition = self.partition_for(interaction)
+        if scope == "lifetime":
+            top = partition.leaderboard.profit.top(10)
+            if not top:
+                await self._respond(interaction, "🏆 **Hall of Fame**: No lifetime activity recorded yet.", ephemeral=True)
+                return
+
+            embed = discord.Embed(title="🏆 Lifetime Hall of Fame", color=0xD4AF37)
+            description = "**Total Earnings**\n"
+            for uid, val in top:
+                description += f"**{partition.leaderboard.profit.rank(uid)}.** <@{uid}> — **${val:,}** ({partition.leaderboard.work.get(uid)} actions)\n"
+            embed.description = description
+            await self._respond(interaction, embed=embed)
+            return
+
+        if scope == "weekly":
+            leaderboard = self.hof.get_leaderboard(*partition.weekly_totals())
+            title = "🏆 Weekly Performance Hall of Fame"
+            empty = "No activity recorded this week."
+        else:
+            daily_counts = partition.get_daily_counts()
+            leaderboard = self.hof.get_leaderboard(daily_counts, partition.daily_profit, partition.daily_batteries)
+            title = "🏆 Daily Performance Hall of Fame"
+            empty = "No activity recorded today."
         
         if not leaderboard:
-            await interaction.response.send_message("🏆 **Hall of Fame**: No activity recorded today.", ephemeral=True)
+            await self._respond(interaction, f"🏆 **Hall of Fame**: {empty}", ephemeral=True)
             return
         
-        embed = discord.Embed(title="🏆 Daily Performance Hall of Fame", color=0xD4AF37)
+        embed = discord.Embed(title=title, color=0xD4AF37)
         
         description = "**Total Earnings**\n"
         for i, (uid, val, details) in enumerate(leaderboard, 1):
@@ -862,24 +732,92 @@ class Knecht(commands.Cog):
             
         embed.description = description
         
-        await interaction.response.send_message(embed=embed)
+        await self._respond(interaction, embed=embed)
+
+    @app_commands.command(name='knecht_rank', description="Show your lifetime rank (profit and work).")
+    @app_commands.describe(user="Someone else's rank instead of yours")
+    @check_permissions()
+    async def knecht_rank(self, interaction: discord.Interaction, user: discord.Member = None):
+        partition = self.partition_for(interaction)
+        target = user or interaction.user
+        uid = target.id
+        profit_rank = partition.leaderboard.profit.rank(uid)
+        work_rank = partition.leaderboard.work.rank(uid)
+
+        if profit_rank is None and work_rank is None:
+            await self._respond(interaction, f"📊 {target.display_name} has no lifetime stats yet (today's work counts after the 04:00 reset).", ephemeral=True)
+            return
+
+        lines = [f"📊 **Lifetime Rank** — {target.display_name}"]
+        if profit_rank is not None:
+            lines.append(f"💰 Profit: **#{profit_rank}** of {len(partition.leaderboard.profit)} (${partition.leaderboard.profit.get(uid):,})")
+        if work_rank is not None:
+            lines.append(f"🛠️ Work: **#{work_rank}** of {len(partition.leaderboard.work)} ({partition.leaderboard.work.get(uid)} actions)")
+        await self._respond(interaction, "\n".join(lines), ephemeral=True)
+
+    @app_commands.command(name='knecht_recount', description="[ADMIN] Rebuild the daily counters from the events.")
+    @check_permissions()
+    async def knecht_recount(self, interaction: discord.Interaction):
+        partition = self.partition_for(interaction)
+        drift = partition.rebuild_daily_counts()
+        if not drift:
+            await self._respond(interaction, "✅ Daily counters are consistent with the events.", ephemeral=True)
+            return
+
+        lines = [f"- {cat} <@{uid}>: {kept} → {actual}" for cat, uid, kept, actual in drift[:20]]
+        if len(drift) > 20:
+            lines.append(f"...and {len(drift) - 20} more")
+        await self._respond(
+            interaction,
+            f"⚠️ **Counters rebuilt** ({len(drift)} mismatches):\n" + "\n".join(lines),
+            ephemeral=True
+        )
 
     @app_commands.command(name='knecht_reset', description="[ADMIN] Reset all daily stats manually.")
     @check_permissions()
     async def knecht_reset(self, interaction: discord.Interaction):
-        self.reset_daily_stats()
-        await interaction.response.send_message("✅ Daily stats have been reset.", ephemeral=True)
+        partition = self.partition_for(interaction)
+        partition.reset_daily_stats()
+        await self._respond(interaction, "✅ Daily stats have been reset.", ephemeral=True)
+
+    @app_commands.command(name='knecht_metrics', description="[ADMIN] Show interaction latency and throughput metrics.")
+    @check_permissions()
+    async def knecht_metrics(self, interaction: discord.Interaction):
+        lines = metrics.summary_lines() or ["No measurements yet."]
+        # Stay under the message limit; the Prometheus export has everything
+        text = "📈 **Metrics** (bucket upper bounds, ms)\n"
+        for line in lines:
+            if len(text) + len(line) > 1900:
+                text += "…"
+                break
+            text += line + "\n"
+        await self._respond(interaction, text, ephemeral=True)
 
-    @app_commands.command(name='knecht_export', description="[ADMIN] Export the current stats JSON.")
+    @app_commands.command(name='knecht_export', description="[ADMIN] Export all stats as a compressed backup.")
     @check_permissions()
     async def knecht_export(self, interaction: discord.Interaction):
-        file = self.export_stats_file()
-        if file:
-            await interaction.response.send_message("📦 Here is the current `knecht_backup.json`:", file=file, ephemeral=True)
-        else:
-            await interaction.response.send_message("❌ No stats file found.", ephemeral=True)
+        partition = self.partition_for(interaction)
+        # Writing the full history can take a while; answer within the deadline first
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        metrics.acked(interaction)
+        part_bytes = config_manager.settings.get("backup_part_bytes") or part_limit(interaction.channel)
+        header, paths = await partition.create_backup(part_bytes=part_bytes, export=True)
+        if not paths:
+            await self._followup(interaction, "❌ Export failed, see the log.", ephemeral=True)
+            return
+        try:
+            for n, path in enumerate(paths, 1):
+                part = f" (part {n}/{len(paths)})" if len(paths) > 1 else ""
+                await self._followup(
+                    interaction, f"📦 Full backup `{header['id']}`{part}. Restore with `python restore.py`.",
+                    file=discord.File(path), ephemeral=True
+                )
+        finally:
+            partition.backups.discard(paths)
 
     async def cog_app_command_error(self, interaction: discord.Interaction, error: app_commands.AppCommandError):
+        metrics.inc("commands.errors")
+        metrics.finish(interaction)
         if isinstance(error, app_commands.CheckFailure):
             try:
                 # Determine how to respond based on interaction state
@@ -888,7 +826,9 @@ class Knecht(commands.Cog):
                 else:
                     reply = interaction.response.send_message
                 
-                if isinstance(error, app_commands.MissingRole):
+                if isinstance(error, StillLoading):
+                    await reply("⏳ The bot is still starting up, try again in a few seconds.", ephemeral=True)
+                elif isinstance(error, app_commands.MissingRole):
                     await reply(f"❌ You do not have the required role: **{error.missing_role[0]}**", ephemeral=True)
                 else:
                     await reply("❌ You do not have permission to use this command.", ephemeral=True)
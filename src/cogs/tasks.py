@@ -1,84 +1,123 @@
+import asyncio
+import traceback
 import discord
-from discord.ext import commands, tasks
-from datetime import datetime
+from discord.ext import commands
 from src.utils.helpers import get_target_timezone
-from src.utils.traffic import check_traffic_debug
-from src.config import TARGET_CHANNEL_ID, TARGET_ROLE_NAME, BACKUP_CHANNEL_ID
+from src.utils.scheduler import DeadlineScheduler, HOUR_RESET, REMINDER, PANEL_READY
+from src.utils.config_manager import config_manager
+from src.utils.backup import FULL, part_limit
+from src.utils.records import local_now, to_datetime
+from src.utils.reminders import ReminderDispatcher
+
+DEFAULT_REMINDER_MINUTES = [31, 45, 50, 55]
 
 class BackgroundTasks(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.last_checked_minute = -1
+        self.tz = get_target_timezone()
+        # Reminder minutes are looked up for every hour, so edits to settings.json apply without a restart
+        self.scheduler = DeadlineScheduler(
+            self.tz,
+            "data/scheduler.json",
+            reminder_minutes=lambda: config_manager.settings.get("reminder_minutes", DEFAULT_REMINDER_MINUTES),
+            grace=config_manager.settings.get("scheduler_grace_seconds", 60),
+            panel_deadline=self.next_panel_deadline
+        )
+        self.reminders = ReminderDispatcher(dm_concurrency=config_manager.settings.get("reminder_dm_concurrency", 4))
+        self._task = None
 
     async def cog_load(self):
-        self.check_time.start()
+        self._task = asyncio.create_task(self._run())
 
     async def cog_unload(self):
-        self.check_time.cancel()
+        if self._task:
+            self._task.cancel()
+        await self.scheduler.flush()
 
-    @tasks.loop(seconds=45)
-    async def check_time(self):
-        target_channel = self.bot.get_channel(TARGET_CHANNEL_ID)
-        if not target_channel:
-            return
+    async def _run(self):
+        await self.bot.wait_until_ready()
+        knecht_cog = self.bot.get_cog("Knecht")
+        if knecht_cog:
+            await knecht_cog.loaded.wait()
+        # Catch up on a missed 04:00 restart right away, like the first tick of the old loop
+        await self.on_deadline(local_now(), [])
+        await self.scheduler.run(self.on_deadline)
 
-        tz = get_target_timezone()
-        now = datetime.now(tz)
-        
-        if now.minute == self.last_checked_minute:
-            return
-        self.last_checked_minute = now.minute
+    def next_panel_deadline(self):
+        """When the next panel of any partition is expected to be ready to collect (or None)."""
+        knecht_cog = self.bot.get_cog("Knecht")
+        if not knecht_cog:
+            return None
+        now = local_now()
+        times = []
+        for partition in knecht_cog.partitions.values():
+            ready_at = partition.next_collect_alert(now)
+            if ready_at is not None:
+                times.append(ready_at)
+        return to_datetime(min(times)) if times else None
 
+    async def on_deadline(self, now, kinds):
+        """Called by the scheduler at every deadline with the local time and the deadline kinds."""
         # Get Knecht cog for state
         knecht_cog = self.bot.get_cog("Knecht")
         if not knecht_cog:
             print("Warning: Knecht cog not found. Skipping logic involving state.")
             return
+
+        # Partitions are independent; one failing (e.g. missing permissions) doesn't stop the others
+        partitions = list(knecht_cog.partitions.values())
+        results = await asyncio.gather(
+            *(self.on_partition_deadline(knecht_cog, partition, now, kinds) for partition in partitions),
+            return_exceptions=True
+        )
+        for partition, result in zip(partitions, results):
+            if isinstance(result, Exception):
+                print(f"[Tasks] Deadline failed for partition {partition.key}:")
+                traceback.print_exception(result)
+
+    async def on_partition_deadline(self, knecht_cog, partition, now, kinds):
+        target_channel = self.bot.get_channel(partition.channel_id) if partition.channel_id else None
+        if PANEL_READY in kinds:
+            # Taken off the heap even without a channel, or the scheduler would wake for them again
+            ready = partition.pop_collect_alerts(now)
+            if ready and target_channel and config_manager.settings.get("collect_alerts", True):
+                await self.send_collect_alert(target_channel, ready)
+        if not target_channel:
+            return
         
         # Logic Implementation
         
         # Daily Reset Check
-        archive = knecht_cog.check_daily_reset()
+        archive = partition.check_daily_reset()
         if archive:
-            # Generate Report
-            leaderboard = knecht_cog.hof.get_leaderboard(archive["work"], archive["profit"], archive["batteries"])
-            
-            hof_lines = []
-            for i, (uid, val, details) in enumerate(leaderboard, 1):
-                 hof_lines.append(f"{i}. <@{uid}>: **${val}** (P:{details['placed']} F:{details['fixes']} B:{details['batteries']})")
-            hof_str = "\n".join(hof_lines) or "None"
-
-            placed_daily = sum(archive["work"]["placed"].values())
-
-            summary = (
-                f"ℹ️ **Daily Report & Server Restart** ({archive['date']})\n"
-                f"☀️ Panels Placed: {placed_daily}\n"
-                f"🏆 **Profit HoF**:\n{hof_str}\n"
+            # Generate Report (per-user counts come with the archive entry); long days get page buttons
+            report = knecht_cog.daily_report(
+                partition, archive["date"], (archive["counts"], archive["profit"], archive["batteries"])
             )
-            await target_channel.send(summary)
+            await knecht_cog.send_report(target_channel.send, report, "daily", partition.key, archive["date"])
+            await partition.update_tracking_message()
 
             # Weekly Backup (Monday)
-            if now.weekday() == 0: 
-                backup_channel = self.bot.get_channel(BACKUP_CHANNEL_ID)
+            if now.weekday() == 0 and partition.backup_channel_id: 
+                backup_channel = self.bot.get_channel(partition.backup_channel_id)
                 if backup_channel:
-                    file = knecht_cog.export_stats_file()
-                    if file:
-                        await backup_channel.send(f"📦 **Weekly Backup** ({now.strftime('%Y-%m-%d')})", file=file)
+                    await self.send_backup(partition, backup_channel, now)
                 else:
-                    print(f"Warning: Backup channel {BACKUP_CHANNEL_ID} not found.")
+                    print(f"Warning: Backup channel {partition.backup_channel_id} not found.")
             
             # Reset is already done by check_daily_reset
             return
 
         # XX:30 - Reset "Fixed" status for hour
-        if now.minute == 30:
-            if knecht_cog.tracking_data["fixed_this_hour"] > 0:
-                knecht_cog.tracking_data["fixed_this_hour"] = 0
+        if HOUR_RESET in kinds:
+            if partition.tracking_data["fixed_this_hour"] > 0:
+                partition.tracking_data["fixed_this_hour"] = 0
+                await partition.update_tracking_message()
             return
 
         # Reminders: XX:31, XX:45, XX:50, XX:55 (Configurable)
-        reminder_minutes = knecht_cog.settings.get("reminder_minutes", [31, 45, 50, 55])
-        if now.minute in reminder_minutes:
+        reminder_minutes = config_manager.settings.get("reminder_minutes", DEFAULT_REMINDER_MINUTES)
+        if REMINDER in kinds:
             # Check Traffic
             from src.utils.traffic import get_valid_players
             valid_players = get_valid_players(target_channel.guild)
@@ -86,39 +125,51 @@ class BackgroundTasks(commands.Cog):
             if not valid_players:
                 return
 
-            # Check Logic
-            # Check Logic
             # Count eligible panels
-            eligible_count = 0
-            for panel in knecht_cog.active_panels:
-                placed_dt = datetime.fromisoformat(panel["placed_at_iso"])
-                is_eligible = False
-                if placed_dt.hour != now.hour or placed_dt.date() != now.date():
-                    is_eligible = True
-                elif placed_dt.minute < 30 and now.minute >= 30:
-                    is_eligible = True
-                
-                if is_eligible:
-                    eligible_count += 1
+            eligible_count = partition.count_reminder_eligible(now)
             
-            if eligible_count > 0 and knecht_cog.tracking_data["fixed_this_hour"] == 0:
-                mentions = [m.mention for m in valid_players]
-                mention_str = ", ".join(mentions)
-                
+            if eligible_count > 0 and partition.tracking_data["fixed_this_hour"] == 0:
                 # Import view safely
                 from src.cogs.knecht import KnechtView
                 # Only show buttons on the first reminder (sorted first minute)
                 first_reminder = sorted(reminder_minutes)[0]
                 view = KnechtView(knecht_cog) if now.minute == first_reminder else None
-                
-                await target_channel.send(
-                    f"⚠️ {mention_str} Panels placed but not fixed! (Time: {now.strftime('%H:%M')})", 
-                    view=view
+
+                # Split into messages of <= 2000 characters, each pinging only its own members
+                await self.reminders.send(
+                    target_channel, valid_players,
+                    f"⚠️ Panels placed but not fixed! (Time: {now.strftime('%H:%M')})",
+                    view=view, dm_fallback=config_manager.settings.get("reminder_dm_fallback", False)
                 )
 
-    @check_time.before_loop
-    async def before_check_time(self):
-        await self.bot.wait_until_ready()
+    async def send_collect_alert(self, channel, panels):
+        """Tell the crew which panels are ready to collect (any fix collects them)."""
+        lines = [f"`{p.id[:6]}` placed by {p.placed_by_name or 'Unknown'}" for p in panels[:10]]
+        if len(panels) > 10:
+            lines.append(f"...and {len(panels) - 10} more")
+        title = "Panel is" if len(panels) == 1 else f"{len(panels)} panels are"
+        await self.reminders.post(channel, f"🔋 {title} ready to collect! Press **Fix Panels** to collect.\n" + "\n".join(lines))
+
+    async def send_backup(self, partition, channel, now):
+        """Upload the next backup of the chain (one part per message) and commit it once all parts are sent."""
+        part_bytes = config_manager.settings.get("backup_part_bytes") or part_limit(channel)
+        header, paths = await partition.create_backup(part_bytes=part_bytes)
+        if not paths:
+            return
+        if header["kind"] == FULL:
+            label = "full"
+        else:
+            label = f"changes since {header['since'] or 'the full backup'}"
+        try:
+            for n, path in enumerate(paths, 1):
+                part = f", part {n}/{len(paths)}" if len(paths) > 1 else ""
+                await channel.send(f"📦 **Weekly Backup** ({now.strftime('%Y-%m-%d')}, {label}{part})", file=discord.File(path))
+        except discord.HTTPException as e:
+            # Not committed: the next backup covers these days again
+            print(f"Error uploading backup {header['id']}: {e}")
+            partition.backups.discard(paths)
+            return
+        partition.backups.commit(header, paths)
 
 async def setup(bot):
     await bot.add_cog(BackgroundTasks(bot))
@@ -5,6 +5,8 @@ load_dotenv()
 
 TOKEN = os.getenv('DISCORD_TOKEN')
 TARGET_GUILD_ID = int(os.getenv('TARGET_GUILD_ID', 0))
+# Further guilds the bot serves (comma separated); each gets its own state partition
+EXTRA_GUILD_IDS = [int(g) for g in os.getenv('EXTRA_GUILD_IDS', '').split(',') if g.strip()]
 TARGET_CHANNEL_ID = int(os.getenv('TARGET_CHANNEL_ID', 0))
 BACKUP_CHANNEL_ID = int(os.getenv('BACKUP_CHANNEL_ID', 0))
 TARGET_ROLE_NAME = os.getenv('TARGET_ROLE_NAME', 'Ahlwardt')
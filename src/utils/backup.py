@@ -0,0 +1,369 @@
+import gzip
+import json
+import os
+from datetime import date, timedelta
+
+from src.utils.history import HistoryArchive
+from src.utils.persistence import atomic_write_json
+from src.utils.records import local_now, state_to_json
+
+FORMAT = "knecht-backup/1"
+FULL = "full"
+DELTA = "delta"
+# Discord's upload limit for servers without boosts
+DEFAULT_PART_BYTES = 10 * 1024 * 1024
+
+
+def part_limit(channel):
+    """Largest attachment `channel` accepts (the guild's upload limit, boosts included)."""
+    guild = getattr(channel, "guild", None)
+    return getattr(guild, "filesize_limit", None) or DEFAULT_PART_BYTES
+
+
+class SplitWriter:
+    """
+    Binary file-like object that spreads everything written to it over
+    numbered part files (`path.001`, `path.002`, ...) of at most `part_bytes`
+    each. Concatenating the parts in order gives back the whole stream.
+    """
+
+    def __init__(self, path, part_bytes):
+        self.path = path
+        self.part_bytes = part_bytes
+        self.paths = []
+        self._file = None
+        self._left = 0
+
+    def write(self, data):
+        view = memoryview(data)
+        while len(view):
+            if self._left == 0:
+                self._next_part()
+            chunk = view[:self._left]
+            self._file.write(chunk)
+            self._left -= len(chunk)
+            view = view[len(chunk):]
+        return len(data)
+
+    def _close_part(self):
+        if self._file:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+
+    def _next_part(self):
+        self._close_part()
+        path = f"{self.path}.{len(self.paths) + 1:03d}"
+        self._file = open(path, "wb")
+        self.paths.append(path)
+        self._left = self.part_bytes
+
+    def flush(self):
+        if self._file:
+            self._file.flush()
+
+    def close(self):
+        """Close the last part and return the part paths; a lone part loses its number."""
+        self._close_part()
+        if len(self.paths) == 1:
+            os.replace(self.paths[0], self.path)
+            self.paths = [self.path]
+        return self.paths
+
+
+class _ConcatReader:
+    """Reads a list of files as one stream (the parts of a backup)."""
+
+    def __init__(self, paths):
+        self._paths = list(paths)
+        self._file = None
+
+    def read(self, size=-1):
+        while True:
+            if self._file is None:
+                if not self._paths:
+                    return b""
+                self._file = open(self._paths.pop(0), "rb")
+            data = self._file.read(size)
+            if data or size == 0:
+                return data
+            self._file.close()
+            self._file = None
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+
+class BackupManager:
+    """
+    Incremental backups of one partition.
+
+    A backup is a gzip-compressed JSONL stream: a header line, the current
+    state (the knecht.json layout), one line per archived day and an "end"
+    line. A full backup carries every archived day; a delta only the days
+    archived since the previous backup, plus the current version of dates
+    that were corrected since (/knecht_clear on a past day). Every delta names the
+    full backup it builds on and its predecessor, so restore() can check
+    that the chain is complete.
+
+    `directory/manifest.json` remembers where the chain stands. It only
+    moves on with commit(), i.e. once a backup has actually been delivered.
+    """
+
+    def __init__(self, directory, key):
+        self.directory = directory
+        self.key = key
+        self.manifest_path = os.path.join(directory, "manifest.json")
+        os.makedirs(directory, exist_ok=True)
+
+        # last_date/last_date_count: newest archived date in the chain and how many days of that date it has
+        self.manifest = {"last_full": None, "last_full_date": None, "last_id": None,
+                         "last_date": None, "last_date_count": 0, "corrected": [], "files": []}
+        if os.path.exists(self.manifest_path):
+            try:
+                with open(self.manifest_path, "r") as f:
+                    self.manifest.update(json.load(f))
+            except Exception as e:
+                print(f"Error loading backup manifest: {e}")
+
+    def _save_manifest(self):
+        atomic_write_json(self.manifest_path, self.manifest, indent=None)
+
+    def mark_corrected(self, day):
+        """An archived day changed; the next delta must carry it again if it was already backed up."""
+        last_date = self.manifest["last_date"]
+        if last_date and day <= last_date and day not in self.manifest["corrected"]:
+            self.manifest["corrected"].append(day)
+            self._save_manifest()
+
+    def plan(self, full=None, full_every_days=28, export=False):
+        """
+        Header of the next backup. A full backup is made when asked for, for
+        exports, when there is no chain yet or when the last full one is
+        older than `full_every_days`.
+        """
+        now = local_now()
+        if full is None:
+            last_full_date = self.manifest["last_full_date"]
+            full = (
+                export or not self.manifest["last_full"] or not last_full_date
+                or date.fromisoformat(last_full_date) <= now.date() - timedelta(days=full_every_days)
+            )
+        kind = "export" if export else ("full" if full else "delta")
+        backup_id = f"{self.key}-{now.strftime('%Y%m%d-%H%M%S')}-{kind}"
+        n = 1
+        while any(name.startswith(f"knecht_{backup_id}.") for name in os.listdir(self.directory)):
+            n += 1
+            backup_id = f"{self.key}-{now.strftime('%Y%m%d-%H%M%S')}-{kind}{n}"
+        return {
+            "format": FORMAT,
+            "id": backup_id,
+            "kind": FULL if full else DELTA,
+            "partition": self.key,
+            "created": now.isoformat(),
+            "base": None if full else self.manifest["last_full"],
+            "previous": None if full else self.manifest["last_id"],
+            "since": None if full else self.manifest["last_date"],
+            "since_count": 0 if full else self.manifest["last_date_count"],
+            "corrected": [] if full else sorted(self.manifest["corrected"])
+        }
+
+    def _days(self, header, history):
+        """(line kind, archived day): new days are "day", every entry of a corrected date is "corrected"."""
+        if header["kind"] == FULL:
+            for day in history.iter_days():
+                yield "day", day
+            return
+        since, skip = header["since"], header["since_count"]
+        for day in history.iter_days(start=since):
+            date_str = day.get("date", "")
+            if since and date_str == since and skip > 0:
+                skip -= 1 # Already in an earlier backup
+            elif not since or date_str >= since:
+                yield "day", day
+        for corrected in header["corrected"]:
+            if corrected <= (since or ""):
+                for day in history.iter_days(start=corrected, end=corrected):
+                    yield "corrected", day
+
+    def write(self, header, state, history, part_bytes=DEFAULT_PART_BYTES):
+        """
+        Runs in a worker thread. Streams the backup to disk, reading the history
+        one segment at a time from history.snapshot(), so a correction made
+        meanwhile can't tear a segment. `state` is a captured snapshot (see
+        KnechtPartition._snapshot_data). Returns the part paths; where the
+        backup ends is stored in header["until"] / header["until_count"].
+        """
+        path = os.path.join(self.directory, f"knecht_{header['id']}.jsonl.gz")
+        until, until_count = header["since"], header["since_count"]
+        days = 0
+        out = SplitWriter(path, part_bytes)
+        try:
+            with history.snapshot() as frozen, gzip.GzipFile(filename="", mode="wb", fileobj=out, mtime=0) as gz:
+                def line(obj):
+                    gz.write(json.dumps(obj, separators=(",", ":")).encode("utf-8") + b"\n")
+
+                line({"header": header})
+                line({"state": state_to_json(state)})
+                for kind, day in self._days(header, frozen):
+                    line({kind: day})
+                    days += 1
+                    date_str = day.get("date", "")
+                    if kind != "day" or len(date_str) != 10:
+                        continue
+                    if until is None or date_str > until:
+                        until, until_count = date_str, 1
+                    elif date_str == until:
+                        until_count += 1
+                line({"end": {"days": days}})
+        except BaseException:
+            self.discard(out.close())
+            raise
+        paths = out.close()
+        header["until"], header["until_count"] = until, until_count
+        return paths
+
+    def commit(self, header, paths):
+        """The backup was delivered: later deltas build on it. Files of older chains are removed."""
+        if header["kind"] == FULL:
+            for old in self.manifest["files"]:
+                if old not in paths and os.path.exists(old):
+                    os.remove(old)
+            self.manifest["files"] = []
+            self.manifest["last_full"] = header["id"]
+            self.manifest["last_full_date"] = header["created"][:10]
+        self.manifest["files"].extend(paths)
+        self.manifest["last_id"] = header["id"]
+        self.manifest["last_date"] = header["until"]
+        self.manifest["last_date_count"] = header["until_count"]
+        self.manifest["corrected"] = [d for d in self.manifest["corrected"] if d not in header["corrected"]]
+        self._save_manifest()
+
+    @staticmethod
+    def discard(paths):
+        """Remove the files of a backup that was not committed (exports, failed uploads)."""
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+
+
+# --- Restore ---
+
+def _split_part(path):
+    """(backup file name, part number or None)."""
+    base, ext = os.path.splitext(path)
+    if ext[1:].isdigit():
+        return base, int(ext[1:])
+    return path, None
+
+
+def read_backup(paths):
+    """Yield the JSON lines of one backup, given its parts (in order)."""
+    reader = _ConcatReader(paths)
+    try:
+        with gzip.GzipFile(fileobj=reader, mode="rb") as gz:
+            for raw in gz:
+                if raw.strip():
+                    yield json.loads(raw)
+    finally:
+        reader.close()
+
+
+def _load_backup(name, parts):
+    """Check the parts of one backup and read its header."""
+    numbers = [n for _, n in parts]
+    if None in numbers and len(parts) > 1:
+        raise ValueError(f"{name} is given both whole and in parts")
+    if None not in numbers and numbers != list(range(1, len(parts) + 1)):
+        raise ValueError(f"{name}: parts {numbers} given, a part is missing")
+    paths = [path for path, _ in parts]
+    try:
+        header = next(read_backup(paths), {}).get("header")
+    except (OSError, EOFError, ValueError) as e:
+        raise ValueError(f"{name} can't be read: {e}")
+    if not header or header.get("format") != FORMAT:
+        raise ValueError(f"{name} is not a Knecht backup")
+    return header, paths
+
+
+def restore(paths, data_dir, force=False):
+    """
+    Rebuild a data directory (knecht.json + history segments) from backup
+    files: the newest full backup and the deltas that follow it. `paths` may
+    contain parts of several backups in any order. Returns a summary dict.
+    """
+    groups = {}
+    for path in paths:
+        name, number = _split_part(path)
+        groups.setdefault(name, []).append((path, number))
+    backups = [_load_backup(name, sorted(parts, key=lambda p: p[1] or 0)) for name, parts in groups.items()]
+
+    fulls = [b for b in backups if b[0]["kind"] == FULL]
+    if not fulls:
+        raise ValueError("No full backup among the given files")
+    full = max(fulls, key=lambda b: b[0]["created"])
+    chain = [full]
+    deltas = sorted((b for b in backups if b[0].get("base") == full[0]["id"]), key=lambda b: b[0]["created"])
+    for delta in deltas:
+        if delta[0]["previous"] != chain[-1][0]["id"]:
+            raise ValueError(f"{delta[0]['id']} follows {delta[0]['previous']}, which is missing")
+        chain.append(delta)
+
+    # A leftover journal would be replayed on top of the restored snapshot
+    journal_files = ["knecht_journal.jsonl", "knecht_journal.jsonl.old"]
+    if not force:
+        for existing in ["knecht.json", os.path.join("history", "manifest.json")] + journal_files:
+            if os.path.exists(os.path.join(data_dir, existing)):
+                raise ValueError(f"{os.path.join(data_dir, existing)} already exists (use --force to overwrite)")
+
+    state = None
+    days = [] # In archive order; the same date can occur more than once (manual resets)
+    for header, parts in chain:
+        complete = False
+        corrected = {}
+        try:
+            for line in read_backup(parts):
+                if "state" in line:
+                    state = line["state"]
+                elif "day" in line:
+                    days.append(line["day"])
+                elif "corrected" in line:
+                    corrected.setdefault(line["corrected"].get("date"), []).append(line["corrected"])
+                elif "end" in line:
+                    complete = True
+        except (OSError, EOFError, ValueError) as e:
+            raise ValueError(f"Backup {header['id']} is damaged: {e}")
+        if not complete:
+            raise ValueError(f"Backup {header['id']} is truncated (missing part?)")
+        if corrected:
+            # Every entry of a corrected date is replaced by the delta's version
+            merged = []
+            for day in days:
+                date_str = day.get("date")
+                if date_str not in corrected:
+                    merged.append(day)
+                elif corrected[date_str] is not None:
+                    merged.extend(corrected[date_str])
+                    corrected[date_str] = None
+            days = merged
+
+    os.makedirs(data_dir, exist_ok=True)
+    history_dir = os.path.join(data_dir, "history")
+    if force:
+        for name in journal_files:
+            if os.path.exists(os.path.join(data_dir, name)):
+                os.remove(os.path.join(data_dir, name))
+        if os.path.isdir(history_dir):
+            for name in os.listdir(history_dir):
+                os.remove(os.path.join(history_dir, name))
+    HistoryArchive(history_dir).extend(days)
+    atomic_write_json(os.path.join(data_dir, "knecht.json"), state)
+
+    return {
+        "backups": [header["id"] for header, _ in chain],
+        "days": len(days),
+        "last_reset_date": state.get("last_reset_date")
+    }
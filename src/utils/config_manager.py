@@ -0,0 +1,188 @@
+import json
+import os
+import time
+from types import MappingProxyType
+
+SETTINGS_FILE = "config/settings.json"
+PERMS_FILE = "config/perms.json"
+MECHANICS_FILE = "config/mechanics.json"
+
+SETTINGS_DEFAULTS = {"panel_liveduration": 60}
+MECHANICS_DEFAULTS = {"place_value": 10000, "fix_value": 10000}
+
+
+def freeze(value):
+    """Read-only copy of parsed JSON: dicts become mappingproxies, lists tuples."""
+    if isinstance(value, dict):
+        return MappingProxyType({k: freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def validate_settings(data):
+    """Raises ValueError for settings the bot can't run with."""
+    if not isinstance(data, dict):
+        raise ValueError("expected an object")
+    liveduration = data.get("panel_liveduration", 60)
+    if not isinstance(liveduration, int) or liveduration <= 0:
+        raise ValueError(f"panel_liveduration must be a positive integer, got {liveduration!r}")
+    minutes = data.get("reminder_minutes", [])
+    if not isinstance(minutes, list) or not all(isinstance(m, int) and 0 <= m < 60 for m in minutes):
+        raise ValueError(f"reminder_minutes must be a list of minutes (0-59), got {minutes!r}")
+    for key in ["persistence_window", "dashboard_interval", "scheduler_grace_seconds", "role_member_refresh_minutes"]:
+        if key in data and (not _is_number(data[key]) or data[key] < 0):
+            raise ValueError(f"{key} must be a non-negative number, got {data[key]!r}")
+    for key in ["collect_alerts", "reminder_dm_fallback", "lean_gateway"]:
+        if key in data and not isinstance(data[key], bool):
+            raise ValueError(f"{key} must be true or false, got {data[key]!r}")
+    concurrency = data.get("reminder_dm_concurrency", 4)
+    if not isinstance(concurrency, int) or concurrency <= 0:
+        raise ValueError(f"reminder_dm_concurrency must be a positive integer, got {concurrency!r}")
+    full_every = data.get("backup_full_every_days", 28)
+    if not isinstance(full_every, int) or full_every <= 0:
+        raise ValueError(f"backup_full_every_days must be a positive integer, got {full_every!r}")
+    part_bytes = data.get("backup_part_bytes")
+    if part_bytes is not None and (not isinstance(part_bytes, int) or part_bytes <= 0):
+        raise ValueError(f"backup_part_bytes must be a positive integer or null, got {part_bytes!r}")
+    if data.get("storage_backend", "json") not in ("json", "sqlite"):
+        raise ValueError(f"storage_backend must be 'json' or 'sqlite', got {data['storage_backend']!r}")
+    if data.get("partition_by", "guild") not in ("guild", "channel", "none"):
+        raise ValueError(f"partition_by must be 'guild', 'channel' or 'none', got {data['partition_by']!r}")
+    if not isinstance(data.get("partitions", {}), dict):
+        raise ValueError("partitions must be an object")
+
+
+def validate_perms(data):
+    if not isinstance(data, dict) or not all(isinstance(v, str) for v in data.values()):
+        raise ValueError("expected an object of command name -> role name")
+
+
+def validate_mechanics(data):
+    if not isinstance(data, dict):
+        raise ValueError("expected an object")
+    for key, value in data.items():
+        if key.startswith("_"):
+            continue # Comments
+        if not _is_number(value) or value < 0:
+            raise ValueError(f"{key} must be a non-negative number, got {value!r}")
+
+
+class ConfigFile:
+    """
+    One JSON config file as an immutable mapping, reloaded when the file's
+    mtime or size changes. The file is stat()ed at most once per
+    `check_interval` seconds, so get() is normally a clock read.
+
+    A file that fails to parse or validate is reported and the previous
+    version stays in use. Callbacks registered with on_change() get the new
+    mapping after every reload.
+    """
+
+    def __init__(self, path, defaults=None, validate=None, check_interval=1.0):
+        self.path = path
+        self.defaults = dict(defaults or {})
+        self.validate = validate
+        self.check_interval = check_interval
+        self.reloads = 0
+
+        self._value = freeze(self.defaults)
+        self._stamp = None
+        self._next_check = 0.0
+        self._listeners = []
+        self._check()
+
+    def get(self):
+        now = time.monotonic()
+        if now >= self._next_check:
+            self._next_check = now + self.check_interval
+            self._check()
+        return self._value
+
+    def on_change(self, callback):
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def _check(self):
+        try:
+            st = os.stat(self.path)
+            stamp = (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            stamp = None
+        if stamp == self._stamp:
+            return
+        first = self.reloads == 0
+        self._stamp = stamp
+
+        if stamp is None:
+            print(f"[Config] Warning: {self.path} not found. Using defaults.")
+            self._set(freeze(self.defaults))
+            return
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            if self.validate:
+                self.validate(data)
+        except (OSError, ValueError) as e: # JSONDecodeError is a ValueError
+            print(f"[Config] Error loading {self.path}, keeping the previous version: {e}")
+            return
+
+        if not first:
+            print(f"[Config] Reloaded {self.path}")
+        self._set(freeze({**self.defaults, **data}))
+
+    def _set(self, value):
+        self._value = value
+        self.reloads += 1
+        for callback in self._listeners:
+            try:
+                callback(value)
+            except Exception as e:
+                print(f"[Config] Change handler for {self.path} failed: {e}")
+
+
+class ConfigManager:
+    """
+    The bot's JSON config files (settings, permissions, mechanics), each a
+    ConfigFile. `settings`, `perms` and `mechanics` always return the current
+    version; hold on to the result only for the duration of one operation.
+    """
+
+    KNOWN = {
+        SETTINGS_FILE: (SETTINGS_DEFAULTS, validate_settings),
+        PERMS_FILE: ({}, validate_perms),
+        MECHANICS_FILE: (MECHANICS_DEFAULTS, validate_mechanics),
+    }
+
+    def __init__(self):
+        self._files = {}
+
+    def file(self, path):
+        """The ConfigFile for `path`, loaded on first use."""
+        config_file = self._files.get(path)
+        if config_file is None:
+            defaults, validate = self.KNOWN.get(path, ({}, None))
+            config_file = self._files[path] = ConfigFile(path, defaults, validate)
+        return config_file
+
+    @property
+    def settings(self):
+        return self.file(SETTINGS_FILE).get()
+
+    @property
+    def perms(self):
+        return self.file(PERMS_FILE).get()
+
+    @property
+    def mechanics(self):
+        return self.file(MECHANICS_FILE).get()
+
+
+config_manager = ConfigManager()
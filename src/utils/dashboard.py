@@ -0,0 +1,92 @@
+import asyncio
+import time
+
+import discord
+
+from src.utils.metrics import metrics
+from src.utils.reminders import channel_traffic
+
+
+class DashboardUpdater:
+    """
+    Debounced editor for the tracking message.
+
+    `request()` is cheap and can be called on every click. Edits go through a
+    PartialMessage (no fetch_message), are skipped when the rendered embed
+    hasn't changed and happen at most once per `interval` seconds; a request
+    that arrives while an edit is waiting or running triggers one more edit,
+    so the last state is always shown. Edits are low priority: they wait
+    while reminders are being sent to the channel (see ChannelTraffic).
+
+    `render()` returns the embed, `get_message()` the PartialMessage (or None)
+    and `on_missing()` is called when the message was deleted.
+    """
+
+    def __init__(self, render, get_message, on_missing=None, interval=2.0):
+        self.render = render
+        self.get_message = get_message
+        self.on_missing = on_missing
+        self.interval = interval
+
+        self.stats = {"requests": 0, "edits": 0, "skipped": 0, "deferred": 0}
+        self._dirty = False
+        self._task = None
+        self._last_edit = 0.0
+        self._last_shown = None # (message id, description) of the last successful edit
+
+    def request(self):
+        self.stats["requests"] += 1
+        self._dirty = True
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return # No loop, nothing to edit
+        if self._task is None:
+            self._task = loop.create_task(self._run())
+
+    async def _run(self):
+        try:
+            while self._dirty:
+                wait = self._last_edit + self.interval - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                self._dirty = False
+                await self._edit()
+        finally:
+            self._task = None
+
+    async def _edit(self):
+        msg = self.get_message()
+        if msg is None:
+            return
+        if await channel_traffic.wait_low(msg.channel.id):
+            self.stats["deferred"] += 1
+        embed = self.render()
+        shown = (msg.id, embed.description)
+        if shown == self._last_shown:
+            self.stats["skipped"] += 1
+            return
+
+        try:
+            async with metrics.timer("dashboard.edit"):
+                channel_traffic.record(msg.channel.id)
+                await msg.edit(embed=embed)
+        except discord.NotFound:
+            self._last_shown = None
+            if self.on_missing:
+                self.on_missing()
+            return
+        except discord.HTTPException as e:
+            print(f"[Dashboard] Edit failed: {e}")
+            return
+        self._last_edit = time.monotonic()
+        self._last_shown = shown
+        self.stats["edits"] += 1
+
+    def describe(self):
+        """One-line summary for status output."""
+        s = self.stats
+        return (
+            f"{s['edits']} edits for {s['requests']} requests "
+            f"({s['skipped']} unchanged, {s['deferred']} deferred for reminders)"
+        )
@@ -0,0 +1,313 @@
+import json
+import os
+import re
+import sys
+import threading
+
+from src.utils.persistence import atomic_write_json
+from src.utils.id_index import IdIndex
+
+DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+class HistoryArchive:
+    """
+    Archived days, kept out of the main state.
+
+    Days are appended to monthly JSONL segments (data/history/2026-10.jsonl,
+    one archived day per line); data/history/manifest.json lists the dates
+    and byte size of every segment. Nothing is read from the segments until
+    someone asks for a date range.
+
+    data/history/ids.jsonl lists (id, category, user) of every archived event
+    per day, so /knecht_clear can find an archived event without reading the
+    segments. It is only loaded on the first archived lookup.
+
+    `lock` is held while the segments or the manifest change; snapshot()
+    takes it briefly so a backup thread never reads a half-rewritten month.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.manifest_path = os.path.join(directory, "manifest.json")
+        self.ids_path = os.path.join(directory, "ids.jsonl")
+        os.makedirs(directory, exist_ok=True)
+        self._ids = None # Lazily loaded IdIndex: event id -> (date, category, user_id)
+        self.lock = threading.RLock()
+
+        self.manifest = {"last_seq": 0, "segments": {}}
+        if os.path.exists(self.manifest_path):
+            try:
+                with open(self.manifest_path, "r") as f:
+                    self.manifest = json.load(f)
+            except Exception as e:
+                print(f"Error loading history manifest: {e}")
+
+    @staticmethod
+    def segment_key(date_str):
+        """Month key (YYYY-MM) for a date; odd dates like "Unknown" share one segment."""
+        if date_str and DATE_RE.match(date_str):
+            return date_str[:7]
+        return "unknown"
+
+    def _segment_path(self, key):
+        return os.path.join(self.directory, f"{key}.jsonl")
+
+    def __len__(self):
+        return sum(len(seg["days"]) for seg in self.manifest["segments"].values())
+
+    def fingerprint(self):
+        """[days, bytes] of the archive; changes with every append and removal."""
+        return [len(self), sum(seg["bytes"] for seg in self.manifest["segments"].values())]
+
+    def dates(self):
+        """All archived dates, oldest first, without touching any segment."""
+        result = []
+        for key in sorted(self.manifest["segments"]):
+            result.extend(self.manifest["segments"][key]["days"])
+        return result
+
+    def append(self, entry, seq=None):
+        """
+        Archive one day. `seq` is the journal seq of the reset that produced it;
+        replaying the same reset after a crash is then a no-op.
+        """
+        with self.lock:
+            if seq is not None and seq <= self.manifest.get("last_seq", 0):
+                return False
+            self._write_entries([entry])
+            if seq is not None:
+                self.manifest["last_seq"] = seq
+            self._save_manifest()
+            return True
+
+    def extend(self, entries):
+        """Archive many days at once (migration). The manifest is written once at the end."""
+        with self.lock:
+            self._write_entries(entries)
+            self._save_manifest()
+
+    def _write_entries(self, entries):
+        by_key = {}
+        for entry in entries:
+            by_key.setdefault(self.segment_key(entry.get("date")), []).append(entry)
+
+        for key, group in by_key.items():
+            seg = self.manifest["segments"].setdefault(key, {"days": [], "bytes": 0})
+            payload = "".join(json.dumps(e, separators=(",", ":")) + "\n" for e in group).encode("utf-8")
+            path = self._segment_path(key)
+            with open(path, "ab") as f:
+                # Anything past the manifest's size is a leftover from a crash
+                if f.tell() != seg["bytes"]:
+                    f.truncate(seg["bytes"])
+                    f.seek(seg["bytes"])
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+            seg["days"].extend(e.get("date", "Unknown") for e in group)
+            seg["bytes"] += len(payload)
+
+        self._append_ids([self._id_line(e) for e in entries])
+
+    @staticmethod
+    def _id_line(entry):
+        events = []
+        for category, cat_events in entry.get("work", {}).items():
+            if isinstance(cat_events, list):
+                events.extend([e["id"], category, str(e["user_id"])] for e in cat_events)
+        return {"date": entry.get("date", "Unknown"), "events": events}
+
+    def _append_ids(self, lines):
+        if not lines:
+            return
+        payload = "".join(json.dumps(line, separators=(",", ":")) + "\n" for line in lines)
+        with open(self.ids_path, "a", encoding="utf-8") as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        if self._ids is not None:
+            for line in lines:
+                self._apply_id_line(self._ids, line)
+
+    @staticmethod
+    def _apply_id_line(index, line):
+        date = line["date"]
+        for event_id, category, user_id in line.get("events", []):
+            index.discard(event_id, date, category) # Duplicate lines after a crash
+            # Interned: the same few categories and users repeat for every archived event
+            index.add(event_id, (date, sys.intern(category), sys.intern(user_id)))
+        for event_id, category in line.get("removed", []):
+            index.discard(event_id, date, category)
+
+    def _read_id_lines(self, index, offset):
+        """Apply the complete lines of ids.jsonl from byte `offset` on; returns where they end."""
+        if not os.path.exists(self.ids_path):
+            return offset
+        with open(self.ids_path, "rb") as f:
+            f.seek(offset)
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    break # Still being written, or torn by a crash
+                offset += len(raw)
+                try:
+                    line = json.loads(raw)
+                except json.JSONDecodeError:
+                    continue # Torn line from a crash
+                self._apply_id_line(index, line)
+        return offset
+
+    def _load_ids(self):
+        """
+        The id index, read from ids.jsonl on first use (call it from a worker
+        thread: a long history has millions of ids). The file is read and
+        sorted without the lock; only the lines appended meanwhile are read
+        under it.
+        """
+        if self._ids is not None:
+            return self._ids
+        with self.lock:
+            if not os.path.exists(self.ids_path) and self.manifest["segments"]:
+                # Segments written before the id file existed: build it once
+                print(f"[History] Building {self.ids_path}...")
+                self._append_ids([self._id_line(e) for e in self.iter_days()])
+
+        index = IdIndex()
+        index.bulk_load()
+        offset = self._read_id_lines(index, 0)
+        index.finish_load()
+        with self.lock:
+            if self._ids is None:
+                self._read_id_lines(index, offset)
+                self._ids = index
+            return self._ids
+
+    def find_ids(self, prefix):
+        """Archived events whose id starts with `prefix`: [(id, date, category, user_id)], newest day first."""
+        index = self._load_ids()
+        with self.lock:
+            found = [(event_id,) + ref for event_id, ref in index.find(prefix)]
+        found.sort(key=lambda x: x[1], reverse=True)
+        return found
+
+    def has_event(self, date, category, event_id):
+        """Whether the id index still lists the event; None if the index isn't loaded."""
+        if self._ids is None:
+            return None
+        with self.lock:
+            return any(ref[:2] == (date, category) for ref in self._ids.get(event_id))
+
+    def remove_event(self, date, category, event_id, user_id, profit_value=0):
+        """
+        Remove one event from an archived day and take `profit_value` off that
+        day's profit. Only the affected month segment is rewritten.
+        Returns True if the event was still there (replays are no-ops).
+        """
+        with self.lock:
+            if self.has_event(date, category, event_id) is False:
+                return False # Already removed (see KnechtPartition.clear_archived)
+            key = self.segment_key(date)
+            days = self.load_segment(key)
+            changed = False
+            for day in days:
+                if day.get("date") != date:
+                    continue
+                events = day.get("work", {}).get(category, [])
+                kept = [e for e in events if e["id"] != event_id]
+                if len(kept) < len(events):
+                    day["work"][category] = kept
+                    if profit_value and user_id in day.get("profit", {}):
+                        day["profit"][user_id] = max(0, day["profit"][user_id] - profit_value)
+                    changed = True
+                    break
+
+            if changed:
+                payload = "".join(json.dumps(d, separators=(",", ":")) + "\n" for d in days).encode("utf-8")
+                path = self._segment_path(key)
+                tmp_path = f"{path}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(payload)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, path)
+                self.manifest["segments"][key]["bytes"] = len(payload)
+                self._save_manifest()
+
+            self._append_ids([{"date": date, "removed": [[event_id, category]]}])
+            return changed
+
+    def _save_manifest(self):
+        atomic_write_json(self.manifest_path, self.manifest, indent=None)
+
+    def load_segment(self, key):
+        """Read one segment (list of archived days)."""
+        seg = self.manifest["segments"].get(key)
+        if not seg:
+            return []
+        with open(self._segment_path(key), "rb") as f:
+            raw = f.read(seg["bytes"])
+        return [json.loads(line) for line in raw.splitlines() if line]
+
+    def iter_days(self, start=None, end=None):
+        """
+        Yield archived days with start <= date <= end (ISO strings, inclusive).
+        Only segments overlapping the range are loaded. Days without a proper
+        date are only included when no range is given.
+        """
+        return _iter_days(self.manifest["segments"], self.load_segment, start, end)
+
+    def snapshot(self):
+        """
+        Frozen view of the archive for a reader thread (backups): the manifest
+        as it is now and an open handle on every segment, so a later
+        remove_event (which replaces the file) or append doesn't change what
+        it reads. Use it as a context manager.
+        """
+        with self.lock:
+            return HistorySnapshot(
+                {key: dict(seg, days=list(seg["days"])) for key, seg in self.manifest["segments"].items()},
+                {key: open(self._segment_path(key), "rb") for key in self.manifest["segments"]}
+            )
+
+
+class HistorySnapshot:
+    """What HistoryArchive.snapshot() returns: iter_days() over the archive as it was."""
+
+    def __init__(self, segments, files):
+        self.segments = segments
+        self.files = files
+
+    def load_segment(self, key):
+        f = self.files[key]
+        f.seek(0)
+        raw = f.read(self.segments[key]["bytes"])
+        return [json.loads(line) for line in raw.splitlines() if line]
+
+    def iter_days(self, start=None, end=None):
+        return _iter_days(self.segments, self.load_segment, start, end)
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _iter_days(segments, load_segment, start, end):
+    ranged = start is not None or end is not None
+    for key in sorted(segments):
+        if key == "unknown":
+            if ranged:
+                continue
+        elif (start and key < start[:7]) or (end and key > end[:7]):
+            continue
+        for entry in load_segment(key):
+            date = entry.get("date", "")
+            if start and date < start:
+                continue
+            if end and date > end:
+                continue
+            yield entry
@@ -1,24 +1,15 @@
-import json
-import os
+from src.utils.config_manager import config_manager, MECHANICS_FILE
 
 class HallOfFame:
-    def __init__(self, mechanics_file="config/mechanics.json"):
+    def __init__(self, mechanics_file=MECHANICS_FILE):
         self.mechanics_file = mechanics_file
-        # Defaults if file missing
-        self.mechanics = { 
-            "place_value": 10000, 
-            "fix_value": 10000 
-        } 
-        self.load_mechanics()
+        # Defaults if file missing, reloaded when it changes
+        self._mechanics = config_manager.file(mechanics_file)
 
-    def load_mechanics(self):
-        """Load value mapping from JSON."""
-        if os.path.exists(self.mechanics_file):
-            try:
-                with open(self.mechanics_file, 'r') as f:
-                    self.mechanics = json.load(f)
-            except Exception as e:
-                print(f"Error loading mechanics: {e}")
+    @property
+    def mechanics(self):
+        """Value mapping from mechanics.json (read-only)."""
+        return self._mechanics.get()
 
     def get_leaderboard(self, daily_work, daily_profit, daily_batteries):
         """
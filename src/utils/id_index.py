@@ -0,0 +1,71 @@
+from bisect import bisect_left, insort
+
+
+class IdIndex:
+    """
+    Prefix-searchable map of ids to references (tuples describing where the
+    item lives). Several references may share an id, e.g. a panel and the
+    "placed" event that created it.
+    """
+
+    def __init__(self):
+        self._keys = []  # sorted unique ids; None while bulk loading
+        self._refs = {}  # id -> [ref, ...]
+
+    def __len__(self):
+        return len(self._refs)
+
+    def bulk_load(self):
+        """
+        Stop keeping the ids sorted until finish_load() (or the next lookup),
+        which sorts them once. For filling a large index: one insort per new
+        id is O(n) each.
+        """
+        self._keys = None
+
+    def finish_load(self):
+        self._sorted_keys()
+
+    def _sorted_keys(self):
+        if self._keys is None:
+            self._keys = sorted(self._refs)
+        return self._keys
+
+    def add(self, item_id, ref):
+        refs = self._refs.get(item_id)
+        if refs is None:
+            self._refs[item_id] = [ref]
+            if self._keys is not None:
+                insort(self._keys, item_id)
+        else:
+            refs.append(ref)
+
+    def discard(self, item_id, *ref_prefix):
+        """Drop the references of `item_id` whose leading fields equal `ref_prefix`."""
+        refs = self._refs.get(item_id)
+        if not refs:
+            return
+        n = len(ref_prefix)
+        refs[:] = [r for r in refs if r[:n] != ref_prefix]
+        if not refs:
+            del self._refs[item_id]
+            if self._keys is not None:
+                del self._keys[bisect_left(self._keys, item_id)]
+
+    def get(self, item_id):
+        return self._refs.get(item_id, [])
+
+    def find(self, prefix):
+        """All (id, ref) pairs whose id starts with `prefix`, in id order."""
+        found = []
+        keys = self._sorted_keys()
+        i = bisect_left(keys, prefix)
+        while i < len(keys) and keys[i].startswith(prefix):
+            item_id = keys[i]
+            found.extend((item_id, ref) for ref in self._refs[item_id])
+            i += 1
+        return found
+
+    def clear(self):
+        self._keys = []
+        self._refs.clear()
@@ -0,0 +1,118 @@
+import json
+import os
+import shutil
+
+
+class EventJournal:
+    """
+    Append-only JSONL journal of state mutations.
+
+    Every record is one line: {"seq": int, "op": str, ...}. Appends are
+    buffered; `flush()` hands them to the OS and `fsync()` (safe to call from
+    a worker thread) makes them durable. Once `compact_after` records have
+    piled up, the owner should write a snapshot.
+
+    While a snapshot is being written the covered records are moved aside with
+    `rotate()` and only deleted with `discard_rotated()` once it has landed.
+    """
+
+    def __init__(self, path, compact_after=1000):
+        self.path = path
+        self.rotated_path = f"{path}.old"
+        self.compact_after = compact_after
+
+        self.record_count = 0
+        self._file = None
+
+    def _open(self):
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        return self._file
+
+    def replay(self):
+        """
+        Yield all records, rotated ones first.
+        A torn trailing line (crash mid-write) is dropped and cut off the file.
+        """
+        self.record_count = 0
+        for path in [self.rotated_path, self.path]:
+            if os.path.exists(path):
+                yield from self._replay_file(path)
+
+    def _replay_file(self, path):
+        good_offset = 0
+        torn = False
+        with open(path, "rb") as f:
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    torn = True
+                    break
+                try:
+                    record = json.loads(raw)
+                except json.JSONDecodeError:
+                    torn = True
+                    break
+                good_offset += len(raw)
+                self.record_count += 1
+                yield record
+
+        if torn:
+            print(f"[Journal] Dropping torn tail of {path} at byte {good_offset}.")
+            with open(path, "r+b") as f:
+                f.truncate(good_offset)
+
+    def append(self, record):
+        """Buffer one record. Call `flush()`/`fsync()` to persist it."""
+        line = json.dumps(record, separators=(",", ":"))
+        self._open().write(line + "\n")
+        self.record_count += 1
+
+    def flush(self):
+        """Hand buffered records to the OS (survives a process crash)."""
+        if self._file is not None:
+            self._file.flush()
+
+    def fsync(self):
+        """Make flushed records durable. Only touches the fd, so it is fine in a worker thread."""
+        f = self._file
+        if f is not None:
+            try:
+                os.fsync(f.fileno())
+            except (ValueError, OSError):
+                pass # Closed/rotated in the meantime; the snapshot covers it
+
+    def needs_compaction(self):
+        return self.record_count >= self.compact_after
+
+    def rotate(self):
+        """Move the current records aside; they are about to be covered by a snapshot."""
+        self.close()
+        self.record_count = 0
+        if not os.path.exists(self.path):
+            return
+        if os.path.exists(self.rotated_path):
+            # The previous snapshot never landed, keep its records too
+            with open(self.rotated_path, "ab") as dst, open(self.path, "rb") as src:
+                shutil.copyfileobj(src, dst)
+            os.remove(self.path)
+        else:
+            os.replace(self.path, self.rotated_path)
+
+    def discard_rotated(self):
+        """Drop rotated records once the snapshot covering them is on disk."""
+        if os.path.exists(self.rotated_path):
+            os.remove(self.rotated_path)
+
+    def truncate(self):
+        """Drop all records (after they have been folded into a snapshot)."""
+        self.close()
+        with open(self.path, "w", encoding="utf-8"):
+            pass
+        self.discard_rotated()
+        self.record_count = 0
+
+    def close(self):
+        if self._file is not None:
+            self._file.flush()
+            self._file.close()
+            self._file = None
@@ -0,0 +1,76 @@
+from sortedcontainers import SortedList
+
+
+class RankedBoard:
+    """
+    Order-statistic map of user -> score.
+
+    Entries are kept in a SortedList of (-score, user_id), so updating a user,
+    looking up their rank and reading the top N are all O(log n) (plus N for
+    the top list). Users with equal scores share a rank.
+    """
+
+    def __init__(self, scores=None):
+        self._scores = {}
+        self._sorted = SortedList()
+        for uid, score in (scores or {}).items():
+            self.set(uid, score)
+
+    def __len__(self):
+        return len(self._scores)
+
+    def __contains__(self, uid):
+        return uid in self._scores
+
+    def get(self, uid):
+        return self._scores.get(uid, 0)
+
+    def set(self, uid, score):
+        old = self._scores.get(uid)
+        if old is not None:
+            self._sorted.remove((-old, uid))
+        self._scores[uid] = score
+        self._sorted.add((-score, uid))
+
+    def add(self, uid, delta):
+        self.set(uid, self._scores.get(uid, 0) + delta)
+
+    def rank(self, uid):
+        """1-based rank of `uid`, or None if they are not on the board."""
+        score = self._scores.get(uid)
+        if score is None:
+            return None
+        return self._sorted.bisect_left((-score,)) + 1
+
+    def top(self, n=10):
+        """[(user_id, score)] of the best `n`, best first."""
+        return [(uid, -neg) for neg, uid in self._sorted[:n]]
+
+
+class LifetimeLeaderboard:
+    """
+    Lifetime rankings by profit and by total work (placed + fixes +
+    containers + hafenevents). Built once from the lifetime totals and then
+    updated only for the users a reset or correction touched.
+    """
+
+    def __init__(self):
+        self.profit = RankedBoard()
+        self.work = RankedBoard()
+
+    def rebuild(self, lifetime_profit, lifetime_work):
+        self.profit = RankedBoard(lifetime_profit)
+        totals = {}
+        for per_user in lifetime_work.values():
+            for uid, count in per_user.items():
+                totals[uid] = totals.get(uid, 0) + count
+        self.work = RankedBoard(totals)
+
+    def refresh(self, uids, lifetime_profit, lifetime_work):
+        """Re-read the totals of `uids` after they changed."""
+        for uid in uids:
+            if uid in lifetime_profit:
+                self.profit.set(uid, lifetime_profit[uid])
+            work = sum(per_user.get(uid, 0) for per_user in lifetime_work.values())
+            if work or uid in self.work:
+                self.work.set(uid, work)
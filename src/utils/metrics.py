@@ -0,0 +1,231 @@
+import asyncio
+import os
+import time
+from bisect import bisect_left
+from contextlib import asynccontextmanager
+
+import discord
+
+# Histogram bucket upper bounds in ms; 2500/3000 bracket Discord's 3 s interaction deadline
+BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 3000, 5000, 10000)
+
+
+class Histogram:
+    """Fixed-bucket latency histogram: one bisect and a few adds per observation."""
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1) # Last one is +Inf
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, ms):
+        self.counts[bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (the max for the +Inf bucket)."""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= target:
+                return BUCKETS_MS[i] if i < len(BUCKETS_MS) else self.max
+        return self.max
+
+    def over(self, ms):
+        """Observations above the bucket bound `ms` (must be one of BUCKETS_MS)."""
+        return sum(self.counts[BUCKETS_MS.index(ms) + 1:])
+
+
+class Metrics:
+    """
+    In-process latency histograms and counters.
+
+    Names are dotted strings ("button.place.total", "rest.calls"). Interactions
+    are timed from `start()` to `finish()`; `acked()` records the time to the
+    first response, both from our handler start and from Discord's creation
+    timestamp (what the 3 s deadline is measured against).
+    """
+
+    def __init__(self):
+        self.histograms = {}
+        self.counters = {}
+        self._started = {} # interaction id -> (name, perf_counter start)
+
+    def observe(self, name, ms):
+        hist = self.histograms.get(name)
+        if hist is None:
+            hist = self.histograms[name] = Histogram()
+        hist.observe(ms)
+
+    def inc(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    @asynccontextmanager
+    async def timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, (time.perf_counter() - start) * 1000)
+
+    # --- Interactions ---
+
+    def start(self, interaction, name):
+        self._started[interaction.id] = (name, time.perf_counter())
+
+    def acked(self, interaction):
+        self.inc("rest.interaction_responses")
+        entry = self._started.get(interaction.id)
+        if entry is None:
+            return
+        name, start = entry
+        self.observe(f"{name}.ack", (time.perf_counter() - start) * 1000)
+        created_at = getattr(interaction, "created_at", None)
+        if created_at is not None:
+            self.observe("interaction.age_at_ack", (discord.utils.utcnow() - created_at).total_seconds() * 1000)
+
+    def finish(self, interaction):
+        entry = self._started.pop(interaction.id, None)
+        if entry is None:
+            return
+        name, start = entry
+        self.observe(f"{name}.total", (time.perf_counter() - start) * 1000)
+
+    @asynccontextmanager
+    async def track(self, interaction, name):
+        self.start(interaction, name)
+        try:
+            yield
+        finally:
+            self.finish(interaction)
+
+    def instrument_http(self, http):
+        """Count and time every REST request made through the bot's HTTP client."""
+        if getattr(http, "_knecht_metrics", False):
+            return
+        original = http.request
+
+        async def request(route, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await original(route, **kwargs)
+            finally:
+                self.inc("rest.calls")
+                self.observe("rest.request", (time.perf_counter() - start) * 1000)
+
+        http.request = request
+        http._knecht_metrics = True
+
+    # --- Output ---
+
+    def summary_lines(self):
+        lines = []
+        for name in sorted(self.histograms):
+            h = self.histograms[name]
+            line = (
+                f"`{name}` n={h.count} p50≤{h.quantile(0.5):g} p95≤{h.quantile(0.95):g} "
+                f"p99≤{h.quantile(0.99):g} max={h.max:.1f} ms"
+            )
+            late = h.over(2500)
+            if late:
+                line += f" ⚠️ {late} over 2.5 s"
+            lines.append(line)
+        for name in sorted(self.counters):
+            lines.append(f"`{name}` = {self.counters[name]:,}")
+        return lines
+
+    def render_prometheus(self):
+        """All metrics in the Prometheus text exposition format."""
+        out = []
+        for name in sorted(self.histograms):
+            h = self.histograms[name]
+            metric = "knecht_" + name.replace(".", "_").replace("-", "_") + "_ms"
+            out.append(f"# TYPE {metric} histogram")
+            cumulative = 0
+            for bound, n in zip(BUCKETS_MS, h.counts):
+                cumulative += n
+                out.append(f'{metric}_bucket{{le="{bound:g}"}} {cumulative}')
+            out.append(f'{metric}_bucket{{le="+Inf"}} {h.count}')
+            out.append(f"{metric}_sum {h.total:.3f}")
+            out.append(f"{metric}_count {h.count}")
+        for name in sorted(self.counters):
+            metric = "knecht_" + name.replace(".", "_").replace("-", "_") + "_total"
+            out.append(f"# TYPE {metric} counter")
+            out.append(f"{metric} {self.counters[name]}")
+        return "\n".join(out) + "\n"
+
+
+class PrometheusExporter:
+    """
+    Optional Prometheus export: rewrites `path` every `interval` seconds
+    and/or serves GET /metrics on 127.0.0.1:`port`.
+    """
+
+    def __init__(self, registry, path=None, port=None, interval=15):
+        self.registry = registry
+        self.path = path
+        self.port = port
+        self.interval = interval
+        self._task = None
+        self._server = None
+
+    async def start(self):
+        if self.path:
+            self._task = asyncio.create_task(self._write_loop())
+        if self.port:
+            self._server = await asyncio.start_server(self._serve, "127.0.0.1", self.port)
+            print(f"[Metrics] Serving Prometheus metrics on http://127.0.0.1:{self.port}/metrics")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    def _write_file(self, text):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, self.path)
+
+    async def _write_loop(self):
+        while True:
+            try:
+                await asyncio.to_thread(self._write_file, self.registry.render_prometheus())
+            except Exception as e:
+                print(f"[Metrics] Export failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def _serve(self, reader, writer):
+        try:
+            request_line = await reader.readline()
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass # Skip headers
+            if request_line.split(b" ")[1:2] == [b"/metrics"]:
+                body = self.registry.render_prometheus().encode("utf-8")
+                status = b"200 OK"
+            else:
+                body, status = b"not found\n", b"404 Not Found"
+            writer.write(
+                b"HTTP/1.1 " + status + b"\r\nContent-Type: text/plain; version=0.0.4\r\n"
+                b"Content-Length: " + str(len(body)).encode() + b"\r\nConnection: close\r\n\r\n" + body
+            )
+            await writer.drain()
+        except Exception:
+            pass
+        finally:
+            writer.close()
+
+
+metrics = Metrics()
@@ -0,0 +1,56 @@
+import asyncio
+
+
+class ArrivalOrder:
+    """
+    Runs critical sections strictly in arrival order.
+
+    A plain asyncio.Lock orders waiters by when they reach the lock; a handler
+    that first awaits a network call (the interaction ack) would then be
+    ordered by how fast that call returned. Here the place in line is taken
+    synchronously when the `async with` block is entered:
+
+        async with order.turn() as turn:
+            await ack()          # not serialised
+            await turn.wait()    # everything below runs one at a time, in arrival order
+            mutate()
+    """
+
+    def __init__(self):
+        self._tail = None # Future of the last turn handed out
+
+    def turn(self):
+        return _Turn(self)
+
+
+class _Turn:
+    def __init__(self, order):
+        self._order = order
+        self._prev = None
+        self._done = None
+
+    async def __aenter__(self):
+        # No await before this point: the place in line is the arrival order
+        self._prev = self._order._tail
+        self._done = asyncio.get_running_loop().create_future()
+        self._order._tail = self._done
+        return self
+
+    async def wait(self):
+        """Wait until every earlier turn has finished."""
+        if self._prev is not None:
+            await asyncio.shield(self._prev)
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if self._prev is not None and not self._prev.done():
+            # Left early (e.g. the ack failed): later turns still wait for the earlier ones
+            self._prev.add_done_callback(lambda _: self._finish())
+        else:
+            self._finish()
+        return False
+
+    def _finish(self):
+        if not self._done.done():
+            self._done.set_result(None)
+        if self._order._tail is self._done:
+            self._order._tail = None
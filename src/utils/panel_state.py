@@ -0,0 +1,266 @@
+import heapq
+from bisect import bisect_left
+
+from src.utils.records import US, to_datetime, to_epoch
+
+HOUR = 3600
+# A panel's fix window is XX:30:00 - XX:59:59 of every hour after the placement hour
+WINDOW_OPEN = 30 * 60
+WINDOW_CLOSE = 59 * 60 + 59
+HALF_HOUR_US = 1800 * US
+
+
+class _PanelIndex:
+    """Indexed view of one panel's interactions."""
+    __slots__ = ("placed_ts", "base_ts", "fix_times", "fixed_windows",
+                 "n_interactions", "evaluated", "missed")
+
+    def __init__(self, panel):
+        self.placed_ts = panel.placed_at / US
+        # Start of the placement hour, in the target timezone
+        self.base_ts = to_datetime(panel.placed_at).replace(minute=0, second=0, microsecond=0).timestamp()
+
+        self.fix_times = []      # sorted [(epoch seconds, user_id)]
+        self.fixed_windows = set()  # window numbers k (1 = first hour after placement) with a fix
+        interactions = panel.interactions
+        for i in interactions:
+            if i.action != "fix":
+                continue
+            ts = i.ts / US
+            self.fix_times.append((ts, i.user_id))
+            offset = ts - self.base_ts
+            k = int(offset // HOUR)
+            if k >= 1 and WINDOW_OPEN <= offset - k * HOUR <= WINDOW_CLOSE:
+                self.fixed_windows.add(k)
+        self.fix_times.sort()
+        self.n_interactions = len(interactions)
+
+        # Windows 1..evaluated are closed; `missed` of them had no fix
+        self.evaluated = 0
+        self.missed = 0
+
+
+class PanelStateEngine:
+    """
+    Memoised panel state.
+
+    Each panel gets an index of its fix times and fixed windows, built once
+    and thrown away only when that panel's interactions change. The missed
+    window count is advanced incrementally as hours close, so a state query
+    is O(1) amortised instead of O(hours x interactions).
+    """
+
+    def __init__(self):
+        self._index = {}
+
+    def _get(self, panel):
+        idx = self._index.get(panel.id)
+        # Length check guards against interactions changed behind our back
+        if idx is None or idx.n_interactions != len(panel.interactions):
+            idx = _PanelIndex(panel)
+            self._index[panel.id] = idx
+        return idx
+
+    def invalidate(self, panel_id):
+        """Drop the index of a panel whose interactions changed."""
+        self._index.pop(panel_id, None)
+
+    def clear(self):
+        self._index.clear()
+
+    def state(self, panel, now, liveduration):
+        """
+        Same result as the hour-by-hour walk: remaining minutes, total delay
+        and the expiry as epoch seconds.
+        """
+        idx = self._get(panel)
+        now_ts = now.timestamp()
+
+        # Windows k whose close (base + k*h + 59:59) is already in the past
+        closed = 0
+        elapsed = now_ts - idx.base_ts - WINDOW_CLOSE
+        if elapsed > 0:
+            closed = int(-(-elapsed // HOUR)) - 1
+
+        if closed < idx.evaluated:
+            # Clock went backwards (or tests): start over
+            idx.evaluated = 0
+            idx.missed = 0
+        for k in range(idx.evaluated + 1, closed + 1):
+            if k not in idx.fixed_windows:
+                idx.missed += 1
+        idx.evaluated = closed
+
+        total_delay_minutes = idx.missed * 60
+        expiry_ts = idx.placed_ts + (liveduration + total_delay_minutes) * 60
+        remaining = (expiry_ts - now_ts) / 60
+
+        return {
+            "remaining_minutes": int(remaining),
+            "total_delay": total_delay_minutes,
+            "expiry_ts": expiry_ts
+        }
+
+    def has_fix_between(self, panel, user_id, start, end):
+        """True if `user_id` fixed this panel with start <= time <= end."""
+        idx = self._get(panel)
+        start_ts, end_ts = start.timestamp(), end.timestamp()
+        pos = bisect_left(idx.fix_times, (start_ts,))
+        while pos < len(idx.fix_times) and idx.fix_times[pos][0] <= end_ts:
+            if idx.fix_times[pos][1] == user_id:
+                return True
+            pos += 1
+        return False
+
+
+def eligible_at(panel):
+    """
+    First XX:00/XX:30 (epoch microseconds) after the placement: from then on
+    reminders are about the panel (see KnechtPartition.count_reminder_eligible).
+    """
+    local = to_datetime(panel.placed_at)
+    start = local.replace(minute=local.minute // 30 * 30, second=0, microsecond=0)
+    return int(start.timestamp()) * US + HALF_HOUR_US
+
+
+class PanelDeadlines:
+    """
+    Min-heaps of per-panel deadlines, in epoch microseconds:
+
+    - eligibility: the first half hour boundary after the placement. It never
+      moves, so panels are popped into `_eligible` as reminder thresholds pass
+      and counting eligible panels is O(1) amortised.
+    - ready: the expected finish (placement + live duration + delay). A missed
+      fix window pushes it out, so when it comes due the state is checked again
+      and the entry re-pushed; a panel is reported as ready once.
+
+    Place, fix and revert only mark a panel (touch); its ready entry is
+    recomputed on the next query. Superseded entries carry an old version and
+    are skipped when they reach the top.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.listener = None # Called when a panel's deadlines may have moved
+
+        self._panels = {}     # panel id -> panel
+        self._version = {}    # panel id -> version of its current ready entry
+        self._dirty = {}      # panel id -> panel whose ready entry needs recomputing
+        self._eligible_heap = [] # (eligible_at, panel id)
+        self._ready_heap = []    # (ready_at, version, panel id)
+        self._eligible = set()
+        self._announced = set()
+        self._threshold = 0
+
+    def __len__(self):
+        return len(self._panels)
+
+    def add(self, panel):
+        self._panels[panel.id] = panel
+        self._version[panel.id] = 0
+        heapq.heappush(self._eligible_heap, (eligible_at(panel), panel.id))
+        self.touch(panel)
+
+    def touch(self, panel):
+        """The panel's interactions changed; its expected finish may have moved."""
+        if panel.id not in self._panels:
+            return
+        self._dirty[panel.id] = panel
+        if self.listener:
+            self.listener()
+
+    def remove(self, panel_id):
+        if self._panels.pop(panel_id, None) is None:
+            return
+        del self._version[panel_id]
+        self._dirty.pop(panel_id, None)
+        self._eligible.discard(panel_id)
+        self._announced.discard(panel_id)
+
+    def clear(self):
+        self._panels.clear()
+        self._version.clear()
+        self._dirty.clear()
+        self._eligible_heap = []
+        self._ready_heap = []
+        self._eligible.clear()
+        self._announced.clear()
+        self._threshold = 0
+
+    def rebuild(self, panels, now, liveduration):
+        """
+        Start over from `panels` (after loading). Panels that are already
+        ready at `now` are not reported again.
+        """
+        self.clear()
+        listener, self.listener = self.listener, None
+        for panel in panels:
+            self.add(panel)
+        self.listener = listener
+        self._refresh(now, liveduration)
+        for ready_at, _, panel_id in self._ready_heap:
+            if ready_at <= to_epoch(now):
+                self._announced.add(panel_id)
+
+    def count_eligible(self, threshold_us):
+        """Active panels placed before `threshold_us` (a half hour boundary)."""
+        if threshold_us < self._threshold:
+            # Clock went backwards (or tests): start over
+            self._eligible_heap = [(eligible_at(p), pid) for pid, p in self._panels.items()]
+            heapq.heapify(self._eligible_heap)
+            self._eligible.clear()
+        self._threshold = threshold_us
+        heap = self._eligible_heap
+        while heap and heap[0][0] <= threshold_us:
+            _, panel_id = heapq.heappop(heap)
+            if panel_id in self._panels:
+                self._eligible.add(panel_id)
+        return len(self._eligible)
+
+    def _refresh(self, now, liveduration):
+        for panel_id, panel in self._dirty.items():
+            self._push_ready(panel, now, liveduration)
+        self._dirty.clear()
+
+    def _push_ready(self, panel, now, liveduration):
+        version = self._version[panel.id] + 1
+        self._version[panel.id] = version
+        expiry_ts = self.engine.state(panel, now, liveduration)["expiry_ts"]
+        heapq.heappush(self._ready_heap, (int(expiry_ts * US), version, panel.id))
+
+    def _drop_stale(self):
+        heap = self._ready_heap
+        while heap and self._version.get(heap[0][2]) != heap[0][1]:
+            heapq.heappop(heap)
+
+    def next_ready(self, now, liveduration):
+        """Epoch microseconds of the earliest expected finish not reported yet, or None."""
+        self._refresh(now, liveduration)
+        self._drop_stale()
+        while self._ready_heap and self._ready_heap[0][2] in self._announced:
+            heapq.heappop(self._ready_heap)
+            self._drop_stale()
+        return self._ready_heap[0][0] if self._ready_heap else None
+
+    def pop_ready(self, now, liveduration):
+        """Panels that became ready to collect by `now` and were not reported yet."""
+        self._refresh(now, liveduration)
+        now_us = to_epoch(now)
+        ready = []
+        heap = self._ready_heap
+        while True:
+            self._drop_stale()
+            if not heap or heap[0][0] > now_us:
+                break
+            _, _, panel_id = heapq.heappop(heap)
+            if panel_id in self._announced:
+                continue
+            panel = self._panels[panel_id]
+            expiry_ts = self.engine.state(panel, now, liveduration)["expiry_ts"]
+            if int(expiry_ts * US) <= now_us:
+                self._announced.add(panel_id)
+                ready.append(panel)
+            else:
+                # A missed window added delay since the entry was pushed
+                self._push_ready(panel, now, liveduration)
+        return ready
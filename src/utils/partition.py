@@ -0,0 +1,1136 @@
+import discord
+from datetime import datetime, timedelta
+import asyncio
+import json
+import os
+import time
+import uuid
+from src.utils.journal import EventJournal
+from src.utils.sqlite_store import SQLiteStore
+from src.utils.persistence import PersistenceWriter, atomic_write_json
+from src.utils.history import DATE_RE, HistoryArchive
+from src.utils.rollups import HistoryRollups
+from src.utils.backup import BackupManager, DEFAULT_PART_BYTES
+from src.utils.panel_state import PanelStateEngine, PanelDeadlines
+from src.utils.id_index import IdIndex
+from src.utils.dashboard import DashboardUpdater
+from src.utils.leaderboard import LifetimeLeaderboard
+from src.utils.metrics import metrics
+from src.utils.ordering import ArrivalOrder
+from src.utils.config_manager import config_manager
+from src.utils.records import (
+    Event, Interaction, Panel, CATEGORIES, US, code, int_keys, local_now, now_epoch, state_to_json, to_datetime,
+    to_iso
+)
+
+# The partition of TARGET_GUILD_ID/TARGET_CHANNEL_ID; keeps the pre-partition layout directly in data/
+DEFAULT_PARTITION = "default"
+
+
+class KnechtPartition:
+    """
+    The complete Knecht state of one guild (or one channel, see "partition_by"):
+    today's work, active panels, lifetime totals, history, journal/SQLite
+    storage and the dashboard. Every partition persists into its own
+    `data_dir`, so partitions never share files or locks.
+
+    `config` holds the per-partition overrides from settings.json "partitions"
+    (channel_id, backup_channel_id, role_name).
+    """
+
+    def __init__(self, bot, key, data_dir, hof, channel_id=None, backup_channel_id=None, config=None):
+        self.bot = bot
+        self.key = key
+        self.data_dir = data_dir
+        self.hof = hof
+        config = config or {}
+        self.configured_channel_id = config.get("channel_id") or channel_id
+        self.backup_channel_id = config.get("backup_channel_id") or backup_channel_id
+
+        self.tracking_data = {
+            "fixed_this_hour": 0
+        }
+        
+        self.active_panels = [] # List of panel objects
+        self.panel_engine = PanelStateEngine() # Cached per-panel fix index
+        # Reminder eligibility and expected finish per panel, kept in sync by _apply_record
+        self.deadlines = PanelDeadlines(self.panel_engine)
+        
+        # Daily work: lists of Event records (see records.py), user ids are ints throughout
+        self.daily_work = {
+            "placed": [],      
+            "fixes": [],       
+            "containers": [],  
+            "hafenevents": []  
+        }
+        # Per-user counters for the lists above, kept in sync by _apply_record
+        self.daily_counts = self._empty_counts()
+        # Prefix-searchable ids of today's events and active panels, kept in sync by _apply_record
+        # Refs: ("event", category, event) / ("panel", None, panel)
+        self.ids = IdIndex()
+        # Today's events per user, in time order; kept in sync by _apply_record
+        self.events_by_user = {}
+        
+        self.daily_profit = {}    # { user_id: amount }
+        self.daily_batteries = {} # { user_id: count }
+        
+        self.lifetime_profit = {} # { user_id: amount }
+        self.lifetime_work = {
+             "placed": {},
+             "fixes": {},
+             "containers": {},
+             "hafenevents": {}
+        }
+        # Lifetime rankings, updated only for the users a reset touches
+        self.leaderboard = LifetimeLeaderboard()
+        
+        self.last_reset_date = None
+        self.tracking_message_id = None
+        self.tracking_channel_id = None # Where /knecht_add posted the dashboard
+        self.data_file = os.path.join(data_dir, "knecht.json")
+        
+        # Ensure data directory exists
+        os.makedirs(data_dir, exist_ok=True)
+
+        # Archived days live in lazily loaded segments, not in the main state
+        self.history = HistoryArchive(os.path.join(data_dir, "history"))
+        # Weekly/monthly totals of the history for /knecht_stats, updated by reset_daily_stats()
+        self.rollups = HistoryRollups(os.path.join(data_dir, "history", "rollups.json"), self.history)
+        # Weekly backups are gzip deltas on top of a periodic full backup
+        self.backups = BackupManager(os.path.join(data_dir, "backups"), key)
+
+        # Write-ahead journal: every mutation is appended here, knecht.json is
+        # only rewritten as a compacted snapshot.
+        self.journal_file = os.path.join(data_dir, "knecht_journal.jsonl")
+        self.journal = EventJournal(
+            self.journal_file,
+            compact_after=self.settings.get("journal_compact_after", 1000)
+        )
+        self.journal_seq = 0
+        self._compact_requested = False
+
+        # Optional SQLite engine; replaces journal + snapshot when enabled
+        self.store = None
+        if self.settings.get("storage_backend", "json") == "sqlite":
+            sqlite_file = self.settings.get("sqlite_file", "data/knecht.db")
+            if key != DEFAULT_PARTITION:
+                sqlite_file = os.path.join(data_dir, os.path.basename(sqlite_file))
+            self.store = SQLiteStore(sqlite_file)
+
+        # Disk work (fsync, snapshots) is coalesced and done off the event loop
+        self.persistence = PersistenceWriter(
+            self._capture_persistence,
+            self._write_persistence,
+            window=self.settings.get("persistence_window", 0.5)
+        )
+
+        # Tracking message edits are debounced and go through a PartialMessage
+        self._dashboard_message = None
+        self.dashboard = DashboardUpdater(
+            self.render_dashboard,
+            self._get_dashboard_message,
+            on_missing=self._dashboard_missing,
+            interval=self.settings.get("dashboard_interval", 2.0)
+        )
+
+        # Button handlers acknowledge first, then mutate; per type, mutations run in click order
+        self.handler_order = {key: ArrivalOrder() for key in ["place", "fix", "container", "hafenevent"]}
+
+        self.load_stats()
+
+    @property
+    def settings(self):
+        """Current settings.json; storage options only take effect on restart."""
+        return config_manager.settings
+
+    @property
+    def channel_id(self):
+        """Channel for the dashboard, reminders and the daily report."""
+        return self.configured_channel_id or self.tracking_channel_id
+
+    async def close(self):
+        """Flush pending writes (folding the journal into a snapshot) and close the storage."""
+        self.save_stats(compact=True)
+        await self.persistence.flush()
+        if self.store:
+            self.store.close()
+        else:
+            self.journal.close()
+
+    # --- Persistence ---
+
+    def save_stats(self, compact=False):
+        """
+        Mark state dirty.
+        Mutations are already in the journal, so this only hands it to the OS;
+        fsync and snapshot rewrites are coalesced by the persistence writer.
+        """
+        start = time.perf_counter()
+        if not self.store:
+            try:
+                self.journal.flush()
+            except Exception as e:
+                print(f"Error saving stats: {e}")
+        if compact:
+            self._compact_requested = True
+        self.persistence.mark_dirty()
+        metrics.observe("save_stats", (time.perf_counter() - start) * 1000)
+
+    def _capture_persistence(self):
+        """Runs on the event loop: pick what the worker has to write."""
+        if self.store:
+            return ("commit", None)
+        self.journal.flush()
+        if self._compact_requested or self.journal.needs_compaction():
+            self._compact_requested = False
+            # Records up to here are covered by this snapshot
+            self.journal.rotate()
+            return ("snapshot", self._snapshot_data(copy=True))
+        return ("fsync", None)
+
+    def _write_persistence(self, payload):
+        """Runs in a worker thread. Returns bytes written."""
+        kind, data = payload
+        if kind == "commit":
+            self.store.commit()
+            return 0
+        if kind == "snapshot":
+            nbytes = atomic_write_json(self.data_file, state_to_json(data))
+            self.journal.discard_rotated()
+            return nbytes
+        self.journal.fsync()
+        return 0
+
+    def _snapshot_data(self, copy=False):
+        """
+        Full state in the knecht.json layout (archived days live in self.history).
+        With copy=True every container that can still change is copied but the
+        records are not converted yet: the result can be handed to another
+        thread, which turns it into the layout with state_to_json(). Events and
+        interactions are never mutated in place and are shared.
+        """
+        data = {
+            "active_panels": [p.copy() for p in self.active_panels],
+            "daily_batteries": dict(self.daily_batteries),
+            "daily_work": {cat: list(events) for cat, events in self.daily_work.items()},
+            "daily_counts": {cat: dict(per_user) for cat, per_user in self.daily_counts.items()},
+            "daily_profit": dict(self.daily_profit),
+            "lifetime_profit": dict(self.lifetime_profit),
+            "lifetime_work": {cat: dict(per_user) for cat, per_user in self.lifetime_work.items()},
+            "last_reset_date": self.last_reset_date,
+            "tracking_message_id": self.tracking_message_id,
+            "tracking_channel_id": self.tracking_channel_id,
+            "journal_seq": self.journal_seq
+        }
+        return data if copy else state_to_json(data)
+
+    def _write_snapshot(self):
+        """Synchronously write the full state to knecht.json and truncate the journal."""
+        atomic_write_json(self.data_file, self._snapshot_data())
+        self.journal.truncate()
+
+    def load_stats(self):
+        """Load state from the SQLite store, or from the JSON snapshot + journal."""
+        if self.store:
+            if self.store.is_empty():
+                # One-shot migration: read whatever JSON layout we have, then import it
+                self._load_json_stats()
+                print(f"Migrating JSON stats into {self.store.path}...")
+                self.store.import_state({**self._snapshot_data(), "history": list(self.history.iter_days())})
+            else:
+                self._load_state(self.store.load_state())
+            self.history = self.store.history()
+            self.rollups.history = self.history
+        else:
+            self._load_json_stats()
+        # Panels that finished while the bot was down are not announced again
+        self.deadlines.rebuild(
+            self.active_panels, local_now(), self.settings.get("panel_liveduration", 60)
+        )
+
+    def _load_json_stats(self):
+        """Load daily_stats from JSON file."""
+        # Migration from panels.json if knecht.json doesn't exist?
+        # For now, let's just look for knecht.json, but maybe we should copy panels.json content if it exists and knecht doesn't.
+        if not os.path.exists(self.data_file):
+            legacy_file = os.path.join(self.data_dir, "panels.json")
+            if os.path.exists(legacy_file):
+                print(f"Migrating {legacy_file} to {self.data_file}...")
+                try:
+                    with open(legacy_file, 'r') as f:
+                        old_data = json.load(f)
+                    
+                    # Migrate known fields (old dict-style daily_work is converted on the way)
+                    self._load_state(old_data)
+                    self._write_snapshot() # Save as knecht.json
+                except Exception as e:
+                    print(f"Error migrating stats: {e}")
+            self._replay_journal()
+            return
+
+        try:
+            with open(self.data_file, 'r') as f:
+                data = json.load(f)
+
+            if self._load_state(data):
+                self._write_snapshot()
+                        
+        except Exception as e:
+            print(f"Error loading stats: {e}") 
+            import traceback
+            traceback.print_exc()
+
+        self._replay_journal()
+
+    def _load_state(self, data):
+        """
+        Populate state from a knecht.json style dict. Returns True if it was migrated.
+        This is where stored dicts with ISO timestamps become records.
+        """
+        self.active_panels = [Panel.from_dict(p) for p in data.get("active_panels", [])]
+        self.panel_engine.clear()
+        self.daily_batteries = int_keys(data.get("daily_batteries", {}))
+        self.journal_seq = data.get("journal_seq", 0)
+        
+        dw = data.get("daily_work", {})
+        
+        # MIGRATION LOGIC: If loaded data is dicts (old format), convert to lists (new format)
+        self.daily_work = {
+            "placed": [], "fixes": [], "containers": [], "hafenevents": []
+        }
+        
+        # Check if "placed" is a dict (Old format)
+        migrated = False
+        if isinstance(dw.get("placed"), dict):
+            print("Migrating daily_work from Dicts to Lists...")
+            now = now_epoch()
+            
+            for category in CATEGORIES:
+                old_cat_data = dw.get(category, {})
+                if isinstance(old_cat_data, dict):
+                    for uid, count in old_cat_data.items():
+                        for _ in range(count):
+                            self._add_work_event(category, uid, now, save=False)
+                elif isinstance(old_cat_data, list):
+                     self.daily_work[category] = [Event.from_dict(e, category) for e in old_cat_data]
+
+            migrated = True
+        else:
+            # Already new format
+            for category, events in dw.items():
+                self.daily_work[code(category)] = [Event.from_dict(e, category) for e in events]
+
+        # Counters are stored next to the event lists; rebuild them if they are missing
+        counts = data.get("daily_counts")
+        if counts and not migrated:
+            self.daily_counts = self._empty_counts()
+            for category, per_user in counts.items():
+                self.daily_counts[category] = int_keys(per_user)
+        else:
+            # From the events just loaded: during the SQLite migration the store is still empty
+            self.daily_counts = self._count_events(from_store=False)
+        self._rebuild_id_index()
+
+        self.daily_profit = int_keys(data.get("daily_profit", {}))
+        self.lifetime_profit = int_keys(data.get("lifetime_profit", {}))
+        
+        lw = data.get("lifetime_work", {})
+        self.lifetime_work = {cat: int_keys(lw.get(cat, {})) for cat in CATEGORIES}
+        self.leaderboard.rebuild(self.lifetime_profit, self.lifetime_work)
+
+        self.last_reset_date = data.get("last_reset_date")
+        self.tracking_message_id = data.get("tracking_message_id")
+        self.tracking_channel_id = data.get("tracking_channel_id")
+
+        # Older snapshots carry the full history inline; move it into segments
+        legacy_history = data.get("history")
+        if legacy_history:
+            if len(self.history) == 0:
+                print(f"Moving {len(legacy_history)} archived days into {self.history.directory}...")
+                self.history.extend(legacy_history)
+            migrated = True
+
+        return migrated
+
+    def _replay_journal(self):
+        """Apply journal records written after the last snapshot."""
+        replayed = 0
+        for record in self.journal.replay():
+            if record.get("seq", 0) <= self.journal_seq:
+                continue # Already folded into the snapshot
+            try:
+                self._apply_record(record)
+            except Exception as e:
+                print(f"[Journal] Failed to replay record {record.get('seq')} ({record.get('op')}): {e}")
+            self.journal_seq = record["seq"]
+            replayed += 1
+        if replayed:
+            print(f"[Journal] Replayed {replayed} records on top of snapshot.")
+
+    # --- State Mutations (journaled) ---
+
+    def _mutate(self, op, **fields):
+        """Apply a state mutation and append it to the journal (or the SQLite store)."""
+        record = {"op": op, **fields}
+        if self.store:
+            result = self._apply_record(record)
+            self.store.apply(record)
+            return result
+        self.journal_seq += 1
+        record["seq"] = self.journal_seq
+        result = self._apply_record(record)
+        self.journal.append(record)
+        return result
+
+    def _apply_record(self, record):
+        """
+        Apply a single mutation record to in-memory state.
+        Used both live (via _mutate) and when replaying the journal on startup.
+        Records carry the stored layout (ISO timestamps); they are turned into
+        Event/Panel/Interaction objects here.
+        """
+        op = record["op"]
+
+        if op == "event_add":
+            category = code(record["category"])
+            event = Event.from_dict(record["event"], category)
+            self.daily_work[category].append(event)
+            self._bump_count(category, event.user_id, 1)
+            self.ids.add(event.id, ("event", category, event))
+            self.events_by_user.setdefault(event.user_id, []).append(event)
+            return event
+
+        elif op == "event_remove":
+            cat = record["category"]
+            kept = []
+            for e in self.daily_work[cat]:
+                if e.id == record["event_id"]:
+                    self._bump_count(cat, e.user_id, -1)
+                    self._unindex_user_event(e)
+                else:
+                    kept.append(e)
+            self.daily_work[cat] = kept
+            self.ids.discard(record["event_id"], "event", cat)
+
+        elif op == "events_clear":
+            for e in self.daily_work[record["category"]]:
+                self.ids.discard(e.id, "event", record["category"])
+                self._unindex_user_event(e)
+            self.daily_work[record["category"]] = []
+            self.daily_counts[record["category"]] = {}
+
+        elif op == "archive_event_remove":
+            self._apply_archived_removal(record)
+
+        elif op == "profit":
+            # Absolute values, so replaying never double-counts
+            self.daily_profit.update(int_keys(record["values"]))
+
+        elif op == "batteries":
+            self.daily_batteries.update(int_keys(record["values"]))
+
+        elif op == "panel_add":
+            panel = Panel.from_dict(record["panel"])
+            self.active_panels.append(panel)
+            self.ids.add(panel.id, ("panel", None, panel))
+            self.deadlines.add(panel)
+            return panel
+
+        elif op == "panels_remove":
+            panel_ids = set(record["panel_ids"])
+            self.active_panels = [p for p in self.active_panels if p.id not in panel_ids]
+            for pid in panel_ids:
+                self.panel_engine.invalidate(pid)
+                self.deadlines.remove(pid)
+                self.ids.discard(pid, "panel")
+
+        elif op == "panels_clear":
+            for panel in self.active_panels:
+                self.ids.discard(panel.id, "panel")
+            self.active_panels = []
+            self.panel_engine.clear()
+            self.deadlines.clear()
+
+        elif op == "interaction_add":
+            # One shared record for all panels; interactions are never changed in place
+            interaction = Interaction.from_dict(record["interaction"])
+            for pid in dict.fromkeys(record["panel_ids"]):
+                panel = self._get_panel(pid)
+                if panel:
+                    panel.interactions.append(interaction)
+                    self.panel_engine.invalidate(pid)
+                    self.deadlines.touch(panel)
+
+        elif op == "interaction_remove" and record.get("panel_ids") is not None:
+            # Fix events link the panels they touched, so only those are visited
+            target = Interaction.from_dict(record["interaction"])
+            for pid in record["panel_ids"]:
+                panel = self._get_panel(pid)
+                if not panel:
+                    continue # Collected or removed since
+                panel.interactions = [
+                    i for i in panel.interactions
+                    if not i.matches(target.user_id, target.action, target.ts)
+                ]
+                self.panel_engine.invalidate(pid)
+                self.deadlines.touch(panel)
+
+        elif op == "interaction_remove":
+            # Legacy fix events without panel links
+            target = Interaction.from_dict(record["interaction"])
+            for panel in self.active_panels:
+                original_len = len(panel.interactions)
+                panel.interactions = [
+                    i for i in panel.interactions
+                    if not i.matches(target.user_id, target.action, target.ts)
+                ]
+                # If we removed an interaction, we are done with this fix event
+                if len(panel.interactions) < original_len:
+                    self.panel_engine.invalidate(panel.id)
+                    self.deadlines.touch(panel)
+                    break
+
+        elif op == "reset":
+            return self._apply_reset(record["date"], seq=record.get("seq"))
+
+        elif op == "set":
+            if record["key"] == "tracking_message_id":
+                self.tracking_message_id = record["value"]
+            elif record["key"] == "tracking_channel_id":
+                self.tracking_channel_id = record["value"]
+
+        else:
+            print(f"[Journal] Unknown op '{op}', ignoring.")
+
+
+    def _rebuild_id_index(self):
+        self.ids.clear()
+        self.events_by_user = {}
+        for cat in CATEGORIES:
+            for e in self.daily_work.get(cat, []):
+                self.ids.add(e.id, ("event", cat, e))
+                self.events_by_user.setdefault(e.user_id, []).append(e)
+        for events in self.events_by_user.values():
+            events.sort(key=lambda e: e.ts)
+        for panel in self.active_panels:
+            self.ids.add(panel.id, ("panel", None, panel))
+
+    def _unindex_user_event(self, event):
+        events = self.events_by_user.get(event.user_id)
+        if events is None:
+            return
+        events.remove(event)
+        if not events:
+            del self.events_by_user[event.user_id]
+
+    def _get_panel(self, panel_id):
+        """Active panel by exact id, or None."""
+        for ref in self.ids.get(panel_id):
+            if ref[0] == "panel":
+                return ref[2]
+        return None
+
+    def _find_today_event(self, prefix):
+        """(category, event) of today's first event matching the id prefix, or (None, None)."""
+        order = ["containers", "hafenevents", "placed", "fixes"]
+        matches = [ref for _, ref in self.ids.find(prefix) if ref[0] == "event"]
+        if not matches:
+            return None, None
+        _, cat, event = min(matches, key=lambda ref: (order.index(ref[1]), ref[2].ts))
+        return cat, event
+
+    def _apply_archived_removal(self, record):
+        """Drop an event from an archived day and take it back out of the lifetime totals."""
+        cat, value = record["category"], record.get("profit", 0)
+        self.history.remove_event(record["date"], cat, record["event_id"], str(record["user_id"]), value)
+        self.backups.mark_corrected(record["date"])
+        uid = int(record["user_id"])
+        if uid in self.lifetime_work[cat]:
+            self.lifetime_work[cat][uid] = max(0, self.lifetime_work[cat][uid] - 1)
+        if value and uid in self.lifetime_profit:
+            self.lifetime_profit[uid] = max(0, self.lifetime_profit[uid] - value)
+        self.leaderboard.refresh([uid], self.lifetime_profit, self.lifetime_work)
+
+    def _add_work_event(self, category, user_id, ts, details=None, save=True, force_id=None):
+        """Helper to add a work event (at epoch microseconds `ts`) to daily_work."""
+        event_id = force_id if force_id else uuid.uuid4().hex[:6]
+        event = {
+            "id": event_id,
+            "user_id": str(user_id),
+            "timestamp": to_iso(ts),
+            "type": category,
+            "details": details or {}
+        }
+        event = self._mutate("event_add", category=category, event=event)
+        if save:
+            self.save_stats()
+        return event
+
+    def get_user_events(self, user_id):
+        """All of today's events for one user, in time order (treat as read-only)."""
+        return self.events_by_user.get(int(user_id), [])
+
+    @staticmethod
+    def _empty_counts():
+        return {"placed": {}, "fixes": {}, "containers": {}, "hafenevents": {}}
+
+    def _bump_count(self, category, user_id, delta):
+        """O(1) update of the per-user daily counter."""
+        per_user = self.daily_counts.setdefault(category, {})
+        value = per_user.get(user_id, 0) + delta
+        if value > 0:
+            per_user[user_id] = value
+        else:
+            per_user.pop(user_id, None)
+
+    def get_daily_counts(self):
+        """
+        Per-user counts for HoF: { category: { user_id: count } }.
+        Maintained incrementally, so this is O(1); treat the result as read-only.
+        """
+        return self.daily_counts
+
+    def _count_events(self, from_store=True):
+        """
+        Rebuild the daily counters from the events themselves (O(events)),
+        with the SQLite backend from the store unless `from_store` is False.
+        """
+        if self.store and from_store:
+            return {category: int_keys(per_user) for category, per_user in self.store.daily_counts().items()}
+        counts = self._empty_counts()
+        for category, events in self.daily_work.items():
+            for e in events:
+                uid = e.user_id
+                per_user = counts.setdefault(category, {})
+                per_user[uid] = per_user.get(uid, 0) + 1
+        return counts
+
+    def rebuild_daily_counts(self):
+        """
+        Consistency check: recount today's events and replace the counters.
+        Returns a list of (category, user_id, kept_value, actual_value) that differed.
+        """
+        actual = self._count_events()
+        drift = []
+        for category in set(actual) | set(self.daily_counts):
+            kept_cat = self.daily_counts.get(category, {})
+            actual_cat = actual.get(category, {})
+            for uid in set(kept_cat) | set(actual_cat):
+                if kept_cat.get(uid, 0) != actual_cat.get(uid, 0):
+                    drift.append((category, uid, kept_cat.get(uid, 0), actual_cat.get(uid, 0)))
+        self.daily_counts = actual
+        return drift
+
+
+    # --- Mechanics ---
+
+    def _log_profit_event(self, category, user, value):
+        self.check_daily_reset()
+        
+        # Update Work
+        uid = user.id
+        self._add_work_event(category, uid, now_epoch(), save=False)
+        
+        # Update Profit
+        self._mutate("profit", values={uid: self.daily_profit.get(uid, 0) + value})
+        
+        self.save_stats()
+        return value
+
+    def process_container(self, user):
+        """Log a valuable container. Returns its value."""
+        return self._log_profit_event("containers", user, self.hof.mechanics.get("wertvoller_container", 90000))
+
+    def process_hafenevent(self, user):
+        """Log a Hafenevent drop. Returns its value."""
+        return self._log_profit_event("hafenevents", user, self.hof.mechanics.get("hafendrop", 24000))
+
+    def _revert_event_effects(self, event):
+        """Revert the effects of an event (profit, panel state, etc)."""
+        etype = event.category
+        uid = event.user_id
+        
+        # 1. Revert Profit (Containers/Hafenevents)
+        if etype == "containers":
+             val = self.hof.mechanics.get("wertvoller_container", 90000)
+             if uid in self.daily_profit:
+                 self._mutate("profit", values={uid: max(0, self.daily_profit[uid] - val)})
+                 
+        elif etype == "hafenevents":
+             val = self.hof.mechanics.get("hafendrop", 24000)
+             if uid in self.daily_profit:
+                 self._mutate("profit", values={uid: max(0, self.daily_profit[uid] - val)})
+
+        # 2. Revert Panel Placement
+        elif etype == "placed":
+             # Try to remove the associated active panel
+             panel_id = event.details.get("panel_id")
+             if panel_id:
+                 self._mutate("panels_remove", panel_ids=[panel_id])
+
+        # 3. Revert Fix (State Change)
+        elif etype == "fixes":
+             # We need to find the panel interaction that matches this fix event
+             # Match by user_id and timestamp (approximate or exact)
+             # process_fix gives the event and the interaction the same timestamp.
+             panel_ids = event.details.get("panel_ids")
+             self._mutate(
+                 "interaction_remove",
+                 interaction={"user_id": str(uid), "action": "fix", "timestamp": to_iso(event.ts)},
+                 panel_ids=list(panel_ids) if panel_ids is not None else None
+             )
+
+    async def clear_archived(self, query):
+        """
+        Last resort of /knecht_clear: remove an event from an archived day;
+        its profit and lifetime counts are taken back. The id lookup (the
+        first one reads the whole id index), the segment rewrite and the
+        rollup update run in worker threads; only the journaled totals change
+        on the event loop. Returns the result lines (empty if nothing matched).
+        """
+        archived = await asyncio.to_thread(self.history.find_ids, query.strip())
+        if not archived:
+            return []
+        event_id, date, category, user_id = archived[0]
+        value = 0
+        if category == "containers":
+            value = self.hof.mechanics.get("wertvoller_container", 90000)
+        elif category == "hafenevents":
+            value = self.hof.mechanics.get("hafendrop", 24000)
+        hour = await asyncio.to_thread(self.rollups.event_hour, date, category, event_id)
+        before = self.history.fingerprint()
+        await asyncio.to_thread(self.history.remove_event, date, category, event_id, str(user_id), value)
+        # Replays do the rewrite themselves; here the segment is already done and it is skipped
+        self._mutate("archive_event_remove", date=date, category=category,
+                     event_id=event_id, user_id=user_id, profit=value)
+        self.save_stats()
+        await asyncio.to_thread(self.rollups.remove_event, date, category, user_id, hour, value, before)
+        return [f"Removed {category} event `{event_id}` from {date} (Lifetime Totals Corrected)."]
+
+
+    def clear(self, query):
+        """
+        Clears items based on query.
+        - 'all_panels' (all_p), 'all_containers' (all_c), 'all_hafenevents' (all_h)
+        - Specific ID (matches today's panels and events; archived days are
+          left to clear_archived())
+        Returns the list of result lines (empty if nothing matched).
+        """
+        query = query.strip()
+        deleted_count = 0
+        deleted_msg = []
+        
+        # Alias Map
+        if query == "all_p": query = "all_panels"
+        if query == "all_c": query = "all_containers"
+        if query == "all_h": query = "all_hafenevents"
+
+        # 1. Bulk Clear
+        if query == "all_panels":
+            deleted_count = len(self.active_panels)
+            # For bulk clear, we might skip detailed reversion or loop through them?
+            # Creating "placed" events reversion might be too heavy?
+            # Let's just clear active panels list roughly as requested.
+            # But we should probably check if we need to revert placement events?
+            # User request: "clearing an action does not remove its value... clear of panel fix action... state-change needs to be reverted"
+            # If we clear ALL panels, we are just resetting the board.
+            self._mutate("panels_clear")
+            deleted_msg.append(f"Cleared {deleted_count} active panels.")
+            
+        elif query == "all_containers":
+            # Revert profit for all
+            for e in self.daily_work["containers"]:
+                self._revert_event_effects(e)
+                
+            deleted_count = len(self.daily_work["containers"])
+            self._mutate("events_clear", category="containers")
+            deleted_msg.append(f"Cleared {deleted_count} containers (Profit Reverted).")
+            
+        elif query == "all_hafenevents":
+            # Revert profit for all
+            for e in self.daily_work["hafenevents"]:
+                self._revert_event_effects(e)
+                
+            deleted_count = len(self.daily_work["hafenevents"])
+            self._mutate("events_clear", category="hafenevents")
+            deleted_msg.append(f"Cleared {deleted_count} hafenevents (Profit Reverted).")
+
+        # 2. ID Search & Destroy
+        else:
+            # Check Active Panels (If ID matches a panel ID)
+            # Note: Panels are NOT events, they are state. 
+            # If user clears a panel vs clears a "placed" event?
+            # User said "placed panel shows ugly long id... it seems to be linked to the panel, panel is removed upon clearing the work id"
+            # So user is likely clearing the WORK EVENT ID.
+            
+            # Today's events and panels come from the id index, archived days from the history's
+            found_cat, found_event = self._find_today_event(query)
+            
+            if found_event:
+                self._revert_event_effects(found_event)
+                self._mutate("event_remove", category=found_cat, event_id=found_event.id)
+                deleted_msg.append(f"Removed {found_cat} event `{found_event.id}` (Effects Reverted).")
+            else:
+                 # Fallback: maybe they targeted a panel ID directly?
+                 # If so, just remove the panel.
+                 matching_ids = [pid for pid, ref in self.ids.find(query) if ref[0] == "panel"]
+                 if matching_ids:
+                      self._mutate("panels_remove", panel_ids=matching_ids)
+                      deleted_msg.append(f"Removed Panel `{query}` (Direct).")
+
+        self.save_stats()
+        return deleted_msg
+
+    # --- Panel Logic (Legacy/Specific) ---
+
+    def process_place(self, user):
+        """Logic for placing a panel."""
+        now = now_epoch()
+        
+        # Create new panel
+        liveduration = self.settings.get("panel_liveduration", 60)
+        panel = {
+            "id": uuid.uuid4().hex,
+            "placed_by": user.id,
+            "placed_by_name": user.display_name,
+            "placed_at_iso": to_iso(now),
+            "remaining_minutes": liveduration,
+            "interactions": [] 
+        }
+        
+        # Add Interaction
+        panel["interactions"].append({
+            "user_id": str(user.id),
+            "action": "place",
+            "timestamp": panel["placed_at_iso"]
+        })
+        
+        self.check_daily_reset() # Check before modifying stats
+        panel = self._mutate("panel_add", panel=panel)
+
+        # Update Daily Work (Placed)
+        self._add_work_event("placed", user.id, now, details={"panel_id": panel.id}, save=False, force_id=panel.id)
+        
+        self.save_stats()
+        return panel
+
+
+    def calculate_panel_state(self, panel, now=None):
+        """Calculate the real-time state of a panel (memoised by the panel state engine)."""
+        if now is None:
+            now = local_now()
+        liveduration = self.settings.get("panel_liveduration", 60)
+        return self.panel_engine.state(panel, now, liveduration)
+
+    def count_reminder_eligible(self, now):
+        """
+        Active panels a reminder at `now` is about: placed before this hour, or
+        (from XX:30 on) placed before XX:30. Read off the deadline heap.
+        """
+        threshold = now.replace(minute=30 if now.minute >= 30 else 0, second=0, microsecond=0)
+        return self.deadlines.count_eligible(int(threshold.timestamp()) * US)
+
+    def next_collect_alert(self, now):
+        """Epoch microseconds of the next panel expected to become ready to collect, or None."""
+        return self.deadlines.next_ready(now, self.settings.get("panel_liveduration", 60))
+
+    def pop_collect_alerts(self, now):
+        """Panels that became ready to collect by `now`, each reported once."""
+        return self.deadlines.pop_ready(now, self.settings.get("panel_liveduration", 60))
+
+    def process_fix(self, user):
+        """Standardized logic for fixing panels (Maintain or Collect)."""
+        now_us = now_epoch()
+        now = to_datetime(now_us)
+        
+        eligible_count = 0
+        collected_count = 0
+        
+        self.check_daily_reset()
+        
+        is_maintenance_window = (now.minute >= 30)
+        fixed_panel_ids = []
+        
+        collected_panels = []
+        window_start = now.replace(minute=30, second=0, microsecond=0)
+        window_end = now.replace(minute=59, second=59, microsecond=999999)
+        
+        for panel in self.active_panels:
+            state = self.calculate_panel_state(panel, now)
+            remaining = state["remaining_minutes"]
+            
+            is_eligible = False
+            if remaining <= 0:
+                is_eligible = True # Collect
+            elif is_maintenance_window:
+                # Check for duplicate fix in this window
+                if not self.panel_engine.has_fix_between(panel, user.id, window_start, window_end):
+                    is_eligible = True # Maintain
+            
+            if is_eligible:
+                eligible_count += 1
+                fixed_panel_ids.append(panel.id)
+                
+                if remaining <= 0:
+                    # Our fix becomes the last interaction, so it gets collected below.
+                    # The fix lands in the open window, so it can't change the state.
+                    collected_count += 1
+                    collected_panels.append(panel)
+
+        if fixed_panel_ids:
+            self._mutate("interaction_add", panel_ids=fixed_panel_ids, interaction={
+                "user_id": str(user.id),
+                "action": "fix",
+                "timestamp": to_iso(now_us)
+            })
+        
+        collected_panel_ids = []
+        payouts = {}
+        for panel in collected_panels:
+            collected_panel_ids.append(panel.id)
+            # PAYOUT LOGIC
+            interactions = panel.interactions
+            total_interactions = len(interactions)
+                
+            if total_interactions > 0:
+                battery_val = self.hof.mechanics.get("battery_value", 50000)
+                user_counts = {}
+                for i in interactions:
+                    uid = i.user_id
+                    user_counts[uid] = user_counts.get(uid, 0) + 1
+                        
+                for uid, count in user_counts.items():
+                    share = int((count / total_interactions) * battery_val)
+                    if share > 0:
+                         payouts[uid] = payouts.get(uid, self.daily_profit.get(uid, 0)) + share
+
+        if collected_panel_ids:
+            self._mutate("panels_remove", panel_ids=collected_panel_ids)
+        if payouts:
+            self._mutate("profit", values=payouts)
+        
+        if collected_count > 0:
+             uid = user.id
+             self._mutate("batteries", values={uid: self.daily_batteries.get(uid, 0) + collected_count})
+
+        if eligible_count > 0:
+            self.tracking_data["fixed_this_hour"] += 1 
+            uid = user.id
+            # Link the fix to the panel interactions it created, so a revert is a direct lookup
+            self._add_work_event("fixes", uid, now_us, details={"panel_ids": fixed_panel_ids}, save=True)
+            
+        return {
+            "eligible_count": eligible_count,
+            "collected_count": collected_count
+        }
+
+    # --- Dashboard ---
+
+    async def update_tracking_message(self):
+        """Ask for the main persistent message to be refreshed (debounced, see DashboardUpdater)."""
+        self.dashboard.request()
+
+    def render_dashboard(self):
+        """The dashboard embed for the current state."""
+        return discord.Embed(
+            title="Knecht Control", 
+            description=(
+                f"**Current Status**\n\n"
+                f"☀️ **Active Panels**: {len(self.active_panels)}\n"
+                f"🔧 **Fixed (Hour)**: {self.tracking_data['fixed_this_hour']}\n\n"
+                f"📦 **Containers Today**: {len(self.daily_work['containers'])}\n"
+                f"⚓ **Hafenevents Today**: {len(self.daily_work['hafenevents'])}\n\n"
+                f"Use buttons below to update."
+            ),
+            color=0x00FF00
+        )
+
+    def _get_dashboard_message(self):
+        if not self.tracking_message_id:
+            return None
+        msg = self._dashboard_message
+        if msg is None or msg.id != self.tracking_message_id:
+            channel = self.bot.get_channel(self.channel_id)
+            if not channel:
+                return None
+            msg = channel.get_partial_message(self.tracking_message_id)
+            self._dashboard_message = msg
+        return msg
+
+    def _dashboard_missing(self):
+        self._dashboard_message = None
+        self._mutate("set", key="tracking_message_id", value=None)
+        self.save_stats()
+
+    def set_tracking_message(self, message):
+        """Make `message` the dashboard; without a configured channel its channel becomes the partition's."""
+        self._mutate("set", key="tracking_message_id", value=message.id)
+        if message.channel.id != self.tracking_channel_id:
+            self._mutate("set", key="tracking_channel_id", value=message.channel.id)
+        self.save_stats()
+
+    def check_daily_reset(self):
+        """Check if we passed 04:00 and need to reset."""
+        now = local_now()
+        
+        if now.hour >= 4:
+            target_reset_date = now.date().isoformat()
+        else:
+            target_reset_date = (now.date() - timedelta(days=1)).isoformat()
+            
+        if self.last_reset_date != target_reset_date:
+            print(f"[Reset] Triggering Daily Reset. Last: {self.last_reset_date}, Target: {target_reset_date}")
+            return self.reset_daily_stats(target_reset_date)
+        return None
+
+    def reset_daily_stats(self, new_date_str=None):
+        """
+        Reset daily stats and save. Returns the archive entry, plus the
+        per-user "counts" of the archived day for the report.
+        """
+        if not new_date_str:
+            new_date_str = local_now().date().isoformat() # Fallback
+
+        before = self.history.fingerprint()
+        archive_entry = self._mutate("reset", date=new_date_str)
+        if archive_entry:
+            self.rollups.add_day(archive_entry, before)
+
+        # A reset clears most of the state, good moment for a fresh snapshot
+        self.save_stats(compact=True)
+        return archive_entry
+
+    def _apply_reset(self, new_date_str, seq=None):
+        """Archive the current day, fold it into lifetime totals and clear it."""
+        archive_entry = None
+        
+        # 1. Archive
+        has_activity = any([
+            self.daily_work["placed"],
+            self.daily_work["fixes"],
+            self.daily_work["containers"],
+            self.daily_work["hafenevents"],
+            self.daily_profit
+        ])
+        
+        if has_activity:
+             # Archived days keep the stored layout (ISO timestamps, string user ids)
+             archive_entry = {
+                 "date": self.last_reset_date or "Unknown",
+                 "work": {cat: [e.to_dict() for e in events] for cat, events in self.daily_work.items()},
+                 "profit": {str(uid): val for uid, val in self.daily_profit.items()},
+                 "batteries": {str(uid): val for uid, val in self.daily_batteries.items()}
+             }
+             self.history.append(archive_entry, seq=seq)
+        
+        # 2. Aggregate Lifetime
+        counts = self.get_daily_counts()
+        
+        for category in CATEGORIES:
+            for uid, count in counts[category].items():
+                if uid not in self.lifetime_work[category]:
+                    self.lifetime_work[category][uid] = 0
+                self.lifetime_work[category][uid] += count
+            
+        for uid, val in self.daily_profit.items():
+            if uid not in self.lifetime_profit: self.lifetime_profit[uid] = 0
+            self.lifetime_profit[uid] += val
+
+        touched = set(self.daily_profit)
+        for per_user in counts.values():
+            touched.update(per_user)
+        self.leaderboard.refresh(touched, self.lifetime_profit, self.lifetime_work)
+
+        # 3. Clear Current
+        profit, batteries = self.daily_profit, self.daily_batteries
+        self.daily_work = {
+            "placed": [],
+            "fixes": [],
+            "containers": [],
+            "hafenevents": []
+        }
+        self.daily_counts = self._empty_counts()
+        self.daily_profit = {}
+        self.daily_batteries = {}
+        
+        # CRITICAL: CLEAR ACTIVES
+        self.active_panels = []
+        self.panel_engine.clear()
+        self.deadlines.clear()
+        self.ids.clear()
+        self.events_by_user = {}
+        
+        # Update Reset Date
+        self.last_reset_date = new_date_str
+
+        if archive_entry:
+            # The report gets today's totals keyed like the rest of the in-memory state
+            return {**archive_entry, "profit": profit, "batteries": batteries, "counts": counts}
+        return None
+
+    async def create_backup(self, full=None, part_bytes=DEFAULT_PART_BYTES, export=False):
+        """
+        Write a gzip backup (see BackupManager) split into parts of at most
+        `part_bytes`, without blocking the event loop. Returns (header, paths),
+        or (None, []) if it failed. Weekly backups continue the chain only
+        after self.backups.commit(); exports never do and should be discarded.
+        """
+        header = self.backups.plan(full=full, full_every_days=self.settings.get("backup_full_every_days", 28), export=export)
+        try:
+            paths = await asyncio.to_thread(
+                self.backups.write, header, self._snapshot_data(copy=True), self.history, part_bytes
+            )
+        except Exception as e:
+            print(f"Error writing backup: {e}")
+            return None, []
+        return header, paths
+
+    def weekly_totals(self):
+        """(counts, profit, batteries) of this week (Monday's reset onwards), today included."""
+        counts = {cat: dict(per_user) for cat, per_user in self.get_daily_counts().items()}
+        profit = dict(self.daily_profit)
+        batteries = dict(self.daily_batteries)
+        if not self.last_reset_date:
+            return counts, profit, batteries
+
+        today = datetime.fromisoformat(self.last_reset_date).date()
+        week_start = (today - timedelta(days=today.weekday())).isoformat()
+        for day in self.history.iter_days(start=week_start, end=self.last_reset_date):
+            self._add_day(day, counts, profit, batteries)
+        return counts, profit, batteries
+
+    def day_totals(self, date):
+        """(counts, profit, batteries) of an archived day (all entries of that date), or None if there is none."""
+        totals = ({cat: {} for cat in CATEGORIES}, {}, {})
+        found = False
+        for day in self.history.iter_days(start=date, end=date):
+            self._add_day(day, *totals)
+            found = True
+        return totals if found else None
+
+    def archived_range(self):
+        """(first, last) archived date, or None without archived days."""
+        dates = sorted(d for d in self.history.dates() if DATE_RE.match(d or ""))
+        if not dates:
+            return None
+        return datetime.fromisoformat(dates[0]).date(), datetime.fromisoformat(dates[-1]).date()
+
+    def range_totals(self, start, end):
+        """
+        Totals of the archived days start..end (dates, inclusive) from the
+        rollups, see HistoryRollups.totals(). Safe to call from a worker thread.
+        """
+        return self.rollups.totals(start, end)
+
+    @staticmethod
+    def _add_day(day, counts, profit, batteries):
+        """Add the per-user totals of one archived day (string user ids) to int-keyed dicts."""
+        for cat, events in day.get("work", {}).items():
+            per_user = counts.setdefault(cat, {})
+            for e in events:
+                uid = int(e["user_id"])
+                per_user[uid] = per_user.get(uid, 0) + 1
+        for uid, val in int_keys(day.get("profit", {})).items():
+            profit[uid] = profit.get(uid, 0) + val
+        for uid, val in int_keys(day.get("batteries", {})).items():
+            batteries[uid] = batteries.get(uid, 0) + val
\ No newline at end of file
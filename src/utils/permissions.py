@@ -1,21 +1,12 @@
-import json
-import os
 import discord
 from discord import app_commands
+from src.utils.config_manager import config_manager, PERMS_FILE
 
-CONFIG_PATH = "config/perms.json"
+CONFIG_PATH = PERMS_FILE
 
 def load_permissions():
-    """Load permissions from JSON config."""
-    if not os.path.exists(CONFIG_PATH):
-        print(f"[Permissions] Warning: {CONFIG_PATH} not found. Defaulting to empty permissions.")
-        return {}
-    try:
-        with open(CONFIG_PATH, 'r') as f:
-            return json.load(f)
-    except json.JSONDecodeError as e:
-        print(f"[Permissions] Error decoding {CONFIG_PATH}: {e}")
-        return {}
+    """Current permissions ({command name: role name}), reloaded when perms.json changes."""
+    return config_manager.perms
 
 def has_role(user: discord.Member, role_name: str) -> bool:
     """Check if a user has a specific role by name."""
@@ -26,10 +17,7 @@ def has_role(user: discord.Member, role_name: str) -> bool:
 
 async def permission_check_logic(interaction: discord.Interaction) -> bool:
     """Core logic for checking permissions."""
-    # 1. Load config (Consider caching this if performance becomes an issue, 
-    # but for a small JSON file, reading or using a module-level var is fine.
-    # simpler to just load it to allow hot-reloading edits to the json)
-    # Actually, let's load it once at the start of the check to be safe and up-to-date.
+    # 1. Cached config, re-read only when perms.json changed
     perms = load_permissions()
     
     command_name = interaction.command.name if interaction.command else None
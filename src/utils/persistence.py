@@ -0,0 +1,122 @@
+import asyncio
+import json
+import os
+import time
+
+from src.utils.metrics import metrics
+
+
+def atomic_write_json(path, data, indent=4):
+    """Write JSON to a temp file, fsync it and os.replace() it over `path`. Returns bytes written."""
+    payload = json.dumps(data, indent=indent).encode("utf-8")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return len(payload)
+
+
+class PersistenceWriter:
+    """
+    Coalescing background writer.
+
+    `mark_dirty()` is cheap and can be called any number of times; the actual
+    write happens once per `window` seconds at most. `capture()` runs on the
+    event loop and must return a consistent payload (or None for nothing to
+    do); `write(payload)` runs in a worker thread and returns bytes written.
+    Without a running loop (startup, scripts) writes happen synchronously.
+    """
+
+    def __init__(self, capture, write, window=0.5):
+        self.capture = capture
+        self.write = write
+        self.window = window
+
+        self.stats = {
+            "writes": 0,
+            "bytes_written": 0,
+            "last_latency_ms": 0.0,
+            "max_latency_ms": 0.0,
+            "total_latency_ms": 0.0
+        }
+        self._dirty = False
+        self._pending_task = None
+        self._lock = asyncio.Lock()
+
+    def mark_dirty(self):
+        self._dirty = True
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush_sync()
+            return
+        if self._pending_task is None:
+            self._pending_task = loop.create_task(self._delayed_write())
+
+    async def _delayed_write(self):
+        await asyncio.sleep(self.window)
+        self._pending_task = None
+        async with self._lock:
+            await self._write_now()
+
+    async def _write_now(self):
+        if not self._dirty:
+            return
+        self._dirty = False
+        payload = self.capture()
+        if payload is None:
+            return
+        start = time.perf_counter()
+        try:
+            nbytes = await asyncio.to_thread(self.write, payload)
+        except Exception as e:
+            print(f"[Persistence] Write failed: {e}")
+            return
+        self._record(time.perf_counter() - start, nbytes)
+
+    async def flush(self):
+        """Write pending changes now (e.g. on unload) and wait for it."""
+        if self._pending_task is not None:
+            self._pending_task.cancel()
+            self._pending_task = None
+        async with self._lock:
+            await self._write_now()
+
+    def flush_sync(self):
+        """Blocking variant of flush() for code running outside the event loop."""
+        if not self._dirty:
+            return
+        self._dirty = False
+        payload = self.capture()
+        if payload is None:
+            return
+        start = time.perf_counter()
+        try:
+            nbytes = self.write(payload)
+        except Exception as e:
+            print(f"[Persistence] Write failed: {e}")
+            return
+        self._record(time.perf_counter() - start, nbytes)
+
+    def _record(self, seconds, nbytes):
+        ms = seconds * 1000
+        metrics.observe("persist.write", ms)
+        metrics.inc("persist.bytes", nbytes or 0)
+        self.stats["writes"] += 1
+        self.stats["bytes_written"] += nbytes or 0
+        self.stats["last_latency_ms"] = ms
+        self.stats["max_latency_ms"] = max(self.stats["max_latency_ms"], ms)
+        self.stats["total_latency_ms"] += ms
+
+    def describe(self):
+        """One-line summary for status output."""
+        s = self.stats
+        if not s["writes"]:
+            return "no writes yet"
+        avg = s["total_latency_ms"] / s["writes"]
+        return (
+            f"{s['writes']} writes, last {s['last_latency_ms']:.1f} ms "
+            f"(avg {avg:.1f}, max {s['max_latency_ms']:.1f}), {s['bytes_written'] / 1024:.1f} KB written"
+        )
@@ -0,0 +1,288 @@
+import asyncio
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from types import MappingProxyType
+
+from src.utils.helpers import get_target_timezone
+
+CATEGORIES = ("placed", "fixes", "containers", "hafenevents")
+ACTIONS = ("place", "fix")
+
+US = 1_000_000
+HOUR_US = 3600 * US
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_NAIVE_EPOCH = datetime(1970, 1, 1)
+_ONE_US = timedelta(microseconds=1)
+_NO_DETAILS = MappingProxyType({})
+_tz = None
+_offsets = {} # epoch hour -> (UTC offset in microseconds, tzinfo, "+HH:MM" suffix)
+
+
+def code(value):
+    """Interned category/action string: one shared object per code, compared by identity first."""
+    return sys.intern(value)
+
+
+def _target_tz():
+    global _tz
+    if _tz is None:
+        _tz = get_target_timezone()
+    return _tz
+
+
+class SystemClock:
+    """
+    The wall clock. Anything with now_us() and wait_until() methods can
+    stand in for it (see set_clock).
+    """
+
+    def now_us(self):
+        return time.time_ns() // 1000
+
+    async def wait_until(self, ts, event):
+        """Sleep until epoch microseconds `ts`; False if `event` is set first."""
+        delay = (ts - self.now_us()) / US
+        if delay <= 0:
+            return True
+        try:
+            await asyncio.wait_for(event.wait(), delay)
+            return False
+        except asyncio.TimeoutError:
+            return True
+
+
+class SimulatedClock:
+    """
+    A clock that only moves when told to, for replaying days
+    (benchmarks/simulate.py). run_until() moves it forward and wakes every
+    wait_until() on the way at its own time, so the DeadlineScheduler fires
+    each deadline with the clock standing right on it.
+    """
+
+    def __init__(self, start_us):
+        self.now = start_us
+        self._sleepers = {} # task -> (ts, future, event)
+        self._woken = set() # Tasks woken by run_until() that haven't waited again yet
+        self._tasks = set() # Tasks that ever waited, to notice when they finish
+        self._changed = None
+
+    def now_us(self):
+        return self.now
+
+    def set(self, ts):
+        self.now = max(self.now, ts) # Never backwards
+
+    def advance(self, us):
+        self.now += us
+
+    def _notify(self):
+        if self._changed:
+            self._changed.set()
+
+    def _task_done(self, task):
+        self._tasks.discard(task)
+        self._notify()
+
+    async def wait_until(self, ts, event):
+        task = asyncio.current_task()
+        self._woken.discard(task)
+        self._notify()
+        if ts <= self.now:
+            return True
+        if self._changed is None:
+            self._changed = asyncio.Event()
+        if task not in self._tasks:
+            self._tasks.add(task)
+            task.add_done_callback(self._task_done)
+        future = asyncio.get_running_loop().create_future()
+        self._sleepers[task] = (ts, future, event)
+        waker = asyncio.ensure_future(event.wait())
+        try:
+            await asyncio.wait([future, waker], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            waker.cancel()
+            entry = self._sleepers.get(task)
+            if entry and entry[1] is future:
+                del self._sleepers[task]
+        return future.done()
+
+    async def _settle(self):
+        """Wait until every woken task waits on the clock again (or has finished)."""
+        while True:
+            self._woken = {task for task in self._woken if not task.done()}
+            if not self._woken and not any(event.is_set() for _, _, event in self._sleepers.values()):
+                return
+            self._changed.clear()
+            await self._changed.wait()
+
+    async def run_until(self, ts):
+        """Move the clock to `ts`, waking the waiting tasks in time order on the way."""
+        while self._changed is not None:
+            await self._settle()
+            due = [(when, task) for task, (when, _, _) in self._sleepers.items() if when <= ts]
+            if not due:
+                break
+            when, task = min(due, key=lambda d: d[0])
+            self.set(when)
+            _, future, _ = self._sleepers.pop(task)
+            self._woken.add(task)
+            future.set_result(True)
+        self.set(ts)
+
+
+_clock = SystemClock()
+
+
+def set_clock(clock):
+    """Make now_epoch()/local_now() read `clock`. Returns the previous clock."""
+    global _clock
+    previous, _clock = _clock, clock
+    return previous
+
+
+def now_epoch():
+    """Current time in integer epoch microseconds."""
+    return _clock.now_us()
+
+
+async def wait_until(ts, event):
+    """Sleep until epoch microseconds `ts` on the current clock; False if `event` is set first."""
+    return await _clock.wait_until(ts, event)
+
+
+def local_now():
+    """Current time as an aware datetime in the target timezone."""
+    return to_datetime(_clock.now_us())
+
+
+def to_epoch(value):
+    """ISO-8601 string or datetime (or an epoch value already) -> integer epoch microseconds."""
+    if isinstance(value, int):
+        return value
+    dt = value if isinstance(value, datetime) else datetime.fromisoformat(value)
+    if dt.tzinfo is None:
+        dt = _target_tz().localize(dt)
+    return (dt - _EPOCH) // _ONE_US
+
+
+def _hour_offset(ts):
+    """(UTC offset in microseconds, tzinfo, "+HH:MM" suffix) of the target timezone at `ts`."""
+    # The UTC offset only changes on hour boundaries, so it is looked up once per hour
+    hour = ts // HOUR_US
+    entry = _offsets.get(hour)
+    if entry is None:
+        if len(_offsets) > 4096:
+            _offsets.clear()
+        local = datetime.fromtimestamp(hour * HOUR_US // US, _target_tz())
+        entry = _offsets[hour] = (local.utcoffset() // _ONE_US, local.tzinfo, local.isoformat()[19:])
+    return entry
+
+
+def to_datetime(ts):
+    """Epoch microseconds -> aware datetime in the target timezone (for display and calendar math)."""
+    offset, tzinfo, _ = _hour_offset(ts)
+    return (_NAIVE_EPOCH + timedelta(microseconds=ts + offset)).replace(tzinfo=tzinfo)
+
+
+def to_iso(ts):
+    """Epoch microseconds -> ISO-8601 in the target timezone, the same text datetime.now(tz).isoformat() gives."""
+    offset, _, suffix = _hour_offset(ts)
+    return (_NAIVE_EPOCH + timedelta(microseconds=ts + offset)).isoformat() + suffix
+
+
+class Interaction:
+    """One place/fix on a panel. Never changed after creation, so panels can share it."""
+    __slots__ = ("user_id", "action", "ts")
+
+    def __init__(self, user_id, action, ts):
+        self.user_id = user_id
+        self.action = action
+        self.ts = ts
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(int(data["user_id"]), code(data["action"]), to_epoch(data["timestamp"]))
+
+    def to_dict(self):
+        return {"user_id": str(self.user_id), "action": self.action, "timestamp": to_iso(self.ts)}
+
+    def matches(self, user_id, action, ts):
+        return self.ts == ts and self.user_id == user_id and self.action == action
+
+
+class Event:
+    """One entry of today's work. Never changed after creation."""
+    __slots__ = ("id", "user_id", "ts", "category", "details")
+
+    def __init__(self, id, user_id, ts, category, details=None):
+        self.id = id
+        self.user_id = user_id
+        self.ts = ts
+        self.category = category
+        self.details = details or _NO_DETAILS
+
+    @classmethod
+    def from_dict(cls, data, category=None):
+        return cls(
+            data["id"], int(data["user_id"]), to_epoch(data["timestamp"]),
+            code(category or data["type"]), data.get("details")
+        )
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "user_id": str(self.user_id),
+            "timestamp": to_iso(self.ts),
+            "type": self.category,
+            "details": dict(self.details)
+        }
+
+
+class Panel:
+    """An active panel. `interactions` is replaced or appended to by journal records only."""
+    __slots__ = ("id", "placed_by", "placed_by_name", "placed_at", "remaining_minutes", "interactions")
+
+    def __init__(self, id, placed_by, placed_by_name, placed_at, remaining_minutes, interactions=None):
+        self.id = id
+        self.placed_by = placed_by
+        self.placed_by_name = placed_by_name
+        self.placed_at = placed_at
+        self.remaining_minutes = remaining_minutes
+        self.interactions = interactions if interactions is not None else []
+
+    @classmethod
+    def from_dict(cls, data):
+        placed_by = data.get("placed_by")
+        return cls(
+            data["id"], int(placed_by) if placed_by is not None else None, data.get("placed_by_name"),
+            to_epoch(data["placed_at_iso"]), data.get("remaining_minutes"),
+            [Interaction.from_dict(i) for i in data.get("interactions", [])]
+        )
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "placed_by": self.placed_by,
+            "placed_by_name": self.placed_by_name,
+            "placed_at_iso": to_iso(self.placed_at),
+            "remaining_minutes": self.remaining_minutes,
+            "interactions": [i.to_dict() for i in self.interactions]
+        }
+
+    def copy(self):
+        """Copy that a writer thread can read while the original keeps changing."""
+        return Panel(self.id, self.placed_by, self.placed_by_name, self.placed_at,
+                     self.remaining_minutes, list(self.interactions))
+
+
+def int_keys(mapping):
+    """{user_id: value} with integer user ids (JSON and SQLite hand them back as strings)."""
+    return {int(k): v for k, v in mapping.items()}
+
+
+def state_to_json(data):
+    """Turn the records of a captured state into the knecht.json layout (in place) and return it."""
+    data["active_panels"] = [p.to_dict() for p in data["active_panels"]]
+    data["daily_work"] = {cat: [e.to_dict() for e in events] for cat, events in data["daily_work"].items()}
+    return data
@@ -0,0 +1,172 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+import discord
+
+from src.utils.metrics import metrics
+
+MESSAGE_LIMIT = 2000
+
+
+def split_mentions(text, members, limit=MESSAGE_LIMIT):
+    """
+    [(content, members)] messages of at most `limit` characters: `text` and
+    as many mentions as fit, then messages with the remaining mentions.
+    """
+    messages = []
+    header, chunk, length = text, [], len(text)
+    for member in members:
+        extra = len(member.mention) + (2 if chunk else (1 if header else 0))
+        if chunk and length + extra > limit:
+            messages.append((header, chunk))
+            header, chunk, length = "", [], 0
+            extra = len(member.mention)
+        chunk.append(member)
+        length += extra
+    if chunk or header:
+        messages.append((header, chunk))
+    return [
+        ("\n".join(filter(None, [header, ", ".join(m.mention for m in chunk)])), chunk)
+        for header, chunk in messages
+    ]
+
+
+class ChannelTraffic:
+    """
+    Client-side estimate of each channel's message budget (Discord allows
+    about `limit` messages per `per` seconds per channel), so reminders go
+    out before low-priority traffic like dashboard edits.
+
+    Reminders send inside urgent(); low-priority senders call wait_low()
+    first, which waits while urgent sends are running or when no more than
+    `reserve` sends are left in the window. Every send is record()ed.
+    """
+
+    def __init__(self, limit=5, per=5.0, reserve=2):
+        self.limit = limit
+        self.per = per
+        self.reserve = reserve
+        self._sent = {}   # channel id -> deque of monotonic send times
+        self._urgent = {} # channel id -> number of urgent sends in progress
+        self._idle = {}   # channel id -> Event, set while no urgent sends run
+
+    def record(self, channel_id):
+        self._sent.setdefault(channel_id, deque()).append(time.monotonic())
+
+    def remaining(self, channel_id):
+        sent = self._sent.get(channel_id)
+        if not sent:
+            return self.limit
+        cutoff = time.monotonic() - self.per
+        while sent and sent[0] <= cutoff:
+            sent.popleft()
+        return self.limit - len(sent)
+
+    def _idle_event(self, channel_id):
+        event = self._idle.get(channel_id)
+        if event is None:
+            event = self._idle[channel_id] = asyncio.Event()
+            event.set()
+        return event
+
+    @asynccontextmanager
+    async def urgent(self, channel_id):
+        self._urgent[channel_id] = self._urgent.get(channel_id, 0) + 1
+        self._idle_event(channel_id).clear()
+        try:
+            yield
+        finally:
+            self._urgent[channel_id] -= 1
+            if not self._urgent[channel_id]:
+                self._idle_event(channel_id).set()
+
+    async def wait_low(self, channel_id):
+        """Wait until low-priority traffic may use the channel. Returns True if it had to wait."""
+        waited = False
+        while True:
+            idle = self._idle_event(channel_id)
+            if not idle.is_set():
+                await idle.wait()
+                waited = True
+                continue
+            if self.remaining(channel_id) > self.reserve:
+                return waited
+            # Until the oldest send leaves the window
+            await asyncio.sleep(max(0.05, self._sent[channel_id][0] + self.per - time.monotonic()))
+            waited = True
+
+
+channel_traffic = ChannelTraffic()
+
+
+class ReminderDispatcher:
+    """
+    Sends reminders: the mentions are split over as many messages as needed,
+    each pinging exactly its own members, and the channel's budget is held
+    against dashboard edits meanwhile. With `dm_fallback`, members whose
+    message the channel refused get the text as a DM, sent by at most
+    `dm_concurrency` workers at a time.
+    """
+
+    def __init__(self, traffic=channel_traffic, dm_concurrency=4):
+        self.traffic = traffic
+        self.dm_concurrency = dm_concurrency
+
+    async def post(self, channel, content, **kwargs):
+        """One urgent message without pings (collect alerts etc.)."""
+        kwargs.setdefault("allowed_mentions", discord.AllowedMentions.none())
+        async with self.traffic.urgent(channel.id):
+            self.traffic.record(channel.id)
+            return await channel.send(content, **kwargs)
+
+    async def send(self, channel, members, text, view=None, dm_fallback=False):
+        """
+        `text` plus the mentions of `members` into `channel`; the view goes on
+        the first message. Returns (channel messages sent, DMs sent).
+        """
+        messages = split_mentions(text, members)
+        sent = 0
+        async with self.traffic.urgent(channel.id):
+            for n, (content, chunk) in enumerate(messages):
+                allowed = discord.AllowedMentions(everyone=False, roles=False, users=chunk, replied_user=False)
+                kwargs = {"view": view} if view is not None and n == 0 else {}
+                try:
+                    self.traffic.record(channel.id)
+                    await channel.send(content, allowed_mentions=allowed, **kwargs)
+                except discord.HTTPException as e:
+                    print(f"[Reminders] Sending to channel {channel.id} failed: {e}")
+                    metrics.inc("reminders.failed")
+                    if not dm_fallback:
+                        return sent, 0
+                    missed = [m for _, rest in messages[n:] for m in rest]
+                    return sent, await self.send_dms(missed, text)
+                sent += 1
+                metrics.inc("reminders.messages")
+        return sent, 0
+
+    async def send_dms(self, members, text):
+        """DM `text` to every member through a pool of dm_concurrency workers. Returns the number delivered."""
+        queue = deque(members)
+        delivered = 0
+        errors = []
+
+        async def worker():
+            nonlocal delivered
+            while queue:
+                member = queue.popleft()
+                try:
+                    await member.send(text)
+                except discord.HTTPException as e:
+                    # DMs closed (Forbidden) or a transient failure; either way nothing to retry here
+                    errors.append(e)
+                    metrics.inc("reminders.dm_failed")
+                    continue
+                delivered += 1
+                metrics.inc("reminders.dms")
+
+        await asyncio.gather(*(worker() for _ in range(min(self.dm_concurrency, len(members)))))
+        if errors:
+            print(f"[Reminders] {len(errors)} of {len(members)} DMs failed, last: {errors[-1]}")
+        return delivered
@@ -0,0 +1,201 @@
+from datetime import date
+
+from src.utils.records import to_iso
+
+LINES_PER_PAGE = 20
+# Above this many pages the whole report is attached as a file as well
+MAX_BUTTON_PAGES = 25
+
+
+class Section:
+    """
+    `count` lines of a report, rendered on demand: render(start, stop)
+    returns lines [start, stop) only, so a page never touches the rest.
+    """
+
+    def __init__(self, title, count, render):
+        self.title = title
+        self.count = count
+        self.render = render
+
+
+class PagedReport:
+    """
+    A report of an overview page followed by sections cut into pages of
+    LINES_PER_PAGE lines. The page layout follows from the section line
+    counts alone; render_page() only renders the lines on that page.
+    """
+
+    def __init__(self, title, overview, sections):
+        self.title = title
+        self.overview = overview # Lines of page 1
+        self.sections = [s for s in sections if s.count > 0]
+
+    @property
+    def page_count(self):
+        return 1 + sum(-(-s.count // LINES_PER_PAGE) for s in self.sections)
+
+    def _locate(self, page):
+        """(section, first line) of a page after the overview."""
+        for section in self.sections:
+            pages = -(-section.count // LINES_PER_PAGE)
+            if page < pages:
+                return section, page * LINES_PER_PAGE
+            page -= pages
+        return None, 0
+
+    def render_page(self, page):
+        """Text of page `page` (0-based, clamped), at most ~2000 characters."""
+        page = max(0, min(page, self.page_count - 1))
+        footer = f"\n*Page {page + 1}/{self.page_count}*" if self.page_count > 1 else ""
+        if page == 0:
+            body = "\n".join(self.overview)
+        else:
+            section, start = self._locate(page - 1)
+            stop = min(section.count, start + LINES_PER_PAGE)
+            lines = section.render(start, stop)
+            suffix = f" ({start + 1}-{stop} of {section.count})" if section.count > LINES_PER_PAGE else ""
+            body = f"**{section.title}**{suffix}\n" + "\n".join(lines)
+        text = f"**{self.title}**\n{body}"
+        if len(text) + len(footer) > 2000:
+            text = text[:1990 - len(footer)] + "\n…"
+        return text + footer
+
+    def render_all(self):
+        """The whole report as plain text (for the file attachment)."""
+        parts = [self.title, "", *self.overview]
+        for section in self.sections:
+            parts.extend(["", section.title, *section.render(0, section.count)])
+        return "\n".join(parts)
+
+
+def describe_event(e):
+    """One line of a user's work log, e.g. "- `ab12cd`: Placed panel (ef34gh) at 13:12"."""
+    cat = e.category
+    if cat == "placed":
+        action_desc = f"Placed panel ({e.details.get('panel_id', '?')[:6]})"
+    elif cat == "fixes": action_desc = "Fixed panel"
+    elif cat == "containers": action_desc = "Container"
+    elif cat == "hafenevents": action_desc = "Hafenevent"
+    else: action_desc = cat
+    return f"- `{e.id[:6]}`: {action_desc} at {to_iso(e.ts)[11:16]}"
+
+
+def total_acts(details):
+    return details['placed'] + details['fixes'] + details['containers'] + details['hafenevents']
+
+
+def value_section(leaderboard):
+    """Value HoF: one line per user with profit, in leaderboard (profit) order."""
+    ranked = [(uid, val) for uid, val, _ in leaderboard if val > 0]
+
+    def render(start, stop):
+        return [f"{i}. <@{uid}>: **${val:,}**" for i, (uid, val) in enumerate(ranked[start:stop], start + 1)]
+    return Section("🏆 Value HoF", len(ranked), render)
+
+
+def profit_section(leaderboard):
+    """Profit HoF of the daily report: every user with their placed/fixed/battery counts."""
+    def render(start, stop):
+        return [
+            f"{i}. <@{uid}>: **${val}** (P:{details['placed']} F:{details['fixes']} B:{details['batteries']})"
+            for i, (uid, val, details) in enumerate(leaderboard[start:stop], start + 1)
+        ]
+    return Section("🏆 Profit HoF", len(leaderboard), render)
+
+
+def work_section(leaderboard, user_events=None):
+    """
+    Work HoF by number of actions. With `user_events(uid)` (the per-user event
+    index) every user's header is followed by one line per event; the line
+    layout is known from the counts, so a page only looks up its own users.
+    """
+    ranked = sorted(
+        ((uid, details) for uid, _, details in leaderboard if total_acts(details) > 0),
+        key=lambda x: total_acts(x[1]), reverse=True
+    )
+    starts = [] # First line of every user
+    count = 0
+    for _, details in ranked:
+        starts.append(count)
+        count += 1 + (total_acts(details) if user_events else 0)
+
+    def render(start, stop):
+        lines = []
+        # First user that has a line on this page
+        lo, hi = 0, len(starts)
+        while hi - lo > 1:
+            mid = (lo + hi) // 2
+            if starts[mid] <= start:
+                lo = mid
+            else:
+                hi = mid
+        line = starts[lo] if starts else 0
+        for i in range(lo, len(ranked)):
+            if line >= stop:
+                break
+            uid, details = ranked[i]
+            if line >= start:
+                lines.append(
+                    f"{i + 1}. <@{uid}>: **{total_acts(details)} Acts** "
+                    f"(P:{details['placed']} F:{details['fixes']} C:{details['containers']} H:{details['hafenevents']})"
+                )
+            line += 1
+            if user_events:
+                n = total_acts(details)
+                first, last = max(0, start - line), min(n, stop - line)
+                if first < last:
+                    lines.extend(describe_event(e) for e in user_events(uid)[first:last])
+                line += n
+        return lines
+    return Section("🔨 Work HoF", count, render)
+
+
+def lines_section(title, lines):
+    return Section(title, len(lines), lambda start, stop: lines[start:stop])
+
+
+def trend_section(days, by_month=False):
+    """Category totals per week (or month) of a stats range; `days` maps date -> per-day totals (see rollups)."""
+    buckets = {}
+    for date_str, values in days.items():
+        if by_month:
+            key = date_str[:7]
+        else:
+            year, week, _ = date.fromisoformat(date_str).isocalendar()
+            key = f"{year}-W{week:02d}"
+        bucket = buckets.setdefault(key, [0] * len(values))
+        for i, value in enumerate(values):
+            bucket[i] += value
+    ordered = sorted(buckets.items())
+
+    def render(start, stop):
+        return [
+            f"`{key}` P:{v[0]} F:{v[1]} C:{v[2]} H:{v[3]} — **${v[4]:,}**"
+            for key, v in ordered[start:stop]
+        ]
+    return Section("📊 Categories per " + ("Month" if by_month else "Week"), len(ordered), render)
+
+
+def best_days_section(days, limit=10):
+    """The `limit` best archived days by profit, then number of actions."""
+    ranked = sorted(days.items(), key=lambda x: (x[1][4], sum(x[1][:4])), reverse=True)[:limit]
+
+    def render(start, stop):
+        return [
+            f"{i}. {date_str} ({date.fromisoformat(date_str).strftime('%a')}): **${v[4]:,}**, {sum(v[:4])} Acts"
+            for i, (date_str, v) in enumerate(ranked[start:stop], start + 1)
+        ]
+    return Section("📅 Best Days", len(ranked), render)
+
+
+def hours_section(hours):
+    """Actions per hour of day as a bar chart."""
+    peak = max(hours) or 1
+
+    def render(start, stop):
+        return [
+            f"`{hour:02d}:00` {'█' * round(hours[hour] * 16 / peak)} {hours[hour]}"
+            for hour in range(start, stop)
+        ]
+    return Section("🕐 Busiest Hours", len(hours) if any(hours) else 0, render)
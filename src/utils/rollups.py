@@ -0,0 +1,281 @@
+import json
+import os
+import threading
+from datetime import date, timedelta
+
+from src.utils.history import DATE_RE
+from src.utils.persistence import atomic_write_json
+from src.utils.records import CATEGORIES
+
+# Per-day totals in a row: counts per category (CATEGORIES order), then profit and batteries
+PROFIT, BATTERIES = len(CATEGORIES), len(CATEGORIES) + 1
+
+
+def empty_row():
+    """
+    Totals of some archived days, with string user ids (as stored):
+    {"work": {category: {uid: count}}, "profit": {uid: amount},
+     "batteries": {uid: count}, "hours": [events per hour of day] * 24,
+     "days": {date: [placed, fixes, containers, hafenevents, profit, batteries]}}
+    """
+    return {
+        "work": {cat: {} for cat in CATEGORIES},
+        "profit": {},
+        "batteries": {},
+        "hours": [0] * 24,
+        "days": {}
+    }
+
+
+def _add(totals, key, delta):
+    value = totals.get(key, 0) + delta
+    if value > 0:
+        totals[key] = value
+    else:
+        totals.pop(key, None)
+
+
+def fold_day(row, day):
+    """Add one archived day (stored layout: ISO timestamps, string user ids) to a row."""
+    per_day = row["days"].setdefault(day["date"], [0] * (BATTERIES + 1))
+    for i, cat in enumerate(CATEGORIES):
+        events = day.get("work", {}).get(cat, [])
+        per_user = row["work"][cat]
+        for e in events:
+            _add(per_user, str(e["user_id"]), 1)
+            hour = _hour(e["timestamp"])
+            if hour is not None:
+                row["hours"][hour] += 1
+        per_day[i] += len(events)
+    for uid, val in day.get("profit", {}).items():
+        _add(row["profit"], str(uid), val)
+        per_day[PROFIT] += val
+    for uid, val in day.get("batteries", {}).items():
+        _add(row["batteries"], str(uid), val)
+        per_day[BATTERIES] += val
+
+
+def merge_row(total, row):
+    """Add the totals of `row` to `total`."""
+    for cat in CATEGORIES:
+        per_user = total["work"][cat]
+        for uid, n in row["work"].get(cat, {}).items():
+            _add(per_user, uid, n)
+    for key in ["profit", "batteries"]:
+        for uid, val in row[key].items():
+            _add(total[key], uid, val)
+    total["hours"] = [a + b for a, b in zip(total["hours"], row["hours"])]
+    for date_str, values in row["days"].items():
+        per_day = total["days"].setdefault(date_str, [0] * len(values))
+        for i, value in enumerate(values):
+            per_day[i] += value
+
+
+def _hour(timestamp):
+    """Local hour of an archived event's ISO timestamp."""
+    try:
+        return int(timestamp[11:13])
+    except (TypeError, ValueError):
+        return None
+
+
+def week_key(day):
+    year, week, _ = day.isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def _next_month(day):
+    return (day.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def cover(start, end):
+    """
+    Pieces ("month"/"week"/"day", key, first, last) that cover start..end
+    (dates, inclusive): whole months in the middle, whole ISO weeks next to
+    them and single days at the edges.
+    """
+    first_month = start if start.day == 1 else _next_month(start)
+    months = []
+    month = first_month
+    while _next_month(month) - timedelta(days=1) <= end:
+        months.append(month)
+        month = _next_month(month)
+    if not months:
+        return _cover_weeks(start, end)
+    after = _next_month(months[-1])
+    return (
+        _cover_weeks(start, months[0] - timedelta(days=1))
+        + [("month", m.strftime("%Y-%m"), m, _next_month(m) - timedelta(days=1)) for m in months]
+        + _cover_weeks(after, end)
+    )
+
+
+def _cover_weeks(start, end):
+    pieces = []
+    day = start
+    while day <= end:
+        if day.weekday() == 0 and day + timedelta(days=6) <= end:
+            pieces.append(("week", week_key(day), day, day + timedelta(days=6)))
+            day += timedelta(days=7)
+        else:
+            pieces.append(("day", day.isoformat(), day, day))
+            day += timedelta(days=1)
+    return pieces
+
+
+class HistoryRollups:
+    """
+    Weekly and monthly totals of the archived days, so statistics over a
+    date range read a few dozen rows instead of every archived event.
+
+    data/history/rollups.json has one row (see empty_row) per ISO week
+    ("2026-W42") and per month ("2026-10"). reset_daily_stats() folds each
+    archived day into its week and month, archived corrections are taken
+    back out. Days at the edges of a range that don't fill a whole week are
+    read from the history itself.
+
+    The file remembers the history's fingerprint(); when it doesn't match
+    (restore, migration, a crash between the two writes) the rows are
+    rebuilt from the history on the next query.
+    """
+
+    VERSION = 1
+
+    def __init__(self, path, history):
+        self.path = path
+        self.history = history
+        self._data = None
+        # Queries run in a worker thread, updates on the event loop
+        self._lock = threading.Lock()
+
+    def _read(self):
+        if self._data is None and os.path.exists(self.path):
+            try:
+                with open(self.path, "r") as f:
+                    data = json.load(f)
+                if data.get("version") == self.VERSION:
+                    self._data = data
+            except Exception as e:
+                print(f"Error loading rollups: {e}")
+        return self._data
+
+    def _current(self):
+        """The rows, rebuilt first if they don't match the history."""
+        fingerprint = self.history.fingerprint()
+        data = self._read()
+        if data is None or data["fingerprint"] != fingerprint:
+            data = self._build(fingerprint)
+        return data
+
+    def _build(self, fingerprint):
+        print(f"[History] Building {self.path}...")
+        data = {"version": self.VERSION, "fingerprint": fingerprint, "weeks": {}, "months": {}}
+        for day in self.history.iter_days():
+            self._fold(data, day)
+        self._save(data)
+        return data
+
+    @staticmethod
+    def _rows(data, date_str):
+        """The week and month rows a date belongs to, or () for days without a proper date."""
+        if not date_str or not DATE_RE.match(date_str):
+            return ()
+        day = date.fromisoformat(date_str)
+        return (
+            data["weeks"].setdefault(week_key(day), empty_row()),
+            data["months"].setdefault(date_str[:7], empty_row())
+        )
+
+    def _fold(self, data, day):
+        for row in self._rows(data, day.get("date")):
+            fold_day(row, day)
+
+    def _save(self, data):
+        self._data = data
+        try:
+            atomic_write_json(self.path, data, indent=None)
+        except Exception as e:
+            print(f"Error saving rollups: {e}")
+
+    def _update(self, before, change):
+        """
+        Apply `change(data)` for a history change that moved the fingerprint
+        from `before` to the current one. Rows that already include it are
+        left alone; rows that are out of date anyway wait for the rebuild.
+        """
+        with self._lock:
+            data = self._read()
+            if data is None and not before[0]:
+                # Nothing archived yet: start the rows with this change
+                data = {"version": self.VERSION, "fingerprint": before, "weeks": {}, "months": {}}
+            if data is None or data["fingerprint"] != before:
+                self._data = None
+                return False
+            fingerprint = self.history.fingerprint()
+            if fingerprint == before:
+                return False
+            change(data)
+            data["fingerprint"] = fingerprint
+            self._save(data)
+            return True
+
+    def add_day(self, day, before):
+        """Fold a just-archived day in; `before` is history.fingerprint() from before it was archived."""
+        return self._update(before, lambda data: self._fold(data, day))
+
+    def remove_event(self, date_str, category, user_id, hour, profit_value, before):
+        """Take an event removed from an archived day (see add_day) back out of its week and month."""
+        uid = str(user_id)
+        index = CATEGORIES.index(category)
+
+        def change(data):
+            for row in self._rows(data, date_str):
+                _add(row["work"][category], uid, -1)
+                if hour is not None:
+                    row["hours"][hour] = max(0, row["hours"][hour] - 1)
+                per_day = row["days"].get(date_str)
+                if per_day:
+                    per_day[index] = max(0, per_day[index] - 1)
+                if profit_value and uid in row["profit"]:
+                    taken = min(profit_value, row["profit"][uid])
+                    _add(row["profit"], uid, -taken)
+                    if per_day:
+                        per_day[PROFIT] = max(0, per_day[PROFIT] - taken)
+        return self._update(before, change)
+
+    def event_hour(self, date_str, category, event_id):
+        """Local hour of an archived event, read from its day (for remove_event)."""
+        for day in self.history.iter_days(start=date_str, end=date_str):
+            for e in day.get("work", {}).get(category, []):
+                if e["id"] == event_id:
+                    return _hour(e["timestamp"])
+        return None
+
+    def totals(self, start, end):
+        """
+        Totals (see empty_row) of the archived days start..end (dates,
+        inclusive), plus "rows" and "raw_days": how many rollup rows and
+        archived days were read.
+        """
+        total = empty_row()
+        rows = 0
+        edges = {} # Month -> dates read from the history, so each month is read once
+        with self._lock:
+            data = self._current()
+            for kind, key, first, last in cover(start, end):
+                if kind == "day":
+                    edges.setdefault(key[:7], set()).add(key)
+                    continue
+                row = data[kind + "s"].get(key)
+                if row:
+                    merge_row(total, row)
+                    rows += 1
+            raw_days = 0
+            for dates in edges.values():
+                for day in self.history.iter_days(start=min(dates), end=max(dates)):
+                    if day["date"] in dates:
+                        fold_day(total, day)
+                        raw_days += 1
+        total["rows"] = rows
+        total["raw_days"] = raw_days
+        return total
@@ -0,0 +1,160 @@
+import asyncio
+import json
+import os
+import traceback
+from datetime import datetime, timedelta, timezone
+
+from src.utils.metrics import metrics
+from src.utils.persistence import PersistenceWriter, atomic_write_json
+from src.utils.records import now_epoch, to_datetime, to_epoch, wait_until
+
+# Deadline kinds, in the order they are handled when they fall on the same second
+DAILY_RESET = "daily_reset"
+HOUR_RESET = "hour_reset"
+REMINDER = "reminder"
+PANEL_READY = "panel_ready"
+KIND_ORDER = [DAILY_RESET, HOUR_RESET, REMINDER, PANEL_READY]
+
+
+def utc_now():
+    """The current time of the records clock (see set_clock) as a UTC datetime."""
+    return to_datetime(now_epoch()).astimezone(timezone.utc)
+
+
+class DeadlineScheduler:
+    """
+    Sleeps until the next deadline of the hourly timeline instead of polling:
+    the daily restart (reset_hour:00), the XX:30 fix reset and every minute in
+    reminder_minutes(), all in local time `tz`.
+
+    The last fired deadline is kept in `state_file`, so after a restart
+    deadlines that were already handled are not repeated, and ones missed by
+    at most `grace` seconds are still fired.
+
+    `panel_deadline()` may return the next PANEL_READY time (aware datetime,
+    or None). Those are not part of the timeline above and not persisted;
+    call wake() when it may have moved, so the sleep is recomputed.
+    """
+
+    def __init__(self, tz, state_file, reminder_minutes, reset_hour=4, grace=60, panel_deadline=None):
+        self.tz = tz
+        self.state_file = state_file
+        self.reminder_minutes = reminder_minutes
+        self.reset_hour = reset_hour
+        self.grace = grace
+        self.panel_deadline = panel_deadline
+        self._wake = asyncio.Event()
+        self._hour_cache = (None, None) # ((hour start, reminder minutes), deadlines) of the last hour asked for
+
+        self.last_fired = None # UTC datetime
+        # Written in the background, so deadlines in quick succession share a write
+        self._writer = PersistenceWriter(self._capture_state, self._write_state)
+        if os.path.exists(state_file):
+            try:
+                with open(state_file, "r") as f:
+                    self.last_fired = datetime.fromisoformat(json.load(f)["last_fired"])
+            except Exception as e:
+                print(f"Error loading scheduler state: {e}")
+
+    def _hour_deadlines(self, hour_start):
+        """Deadlines within one hour. `hour_start` is a UTC hour boundary."""
+        minutes = tuple(self.reminder_minutes())
+        key = (hour_start, minutes)
+        if self._hour_cache[0] == key:
+            return self._hour_cache[1]
+        local = hour_start.astimezone(self.tz)
+        deadlines = []
+        if local.hour == self.reset_hour:
+            deadlines.append((hour_start, DAILY_RESET))
+        deadlines.append((hour_start + timedelta(minutes=30), HOUR_RESET))
+        for minute in minutes:
+            deadlines.append((hour_start + timedelta(minutes=minute), REMINDER))
+        self._hour_cache = (key, deadlines)
+        return deadlines
+
+    def deadlines_between(self, start, end):
+        """All (when, kind) with start < when <= end, in order. Times are UTC."""
+        # Stepping in UTC keeps repeated/skipped local hours around DST right
+        hour = start.replace(minute=0, second=0, microsecond=0)
+        result = []
+        while hour <= end:
+            result.extend(d for d in self._hour_deadlines(hour) if start < d[0] <= end)
+            hour += timedelta(hours=1)
+        result.sort(key=lambda d: (d[0], KIND_ORDER.index(d[1])))
+        return result
+
+    def next_deadline(self, after):
+        """(when, kinds) of the first deadline strictly after `after`."""
+        hour = after.replace(minute=0, second=0, microsecond=0)
+        while True:
+            upcoming = [d for d in self._hour_deadlines(hour) if d[0] > after]
+            if upcoming:
+                when = min(d[0] for d in upcoming)
+                kinds = sorted({k for w, k in upcoming if w == when}, key=KIND_ORDER.index)
+                return when, kinds
+            hour += timedelta(hours=1)
+
+    def wake(self):
+        """Recompute the next deadline now (a panel deadline may have moved)."""
+        self._wake.set()
+
+    async def _sleep_until(self, when):
+        """Sleep until `when`; False if wake() cut the sleep short."""
+        return await wait_until(to_epoch(when), self._wake)
+
+    def _next(self, cursor):
+        """next_deadline(cursor), with the panel deadline if it comes first."""
+        when, kinds = self.next_deadline(cursor)
+        panel_when = self.panel_deadline() if self.panel_deadline else None
+        if panel_when is not None:
+            if panel_when < when:
+                return panel_when, [PANEL_READY]
+            if panel_when == when:
+                return when, kinds + [PANEL_READY]
+        return when, kinds
+
+    def _capture_state(self):
+        return {"last_fired": self.last_fired.isoformat()}
+
+    def _write_state(self, payload):
+        return atomic_write_json(self.state_file, payload)
+
+    def _mark_fired(self, when):
+        self.last_fired = when
+        self._writer.mark_dirty()
+
+    async def flush(self):
+        """Write a pending last_fired now (on unload)."""
+        await self._writer.flush()
+
+    async def _fire(self, callback, when, kinds):
+        metrics.observe("scheduler.lateness", (utc_now() - when).total_seconds() * 1000)
+        try:
+            async with metrics.timer("scheduler.tick"):
+                await callback(when.astimezone(self.tz), kinds)
+        except Exception:
+            traceback.print_exc()
+        if kinds != [PANEL_READY]:
+            self._mark_fired(when)
+
+    async def run(self, callback):
+        """Call `await callback(local_time, kinds)` at every deadline, forever."""
+        now = utc_now()
+        if self.last_fired:
+            # Catch up on deadlines that passed while we were down
+            missed = {}
+            for when, kind in self.deadlines_between(self.last_fired, now):
+                missed.setdefault(when, []).append(kind)
+            for when, kinds in missed.items():
+                if (now - when).total_seconds() <= self.grace:
+                    await self._fire(callback, when, kinds)
+        cursor = max(self.last_fired or now, now)
+
+        while True:
+            self._wake.clear()
+            when, kinds = self._next(cursor)
+            if not await self._sleep_until(when):
+                continue
+            await self._fire(callback, when, kinds)
+            # Panel deadlines can lie before the cursor (e.g. right after a catch-up)
+            cursor = max(cursor, when)
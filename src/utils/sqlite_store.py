@@ -0,0 +1,520 @@
+import json
+import sqlite3
+import threading
+
+WORK_CATEGORIES = ["placed", "fixes", "containers", "hafenevents"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS daily_archives (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    date TEXT NOT NULL,
+    profit TEXT NOT NULL,
+    batteries TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_archives_date ON daily_archives(date);
+CREATE TABLE IF NOT EXISTS events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL,
+    archive_id INTEGER REFERENCES daily_archives(id),
+    category TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    details TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_events_day_user ON events(archive_id, user_id, category);
+CREATE INDEX IF NOT EXISTS idx_events_day_category ON events(archive_id, category, user_id);
+CREATE INDEX IF NOT EXISTS idx_events_id ON events(id);
+CREATE TABLE IF NOT EXISTS panels (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    placed_by INTEGER,
+    placed_by_name TEXT,
+    placed_at_iso TEXT NOT NULL,
+    remaining_minutes INTEGER
+);
+CREATE TABLE IF NOT EXISTS panel_interactions (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    panel_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    action TEXT NOT NULL,
+    timestamp TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_interactions_panel ON panel_interactions(panel_id);
+CREATE INDEX IF NOT EXISTS idx_interactions_match ON panel_interactions(user_id, action, timestamp);
+CREATE TABLE IF NOT EXISTS daily_totals (
+    user_id TEXT PRIMARY KEY,
+    profit INTEGER,
+    batteries INTEGER
+);
+CREATE TABLE IF NOT EXISTS lifetime (
+    category TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    value INTEGER NOT NULL,
+    PRIMARY KEY (category, user_id)
+);
+"""
+
+
+class SQLiteStore:
+    """
+    SQLite (WAL) storage engine for the Knecht state.
+
+    Consumes the same mutation records as the JSON journal, but turns each one
+    into a handful of indexed row changes. Today's events have archive_id NULL;
+    a reset moves them into a daily_archives row.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        # Used on the event loop and by the persistence writer's commits (worker
+        # thread); the lock keeps a commit out of a half-applied record.
+        # History reads use connections of their own (SQLiteHistory).
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.RLock()
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def is_empty(self):
+        with self.lock:
+            row = self.conn.execute("SELECT 1 FROM meta WHERE key = 'initialized'").fetchone()
+        return row is None
+
+    def commit(self):
+        with self.lock:
+            self.conn.commit()
+
+    def close(self):
+        with self.lock:
+            self.conn.commit()
+            self.conn.close()
+
+    # --- Writes ---
+
+    def apply(self, record):
+        """Translate a single mutation record into row changes."""
+        with self.lock:
+            self._apply(record)
+
+    def _apply(self, record):
+        op = record["op"]
+        c = self.conn
+
+        if op == "event_add":
+            self._insert_event(record["event"], record["category"], None)
+
+        elif op == "event_remove":
+            c.execute(
+                "DELETE FROM events WHERE archive_id IS NULL AND category = ? AND id = ?",
+                (record["category"], record["event_id"])
+            )
+
+        elif op == "events_clear":
+            c.execute("DELETE FROM events WHERE archive_id IS NULL AND category = ?", (record["category"],))
+
+        elif op == "profit":
+            c.executemany(
+                "INSERT INTO daily_totals (user_id, profit) VALUES (?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET profit = excluded.profit",
+                list(record["values"].items())
+            )
+
+        elif op == "batteries":
+            c.executemany(
+                "INSERT INTO daily_totals (user_id, batteries) VALUES (?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET batteries = excluded.batteries",
+                list(record["values"].items())
+            )
+
+        elif op == "panel_add":
+            self._insert_panel(record["panel"])
+
+        elif op == "panels_remove":
+            ids = [(pid,) for pid in record["panel_ids"]]
+            c.executemany("DELETE FROM panel_interactions WHERE panel_id = ?", ids)
+            c.executemany("DELETE FROM panels WHERE id = ?", ids)
+
+        elif op == "panels_clear":
+            c.execute("DELETE FROM panel_interactions")
+            c.execute("DELETE FROM panels")
+
+        elif op == "interaction_add":
+            i = record["interaction"]
+            c.executemany(
+                "INSERT INTO panel_interactions (panel_id, user_id, action, timestamp) VALUES (?, ?, ?, ?)",
+                [(pid, i["user_id"], i["action"], i["timestamp"]) for pid in record["panel_ids"]]
+            )
+
+        elif op == "interaction_remove" and record.get("panel_ids") is not None:
+            i = record["interaction"]
+            c.executemany(
+                "DELETE FROM panel_interactions WHERE panel_id = ? AND user_id = ? AND action = ? AND timestamp = ?",
+                [(pid, i["user_id"], i["action"], i["timestamp"]) for pid in record["panel_ids"]]
+            )
+
+        elif op == "interaction_remove":
+            # Legacy fix events without panel links: first matching panel only
+            i = record["interaction"]
+            match = (i["user_id"], i["action"], i["timestamp"])
+            row = c.execute(
+                "SELECT i.panel_id FROM panel_interactions i JOIN panels p ON p.id = i.panel_id "
+                "WHERE i.user_id = ? AND i.action = ? AND i.timestamp = ? ORDER BY p.seq LIMIT 1",
+                match
+            ).fetchone()
+            if row:
+                c.execute(
+                    "DELETE FROM panel_interactions WHERE panel_id = ? AND user_id = ? AND action = ? AND timestamp = ?",
+                    (row[0],) + match
+                )
+
+        elif op == "archive_event_remove":
+            self._remove_archived_event(record)
+
+        elif op == "reset":
+            self._reset(record["date"])
+
+        elif op == "set":
+            self._set_meta(record["key"], record["value"])
+
+    def _insert_event(self, event, category, archive_id):
+        self.conn.execute(
+            "INSERT INTO events (id, archive_id, category, user_id, timestamp, details) VALUES (?, ?, ?, ?, ?, ?)",
+            (event["id"], archive_id, category, str(event["user_id"]), event["timestamp"], json.dumps(event.get("details", {})))
+        )
+
+    def _insert_panel(self, panel):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO panels (id, placed_by, placed_by_name, placed_at_iso, remaining_minutes) VALUES (?, ?, ?, ?, ?)",
+            (panel["id"], panel.get("placed_by"), panel.get("placed_by_name"), panel["placed_at_iso"], panel.get("remaining_minutes"))
+        )
+        self.conn.executemany(
+            "INSERT INTO panel_interactions (panel_id, user_id, action, timestamp) VALUES (?, ?, ?, ?)",
+            [(panel["id"], i["user_id"], i["action"], i["timestamp"]) for i in panel.get("interactions", [])]
+        )
+
+    def _set_meta(self, key, value):
+        self.conn.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, json.dumps(value))
+        )
+
+    def _get_meta(self, key, default=None):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def _remove_archived_event(self, record):
+        c = self.conn
+        uid, value = record["user_id"], record.get("profit", 0)
+        row = c.execute(
+            "SELECT e.seq, a.id, a.profit FROM events e JOIN daily_archives a ON a.id = e.archive_id "
+            "WHERE e.id = ? AND e.category = ? AND a.date = ? ORDER BY a.id LIMIT 1",
+            (record["event_id"], record["category"], record["date"])
+        ).fetchone()
+        if row:
+            c.execute("DELETE FROM events WHERE seq = ?", (row[0],))
+            profit = json.loads(row[2])
+            if value and uid in profit:
+                profit[uid] = max(0, profit[uid] - value)
+                c.execute("UPDATE daily_archives SET profit = ? WHERE id = ?", (json.dumps(profit), row[1]))
+
+        c.execute(
+            "UPDATE lifetime SET value = MAX(0, value - 1) WHERE category = ? AND user_id = ?",
+            (record["category"], uid)
+        )
+        if value:
+            c.execute(
+                "UPDATE lifetime SET value = MAX(0, value - ?) WHERE category = 'profit' AND user_id = ?",
+                (value, uid)
+            )
+        c.commit()
+
+    def _reset(self, new_date_str):
+        """Same semantics as Knecht._apply_reset, expressed as set operations."""
+        c = self.conn
+        has_activity = (
+            c.execute("SELECT 1 FROM events WHERE archive_id IS NULL LIMIT 1").fetchone()
+            or c.execute("SELECT 1 FROM daily_totals WHERE profit IS NOT NULL LIMIT 1").fetchone()
+        )
+
+        if has_activity:
+            profit, batteries = self._daily_totals()
+            cur = c.execute(
+                "INSERT INTO daily_archives (date, profit, batteries) VALUES (?, ?, ?)",
+                (self._get_meta("last_reset_date") or "Unknown", json.dumps(profit), json.dumps(batteries))
+            )
+            archive_id = cur.lastrowid
+        else:
+            archive_id = None
+
+        # Lifetime aggregation straight from the index
+        c.execute(
+            "INSERT INTO lifetime (category, user_id, value) "
+            "SELECT category, user_id, COUNT(*) FROM events WHERE archive_id IS NULL GROUP BY category, user_id "
+            "ON CONFLICT(category, user_id) DO UPDATE SET value = value + excluded.value"
+        )
+        c.execute(
+            "INSERT INTO lifetime (category, user_id, value) "
+            "SELECT 'profit', user_id, profit FROM daily_totals WHERE profit IS NOT NULL "
+            "ON CONFLICT(category, user_id) DO UPDATE SET value = value + excluded.value"
+        )
+
+        if archive_id is not None:
+            c.execute("UPDATE events SET archive_id = ? WHERE archive_id IS NULL", (archive_id,))
+        else:
+            c.execute("DELETE FROM events WHERE archive_id IS NULL")
+        c.execute("DELETE FROM daily_totals")
+        c.execute("DELETE FROM panel_interactions")
+        c.execute("DELETE FROM panels")
+        self._set_meta("last_reset_date", new_date_str)
+        # Commit right away so readers on other connections see the archived day
+        c.commit()
+
+    def import_state(self, data):
+        """One-shot migration: replace all tables with a knecht.json style state dict."""
+        with self.lock:
+            self._import_state(data)
+
+    def _import_state(self, data):
+        c = self.conn
+        for table in ["events", "daily_archives", "panel_interactions", "panels", "daily_totals", "lifetime", "meta"]:
+            c.execute(f"DELETE FROM {table}")
+
+        for entry in data.get("history", []):
+            cur = c.execute(
+                "INSERT INTO daily_archives (date, profit, batteries) VALUES (?, ?, ?)",
+                (entry.get("date", "Unknown"), json.dumps(entry.get("profit", {})), json.dumps(entry.get("batteries", {})))
+            )
+            for category, events in entry.get("work", {}).items():
+                if isinstance(events, list):
+                    for e in events:
+                        self._insert_event(e, category, cur.lastrowid)
+
+        for category, events in data.get("daily_work", {}).items():
+            for e in events:
+                self._insert_event(e, category, None)
+
+        for panel in data.get("active_panels", []):
+            self._insert_panel(panel)
+
+        self.apply({"op": "profit", "values": data.get("daily_profit", {})})
+        self.apply({"op": "batteries", "values": data.get("daily_batteries", {})})
+
+        rows = [("profit", uid, val) for uid, val in data.get("lifetime_profit", {}).items()]
+        for category, per_user in data.get("lifetime_work", {}).items():
+            rows.extend((category, uid, val) for uid, val in per_user.items())
+        c.executemany("INSERT INTO lifetime (category, user_id, value) VALUES (?, ?, ?)", rows)
+
+        self._set_meta("last_reset_date", data.get("last_reset_date"))
+        self._set_meta("tracking_message_id", data.get("tracking_message_id"))
+        self._set_meta("tracking_channel_id", data.get("tracking_channel_id"))
+        self._set_meta("initialized", True)
+        c.commit()
+
+    # --- Reads ---
+
+    def _event_dict(self, row):
+        eid, category, user_id, timestamp, details = row
+        return {"id": eid, "user_id": user_id, "timestamp": timestamp, "type": category, "details": json.loads(details)}
+
+    def _daily_totals(self):
+        profit, batteries = {}, {}
+        for uid, p, b in self.conn.execute("SELECT user_id, profit, batteries FROM daily_totals"):
+            if p is not None:
+                profit[uid] = p
+            if b is not None:
+                batteries[uid] = b
+        return profit, batteries
+
+    def _work_lists(self, archive_id, conn=None):
+        work = {cat: [] for cat in WORK_CATEGORIES}
+        rows = (conn or self.conn).execute(
+            "SELECT id, category, user_id, timestamp, details FROM events WHERE archive_id IS ? ORDER BY seq",
+            (archive_id,)
+        )
+        for row in rows:
+            work.setdefault(row[1], []).append(self._event_dict(row))
+        return work
+
+    def load_state(self):
+        """Return the current state in the knecht.json layout (archived days stay in the db, see history())."""
+        with self.lock:
+            return self._load_state()
+
+    def _load_state(self):
+        c = self.conn
+        profit, batteries = self._daily_totals()
+
+        panels = []
+        by_id = {}
+        for pid, placed_by, name, placed_at, remaining in c.execute(
+            "SELECT id, placed_by, placed_by_name, placed_at_iso, remaining_minutes FROM panels ORDER BY seq"
+        ):
+            panel = {
+                "id": pid, "placed_by": placed_by, "placed_by_name": name,
+                "placed_at_iso": placed_at, "remaining_minutes": remaining, "interactions": []
+            }
+            panels.append(panel)
+            by_id[pid] = panel
+        for pid, uid, action, ts in c.execute(
+            "SELECT panel_id, user_id, action, timestamp FROM panel_interactions ORDER BY seq"
+        ):
+            if pid in by_id:
+                by_id[pid]["interactions"].append({"user_id": uid, "action": action, "timestamp": ts})
+
+        lifetime_profit = {}
+        lifetime_work = {cat: {} for cat in WORK_CATEGORIES}
+        for category, uid, value in c.execute("SELECT category, user_id, value FROM lifetime"):
+            if category == "profit":
+                lifetime_profit[uid] = value
+            else:
+                lifetime_work.setdefault(category, {})[uid] = value
+
+        return {
+            "active_panels": panels,
+            "daily_batteries": batteries,
+            "daily_work": self._work_lists(None),
+            "daily_profit": profit,
+            "lifetime_profit": lifetime_profit,
+            "lifetime_work": lifetime_work,
+            "last_reset_date": self._get_meta("last_reset_date"),
+            "tracking_message_id": self._get_meta("tracking_message_id"),
+            "tracking_channel_id": self._get_meta("tracking_channel_id")
+        }
+
+    def daily_counts(self):
+        """{category: {user_id: count}} for today, served by the (archive_id, category, user_id) index."""
+        counts = {cat: {} for cat in WORK_CATEGORIES}
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT category, user_id, COUNT(*) FROM events WHERE archive_id IS NULL GROUP BY category, user_id"
+            ).fetchall()
+        for category, uid, n in rows:
+            counts.setdefault(category, {})[uid] = n
+        return counts
+
+    def history(self):
+        return SQLiteHistory(self)
+
+
+class SQLiteHistory:
+    """
+    Read-only view of the daily_archives table with the HistoryArchive API.
+    Every read uses a short-lived connection of its own, so it can run in a
+    worker thread; archived days are committed as soon as they change.
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    def _connect(self):
+        return sqlite3.connect(self.store.path)
+
+    def _read(self, query, params=()):
+        conn = self._connect()
+        try:
+            return conn.execute(query, params).fetchall()
+        finally:
+            conn.close()
+
+    def append(self, entry, seq=None):
+        # The store archives the day itself when it applies the reset record
+        return False
+
+    def remove_event(self, date, category, event_id, user_id, profit_value=0):
+        # Done by the store when it applies the archive_event_remove record
+        return False
+
+    def find_ids(self, prefix):
+        """Archived events whose id starts with `prefix`: [(id, date, category, user_id)], newest day first."""
+        if not prefix:
+            return []
+        # Range scan on idx_events_id instead of LIKE, which can't use the index
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        rows = self._read(
+            "SELECT e.id, a.date, e.category, e.user_id FROM events e JOIN daily_archives a ON a.id = e.archive_id "
+            "WHERE e.id >= ? AND e.id < ? ORDER BY a.id DESC",
+            (prefix, upper)
+        )
+        return [tuple(row) for row in rows]
+
+    def __len__(self):
+        return self._read("SELECT COUNT(*) FROM daily_archives")[0][0]
+
+    def fingerprint(self):
+        """[days, events] of the archive; changes with every append and removal."""
+        conn = self._connect()
+        try:
+            return [
+                conn.execute("SELECT COUNT(*) FROM daily_archives").fetchone()[0],
+                conn.execute("SELECT COUNT(*) FROM events WHERE archive_id IS NOT NULL").fetchone()[0]
+            ]
+        finally:
+            conn.close()
+
+    def dates(self):
+        return [row[0] for row in self._read("SELECT date FROM daily_archives ORDER BY id")]
+
+    def iter_days(self, start=None, end=None):
+        conn = self._connect()
+        try:
+            yield from self._iter_days(conn, start, end)
+        finally:
+            conn.close()
+
+    def _iter_days(self, conn, start, end):
+        query = "SELECT id, date, profit, batteries FROM daily_archives"
+        clauses, params = [], []
+        if start:
+            clauses.append("date >= ?")
+            params.append(start)
+        if end:
+            clauses.append("date <= ?")
+            params.append(end)
+        if clauses:
+            # Days without a proper date only show up in unranged reads
+            clauses.append("date GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]'")
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY id"
+
+        for archive_id, date, a_profit, a_batteries in conn.execute(query, params).fetchall():
+            yield {
+                "date": date,
+                "work": self.store._work_lists(archive_id, conn),
+                "profit": json.loads(a_profit),
+                "batteries": json.loads(a_batteries)
+            }
+
+    def snapshot(self):
+        """
+        Frozen view for a reader thread (backups): one read transaction, so
+        every iter_days() on it sees the archive as it was when it started.
+        WAL mode lets the store keep committing meanwhile.
+        """
+        return SQLiteHistorySnapshot(self)
+
+
+class SQLiteHistorySnapshot:
+    """What SQLiteHistory.snapshot() returns: iter_days() inside one read transaction."""
+
+    def __init__(self, history):
+        self.history = history
+        self.conn = history._connect()
+        self.conn.execute("BEGIN")
+        self.conn.execute("SELECT COUNT(*) FROM daily_archives").fetchone() # Starts the read snapshot
+
+    def iter_days(self, start=None, end=None):
+        return self.history._iter_days(self.conn, start, end)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,80 +1,156 @@
+import re
 import discord
 from src.config import TARGET_ROLE_NAME
 
-def check_traffic_debug(guild: discord.Guild):
+DEFAULT_GAME_NAMES = ["RAGE Multiplayer", "GTA", "Medal"]
+
+
+class GameMatcher:
+    """
+    Decides whether an activity counts as "playing".
+    Configured via settings.json "game_matchers":
+    { "any_game": bool, "names": [substrings], "application_ids": [ids] }
+    """
+
+    def __init__(self, any_game=True, names=None, application_ids=None):
+        self.any_game = any_game
+        names = DEFAULT_GAME_NAMES if names is None else names
+        self.application_ids = frozenset(int(a) for a in (application_ids or []))
+        # All name substrings folded into one precompiled pattern
+        self.name_re = re.compile("|".join(re.escape(n) for n in names)) if names else None
+
+    @classmethod
+    def from_settings(cls, cfg):
+        cfg = cfg or {}
+        return cls(cfg.get("any_game", True), cfg.get("names"), cfg.get("application_ids"))
+
+    def matches(self, activity):
+        if self.any_game and isinstance(activity, discord.Game):
+            return True
+        app_id = getattr(activity, "application_id", None)
+        if app_id is not None and app_id in self.application_ids:
+            return True
+        name = activity.name
+        return bool(self.name_re and name and self.name_re.search(name))
+
+
+class PresenceIndex:
     """
-    Returns (bool_present, debug_log_string)
+    Per-guild set of Valid Players, kept up to date from gateway events
+    (presence, member and role updates) instead of scanning guild.members on
+    every check. A guild is seeded with one full scan the first time it is seen.
     """
-    role = discord.utils.get(guild.roles, name=TARGET_ROLE_NAME)
-    if not role:
-        return False, f"❌ Role '{TARGET_ROLE_NAME}' not found in server."
-
-    logs = []
-    found_valid = False
-    
-    # Check all members with role
-    members_with_role = [m for m in guild.members if role in m.roles]
-    logs.append(f"Members with role '{TARGET_ROLE_NAME}': {len(members_with_role)}")
-    
-    for member in members_with_role:
-        member_log = f"- {member.display_name}: Status={member.status}"
-        
+
+    def __init__(self, role_name=TARGET_ROLE_NAME):
+        self.role_name = role_name
+        self.role_names = {} # guild_id -> role name, for guilds that don't use role_name
+        self.matcher = GameMatcher()
+        self._role_ids = {} # guild_id -> role id (None if the role doesn't exist)
+        self._valid = {}    # guild_id -> { member_id: discord.Member }
+
+    def set_matcher(self, matcher):
+        self.matcher = matcher
+        self._valid.clear()
+
+    def set_role_name(self, guild_id, role_name):
+        self.role_names[guild_id] = role_name
+        self._valid.pop(guild_id, None)
+        self._role_ids.pop(guild_id, None)
+
+    def role_name_for(self, guild_id):
+        return self.role_names.get(guild_id, self.role_name)
+
+    def verdict(self, member, role_id):
+        """Returns (is_valid, reason). Shared by the index and the debug log."""
+        if role_id is None or member.get_role(role_id) is None:
+            return False, "Skipped: Missing Role"
         if member.status == discord.Status.offline:
-            member_log += " (Skipped: Offline)"
-            logs.append(member_log)
-            continue
-            
+            return False, "Skipped: Offline"
         if not member.activities:
-            member_log += " (Skipped: No Activity)"
-            logs.append(member_log)
-            continue
-            
+            return False, "Skipped: No Activity"
+        if any(self.matcher.matches(a) for a in member.activities):
+            return True, "✅ MATCH!"
+        return False, "❌ No Game Activity"
+
+    def seed(self, guild: discord.Guild):
+        role = discord.utils.get(guild.roles, name=self.role_name_for(guild.id))
+        role_id = role.id if role else None
+        self._role_ids[guild.id] = role_id
+
+        valid = {}
+        if role:
+            for member in role.members:
+                if self.verdict(member, role_id)[0]:
+                    valid[member.id] = member
+        self._valid[guild.id] = valid
+
+    def forget(self, guild: discord.Guild):
+        """Drop a guild's index (e.g. after role changes); it is re-seeded on next use."""
+        self._valid.pop(guild.id, None)
+        self._role_ids.pop(guild.id, None)
+
+    def update(self, member: discord.Member):
+        """Re-evaluate a single member after a presence/member update."""
+        guild = member.guild
+        if guild.id not in self._valid:
+            self.seed(guild)
+            return
+        if self.verdict(member, self._role_ids.get(guild.id))[0]:
+            self._valid[guild.id][member.id] = member
+        else:
+            self._valid[guild.id].pop(member.id, None)
+
+    def remove(self, member: discord.Member):
+        self._valid.get(member.guild.id, {}).pop(member.id, None)
+
+    def valid_players(self, guild: discord.Guild):
+        if guild.id not in self._valid:
+            self.seed(guild)
+        return list(self._valid[guild.id].values())
+
+    def has_traffic(self, guild: discord.Guild):
+        if guild.id not in self._valid:
+            self.seed(guild)
+        return bool(self._valid[guild.id])
+
+
+presence_index = PresenceIndex()
+
+# Most user ids one member query may ask for
+QUERY_BATCH = 100
+
+
+async def cache_role_members(guild: discord.Guild):
+    """
+    Lean gateway mode: put the members with the traffic role, with their
+    presences, into the member cache and re-seed the guild's index. The
+    member list is requested without caching it; only the role members are
+    queried again. Returns how many members have the role.
+    """
+    role = discord.utils.get(guild.roles, name=presence_index.role_name_for(guild.id))
+    if role is None:
+        return 0
+    member_ids = [m.id for m in await guild.chunk(cache=False) if m.get_role(role.id)]
+    for start in range(0, len(member_ids), QUERY_BATCH):
+        batch = member_ids[start:start + QUERY_BATCH]
+        await guild.query_members(limit=len(batch), user_ids=batch, presences=True, cache=True)
+    presence_index.seed(guild)
+    return len(member_ids)
+
+
+def describe_member(member: discord.Member, role_id):
+    """One line of the traffic debug log: status, activities and the index's verdict."""
+    member_log = f"- {member.display_name}: Status={member.status}"
+    if member.activities:
         activities_str = ", ".join([f"{type(a).__name__}({a.name})" for a in member.activities])
         member_log += f" Activities=[{activities_str}]"
-        
-        is_playing = False
-        for activity in member.activities:
-            # Check for Game or keywords
-            if isinstance(activity, discord.Game) or "RAGE Multiplayer" in activity.name or "GTA" in activity.name:
-                is_playing = True
-                break
-        
-        if is_playing:
-            found_valid = True
-            member_log += " ✅ MATCH!"
-        else:
-            member_log += " ❌ No Game Activity"
-            
-        logs.append(member_log)
-    
-    return bool(get_valid_players(guild)), "\n".join(logs)
+
+    _, reason = presence_index.verdict(member, role_id)
+    return f"{member_log} ({reason})" if reason.startswith("Skipped") else f"{member_log} {reason}"
 
 def get_valid_players(guild: discord.Guild):
     """
     Returns a list of Valid Players (discord.Member).
-    Valid Player: Has Role + Online/DND/Idle + Playing RAGE or Game
+    Valid Player: Has Role + Online/DND/Idle + Playing a matching game (see GameMatcher)
     """
-    role = discord.utils.get(guild.roles, name=TARGET_ROLE_NAME)
-    if not role:
-        return []
-
-    valid_players = []
-    members_with_role = [m for m in guild.members if role in m.roles]
-    
-    for member in members_with_role:
-        if member.status == discord.Status.offline:
-            continue
-            
-        if not member.activities:
-            continue
-            
-        is_playing = False
-        for activity in member.activities:
-            if isinstance(activity, discord.Game) or "RAGE Multiplayer" in activity.name or "Medal" in activity.name:
-                is_playing = True
-                break
-        
-        if is_playing:
-            valid_players.append(member)
-            
-    return valid_players
+    return presence_index.valid_players(guild)
@@ -0,0 +1,55 @@
+import os
+
+import pytest
+
+from benchmarks.fakes import FakeBot, FakeUser
+from src.utils.config_manager import config_manager
+from src.utils.hof import HallOfFame
+from src.utils.partition import KnechtPartition
+from src.utils.records import SimulatedClock, set_clock, to_epoch
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HOUR_US = 3600 * 1_000_000
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A simulated clock standing on a Monday morning; config/ is read from the repo."""
+    monkeypatch.chdir(REPO_ROOT)
+    clock = SimulatedClock(to_epoch("2026-03-02T10:00:00+01:00"))
+    previous = set_clock(clock)
+    yield clock
+    set_clock(previous)
+
+
+@pytest.fixture
+def open_partition(clock, tmp_path):
+    """Opens the default partition on a data directory (tmp_path/data unless given), like a bot start."""
+    def open_(data_dir=None):
+        return KnechtPartition(FakeBot(), "default", str(data_dir or tmp_path / "data"), HallOfFame())
+    return open_
+
+
+@pytest.fixture
+def sqlite_backend(clock, monkeypatch, tmp_path):
+    """settings.json with storage_backend "sqlite", the database under tmp_path/data."""
+    settings = {**config_manager.settings, "storage_backend": "sqlite", "sqlite_file": str(tmp_path / "data" / "knecht.db")}
+    monkeypatch.setattr(KnechtPartition, "settings", property(lambda self: settings))
+    return settings
+
+
+def play_day(partition, clock, users=(1, 2, 3)):
+    """One day of activity: panels placed and fixed, containers and Hafenevents. Ends 24 hours later."""
+    for uid in users:
+        user = FakeUser(uid)
+        partition.process_place(user)
+        partition.process_container(user)
+        clock.advance(HOUR_US // 4)
+        partition.process_fix(user)
+    partition.process_hafenevent(FakeUser(users[0]))
+    clock.advance(24 * HOUR_US - len(users) * HOUR_US // 4)
+
+
+def live_state(partition):
+    """Everything a restart has to get back: the knecht.json layout and the archived days."""
+    return partition._snapshot_data(), list(partition.history.iter_days())
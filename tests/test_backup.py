@@ -0,0 +1,116 @@
+import asyncio
+
+import pytest
+
+from benchmarks.fakes import FakeUser
+from src.utils.backup import DELTA, FULL, restore
+from tests.conftest import HOUR_US, live_state, play_day
+
+
+def backup(partition, clock, part_bytes=64 * 1024):
+    """A weekly backup that was delivered: the chain moves on."""
+    header, paths = asyncio.run(partition.create_backup(part_bytes=part_bytes))
+    assert paths
+    partition.backups.commit(header, paths)
+    clock.advance(HOUR_US)
+    return header, paths
+
+
+def archived_event(partition, date):
+    day = next(partition.history.iter_days(start=date, end=date))
+    return day["work"]["containers"][0]["id"]
+
+
+def test_full_delta_corrected_round_trip(clock, open_partition, tmp_path):
+    p = open_partition()
+    for _ in range(4):
+        play_day(p, clock)
+    full, full_paths = backup(p, clock)
+
+    for _ in range(2):
+        play_day(p, clock)
+    delta, delta_paths = backup(p, clock)
+
+    # A correction on a day the full backup already carries, plus a new day
+    corrected_date = p.history.dates()[1]
+    assert asyncio.run(p.clear_archived(archived_event(p, corrected_date)))
+    play_day(p, clock)
+    p.process_container(FakeUser(2))
+    p.save_stats(compact=True)
+    corrected, corrected_paths = backup(p, clock, part_bytes=512)
+    assert len(corrected_paths) > 1
+
+    assert (full["kind"], delta["kind"], corrected["kind"]) == (FULL, DELTA, DELTA)
+    assert corrected["corrected"] == [corrected_date]
+
+    files = full_paths + delta_paths + corrected_paths
+    summary = restore(files[::-1], str(tmp_path / "restored"))
+    assert summary["backups"] == [full["id"], delta["id"], corrected["id"]]
+    assert live_state(open_partition(tmp_path / "restored")) == live_state(p)
+
+
+def test_backup_ignores_a_correction_made_while_it_reads(clock, open_partition, tmp_path):
+    p = open_partition()
+    while not p.history.dates() or p.history.dates()[-1] < "2026-04-01":
+        play_day(p, clock)
+    p.save_stats(compact=True)
+    expected = live_state(p)
+    date = p.history.dates()[-1]
+    event_id = archived_event(p, date)
+
+    # The April segment is rewritten while the backup is still in March
+    read_days = p.backups._days
+    def correct_while_reading(header, history):
+        for n, line in enumerate(read_days(header, history)):
+            yield line
+            if n == 0:
+                assert p.history.remove_event(date, "containers", event_id, "1")
+    p.backups._days = correct_while_reading
+
+    header, paths = asyncio.run(p.create_backup())
+    restore(paths, str(tmp_path / "restored"))
+    assert live_state(open_partition(tmp_path / "restored"))[1] == expected[1]
+
+
+@pytest.fixture
+def split_backup(clock, open_partition):
+    p = open_partition()
+    for _ in range(3):
+        play_day(p, clock)
+    header, paths = asyncio.run(p.create_backup(part_bytes=512))
+    assert len(paths) >= 3
+    return paths
+
+
+def test_missing_part_is_rejected(split_backup, tmp_path):
+    with pytest.raises(ValueError, match="a part is missing"):
+        restore(split_backup[:1] + split_backup[2:], str(tmp_path / "restored"))
+    assert not (tmp_path / "restored").exists()
+
+
+def test_gap_in_the_chain_is_rejected(clock, open_partition, tmp_path):
+    p = open_partition()
+    play_day(p, clock)
+    _, full_paths = backup(p, clock)
+    play_day(p, clock)
+    delta, _ = backup(p, clock)
+    play_day(p, clock)
+    _, last_paths = backup(p, clock)
+
+    with pytest.raises(ValueError, match=f"follows {delta['id']}, which is missing"):
+        restore(full_paths + last_paths, str(tmp_path / "restored"))
+    assert not (tmp_path / "restored").exists()
+
+
+def test_missing_last_part_is_rejected(split_backup, tmp_path):
+    with pytest.raises(ValueError, match="truncated|damaged"):
+        restore(split_backup[:-1], str(tmp_path / "restored"))
+    assert not (tmp_path / "restored").exists()
+
+
+def test_truncated_part_is_rejected(split_backup, tmp_path):
+    with open(split_backup[-1], "r+b") as f:
+        f.truncate(f.seek(0, 2) // 2)
+    with pytest.raises(ValueError, match="truncated|damaged"):
+        restore(split_backup, str(tmp_path / "restored"))
+    assert not (tmp_path / "restored").exists()
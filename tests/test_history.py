@@ -0,0 +1,44 @@
+import asyncio
+import random
+
+from src.utils.id_index import IdIndex
+from tests.conftest import live_state, play_day
+
+
+def test_bulk_loaded_index_matches_incremental():
+    rng = random.Random(1)
+    incremental, bulk = IdIndex(), IdIndex()
+    bulk.bulk_load()
+    for n in range(5000):
+        item_id = f"{rng.randrange(16 ** 4):04x}"
+        for index in (incremental, bulk):
+            if n % 7 == 0:
+                index.discard(item_id, "2026-03-02")
+            else:
+                index.add(item_id, ("2026-03-02" if n % 2 else "2026-03-03", "containers", str(n)))
+    bulk.finish_load()
+    for prefix in ["", "0", "a1", "ff", "1234"]:
+        assert bulk.find(prefix) == incremental.find(prefix)
+    assert len(bulk) == len(incremental)
+
+
+def test_clear_archived_corrects_totals_and_survives_restart(clock, open_partition):
+    p = open_partition()
+    for _ in range(3):
+        play_day(p, clock)
+    date = p.history.dates()[0]
+    day = next(p.history.iter_days(start=date, end=date))
+    event = day["work"]["containers"][0]
+    uid = int(event["user_id"])
+    work, profit = p.lifetime_work["containers"][uid], p.lifetime_profit[uid]
+
+    lines = asyncio.run(p.clear_archived(event["id"][:4]))
+    assert lines and event["id"] in lines[0]
+    assert p.lifetime_work["containers"][uid] == work - 1
+    assert p.lifetime_profit[uid] == profit - p.hof.mechanics.get("wertvoller_container", 90000)
+    day = next(p.history.iter_days(start=date, end=date))
+    assert event["id"] not in [e["id"] for e in day["work"]["containers"]]
+    assert p.history.find_ids(event["id"]) == []
+
+    assert asyncio.run(p.clear_archived(event["id"])) == []
+    assert live_state(open_partition()) == live_state(p)
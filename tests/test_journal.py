@@ -0,0 +1,76 @@
+import json
+import os
+
+from benchmarks.fakes import FakeUser
+import src.utils.partition as partition_module
+from tests.conftest import HOUR_US, live_state, play_day
+
+
+def journal_seqs(path):
+    with open(path, "rb") as f:
+        return [json.loads(line)["seq"] for line in f]
+
+
+def test_replay_after_kill_between_append_and_snapshot(clock, open_partition):
+    p = open_partition()
+    for _ in range(3):
+        play_day(p, clock)
+    p.process_container(FakeUser(4))
+    p.clear(p.daily_work["containers"][0].id)
+    expected = live_state(p)
+
+    # The records are in the journal but newer than knecht.json; no close(), the process just dies
+    with open(p.data_file) as f:
+        snapshot_seq = json.load(f)["journal_seq"]
+    assert max(journal_seqs(p.journal_file)) > snapshot_seq
+
+    assert live_state(open_partition()) == expected
+
+
+def test_replay_after_kill_while_writing_the_snapshot(clock, open_partition, monkeypatch):
+    p = open_partition()
+    play_day(p, clock)
+    play_day(p, clock)
+    p.process_container(FakeUser(1))
+
+    def crash(*args, **kwargs):
+        raise OSError("killed")
+
+    # The journal was rotated for the snapshot, which never lands
+    with monkeypatch.context() as m:
+        m.setattr(partition_module, "atomic_write_json", crash)
+        p.save_stats(compact=True)
+    assert os.path.exists(p.journal.rotated_path)
+    p.process_place(FakeUser(2))
+    clock.advance(HOUR_US)
+    p.process_fix(FakeUser(3))
+    expected = live_state(p)
+
+    assert live_state(open_partition()) == expected
+
+
+def test_torn_last_record_is_dropped(clock, open_partition):
+    p = open_partition()
+    play_day(p, clock)
+    p.process_container(FakeUser(1))
+    expected = live_state(p)
+
+    p.journal.flush()
+    with open(p.journal_file, "a") as f:
+        f.write('{"op":"profit","values":{"1":')
+
+    restarted = open_partition()
+    assert live_state(restarted) == expected
+    assert max(journal_seqs(p.journal_file)) == restarted.journal_seq
+
+
+def test_replay_is_idempotent(clock, open_partition):
+    p = open_partition()
+    play_day(p, clock)
+    play_day(p, clock)
+    expected = live_state(p)
+
+    first = open_partition()
+    assert live_state(first) == expected
+    # A crash right after the restart replays the same records again
+    assert live_state(open_partition()) == expected
@@ -0,0 +1,47 @@
+import json
+
+from tests.conftest import HOUR_US
+
+TODAY = "2026-03-02"
+
+
+def write_baseline(data_dir):
+    """A knecht.json as the JSON backend wrote it before the daily counters existed."""
+    def event(event_id, user_id, minute):
+        return {"id": event_id, "user_id": str(user_id), "timestamp": f"{TODAY}T09:{minute:02d}:00+01:00"}
+
+    data_dir.mkdir()
+    state = {
+        "active_panels": [],
+        "daily_work": {
+            "placed": [event("aaa001", 1, 0), event("aaa002", 2, 1)],
+            "fixes": [event("bbb001", 2, 5)],
+            "containers": [event("ccc001", 1, 10), event("ccc002", 1, 11), event("ccc003", 3, 12)],
+            "hafenevents": []
+        },
+        "daily_profit": {"1": 180000, "3": 90000},
+        "daily_batteries": {},
+        "lifetime_profit": {"1": 500000},
+        "lifetime_work": {"placed": {"1": 4}, "fixes": {}, "containers": {"1": 5}, "hafenevents": {}},
+        "last_reset_date": TODAY
+    }
+    with open(data_dir / "knecht.json", "w") as f:
+        json.dump(state, f)
+
+
+def test_sqlite_migration_keeps_todays_counters(sqlite_backend, open_partition, clock, tmp_path):
+    write_baseline(tmp_path / "data")
+    p = open_partition()
+    assert p.store is not None
+
+    expected = {"placed": {1: 1, 2: 1}, "fixes": {2: 1}, "containers": {1: 2, 3: 1}, "hafenevents": {}}
+    assert p.get_daily_counts() == expected
+    assert p.rebuild_daily_counts() == []
+
+    # The next reset folds the migrated day into the lifetime totals, in memory and in the store
+    clock.advance(24 * HOUR_US)
+    p.check_daily_reset()
+    assert p.lifetime_work["containers"] == {1: 7, 3: 1}
+    stored = p.store.load_state()["lifetime_work"]
+    assert {cat: {int(uid): n for uid, n in per_user.items()} for cat, per_user in stored.items()} == p.lifetime_work
+    p.store.close()